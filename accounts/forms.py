@@ -1,5 +1,6 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
+from base.forms import UploadImageField
 from .models import CustomUser
 from .utils import (
     tailwind_register_classes,
@@ -11,6 +12,7 @@ from .utils import (
 class CustomUserCreationForm(UserCreationForm):
     class Meta:
         model = CustomUser
+        field_classes = {"image": UploadImageField}
         fields = [
             "email",
             "username",
@@ -100,6 +102,7 @@ class CustomUserCreationForm(UserCreationForm):
 class CustomUserUpdateForm(forms.ModelForm):
     class Meta:
         model = CustomUser
+        field_classes = {"image": UploadImageField}
         fields = ["username", "first_name", "last_name", "contact", "image", "bio"]
         widgets = {
             "username": forms.TextInput(
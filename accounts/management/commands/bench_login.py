@@ -0,0 +1,53 @@
+from io import BytesIO
+
+from django.contrib.auth import login
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from contacts.benchmarking import bench_user, time_ms
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure login throughput for a user with a profile image: "
+        "django.contrib.auth.login() (a last_login-only save) against a full "
+        "validated save. Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = options["logins"]
+        factory = RequestFactory()
+        with transaction.atomic():
+            user = bench_user("login")
+            buffer = BytesIO()
+            Image.new("RGB", (1200, 1200), color=(90, 60, 30)).save(
+                buffer, format="JPEG"
+            )
+            user.image.save("bench.jpg", ContentFile(buffer.getvalue()), save=False)
+            user.save()
+
+            def do_login():
+                request = factory.post("/user-login/")
+                request.session = SessionStore()
+                login(request, user)
+
+            try:
+                for label, fn in (("login()", do_login), ("full save()", user.save)):
+                    with CaptureQueriesContext(connection) as queries:
+                        elapsed = sum(time_ms(fn)[1] for _ in range(count))
+                    self.stdout.write(
+                        f"{label:<12} {count / (elapsed / 1000):8.0f} /s   "
+                        f"{elapsed / count:6.2f} ms each   "
+                        f"{len(queries) / count:4.1f} queries each"
+                    )
+            finally:
+                user.image.storage.delete(user.image.name)
+                transaction.set_rollback(True)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="image_pending",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:33
+
+import accounts.models
+import base.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0004_image_hash"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="customuser",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=base.storage.photo_storage,
+                upload_to=accounts.models.user_profile_image_path,
+            ),
+        ),
+    ]
@@ -10,9 +10,14 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 import os
 from datetime import datetime
-from PIL import Image
-from io import BytesIO
-from django.core.files.base import ContentFile
+from base.images import (
+    content_hash,
+    delete_on_commit,
+    rendition_srcset,
+    rendition_url,
+)
+from base.queue import enqueue
+from base.storage import photo_storage
 
 
 def user_profile_image_path(instance, filename):
@@ -73,7 +78,18 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     last_name = models.CharField(max_length=30)
     email = models.EmailField(unique=True)
     contact = models.CharField(max_length=15, unique=True, blank=True)
-    image = models.ImageField(upload_to=user_profile_image_path, blank=True, null=True)
+    image = models.ImageField(
+        upload_to=user_profile_image_path,
+        storage=photo_storage,
+        blank=True,
+        null=True,
+    )
+    # Square renditions of ``image``, {"<width>": stored_name}
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # sha256 of the uploaded bytes, to recognise a re-upload of the same file
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # True while a raw upload waits for the resize task
+    image_pending = models.BooleanField(default=False, editable=False)
     bio = models.TextField(blank=True)
 
     is_staff = models.BooleanField(default=False)
@@ -124,24 +140,83 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
             if qs.exists():
                 raise ValidationError({"contact": "Contact must be unique."})
 
+    # Image name and renditions as loaded from the database
+    _loaded_image = None
+    _loaded_renditions = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "image" in field_names:
+            instance._loaded_image = values[field_names.index("image")] or ""
+        if "image_renditions" in field_names:
+            instance._loaded_renditions = values[field_names.index("image_renditions")]
+        return instance
+
+    # Writes limited to these fields (login()'s last_login update, password
+    # rehashing) skip validation and image handling.
+    BOOKKEEPING_FIELDS = frozenset({"last_login", "password"})
+    # Derived from ``image`` whenever it is saved
+    IMAGE_STATE_FIELDS = ("image_hash", "image_pending", "image_renditions")
+
     def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if update_fields <= self.BOOKKEEPING_FIELDS:
+                return super().save(*args, **kwargs)
+
         # Call full_clean to run validations (optional)
         self.full_clean()
 
-        # Check if there's an image and if it's newly uploaded or changed
-        # inside your CustomUser model's save method
-        if self.image:
-            img = Image.open(self.image)
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-            img = img.resize((400, 400), Image.Resampling.LANCZOS)
-
-            img_io = BytesIO()
-            img.save(img_io, format="JPEG", quality=85)
-            img_content = ContentFile(img_io.getvalue(), self.image.name)
-            self.image.save(self.image.name, img_content, save=False)
+        if update_fields is not None and "image" not in update_fields:
+            return super().save(*args, **kwargs)
+        if update_fields is not None:
+            kwargs["update_fields"] = update_fields | set(self.IMAGE_STATE_FIELDS)
+
+        # Only a newly uploaded image needs resizing; it is stored as-is and
+        # the resize runs on the task queue (accounts.tasks). Re-uploading
+        # the same bytes keeps the processed image.
+        new_image = bool(self.image) and not self.image._committed
+        if new_image:
+            digest = content_hash(self.image)
+            if self._loaded_image and digest == self.image_hash:
+                self.image = self._loaded_image
+                new_image = False
+            else:
+                self.image_hash = digest
+                self.image_pending = True
+                self.image_renditions = {}
+        elif not self.image:
+            self.image_hash = ""
+            self.image_renditions = {}
         super().save(*args, **kwargs)
 
+        image_name = self.image.name or ""
+        if self._loaded_image and self._loaded_image != image_name:
+            delete_on_commit(
+                self.image.storage,
+                [self._loaded_image, *(self._loaded_renditions or {}).values()],
+            )
+        self._loaded_image = image_name
+        self._loaded_renditions = self.image_renditions
+
+        if new_image:
+            enqueue("accounts.process_profile_image", user_id=self.pk)
+
+    @property
+    def image_srcset(self):
+        return rendition_srcset(self.image.storage, self.image_renditions)
+
+    @property
+    def image_thumbnail_url(self):
+        if not self.image:
+            return ""
+        return (
+            rendition_url(self.image.storage, self.image_renditions, 224)
+            or self.image.url
+        )
+
     def __str__(self):
         return f"{self.username}, {self.email}, {self.first_name} {self.last_name}"
 
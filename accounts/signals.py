@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from base.images import delete_on_commit
+from .models import CustomUser
+
+
+@receiver(post_delete, sender=CustomUser)
+def release_profile_image(sender, instance, **kwargs):
+    if instance.image:
+        delete_on_commit(
+            instance.image.storage,
+            [instance.image.name, *instance.image_renditions.values()],
+        )
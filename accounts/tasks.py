@@ -0,0 +1,41 @@
+import os
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from base.images import delete_renditions, jpeg_bytes, open_resized, save_renditions
+from base.queue import task
+from .models import CustomUser
+
+PROFILE_IMAGE_SIZE = (400, 400)
+PROFILE_IMAGE_QUALITY = 85
+
+
+@task("accounts.process_profile_image")
+def process_profile_image(user_id):
+    """Resize a raw uploaded profile image to 400x400 JPEG plus renditions."""
+    user = CustomUser.objects.filter(pk=user_id, image_pending=True).first()
+    if user is None or not user.image:
+        return
+    raw_name = user.image.name
+    storage = user.image.storage
+    with storage.open(raw_name, "rb") as raw:
+        img = open_resized(raw, PROFILE_IMAGE_SIZE)
+
+    user.image.save(
+        os.path.splitext(os.path.basename(raw_name))[0] + ".jpg",
+        ContentFile(jpeg_bytes(img, PROFILE_IMAGE_QUALITY)),
+        save=False,
+    )
+    renditions = save_renditions(storage, user.image.name, img)
+    swapped = CustomUser.objects.filter(pk=user_id, image=raw_name).update(
+        image=user.image.name,
+        image_renditions=renditions,
+        image_pending=False,
+        updated_at=timezone.now(),
+    )
+    if swapped:
+        storage.delete(raw_name)
+    else:
+        storage.delete(user.image.name)
+        delete_renditions(storage, renditions)
@@ -1,3 +1,70 @@
-# from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from accounts.models import CustomUser
+from base.models import Task
+
+# Media the tests write, removed in tearDownModule
+TEST_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class CustomUserSaveTest(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="saver@example.com",
+            username="saver",
+            first_name="Sa",
+            last_name="Ver",
+            password="password123",
+            contact="9876543210",
+        )
+
+    def upload(self):
+        buffer = BytesIO()
+        Image.new("RGB", (50, 50)).save(buffer, format="PNG")
+        return SimpleUploadedFile("me.png", buffer.getvalue())
+
+    def test_last_login_save_is_a_single_update(self):
+        self.user.last_login = timezone.now()
+        with mock.patch.object(CustomUser, "full_clean") as full_clean:
+            with CaptureQueriesContext(connection) as queries:
+                self.user.save(update_fields=["last_login"])
+        full_clean.assert_not_called()
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]["sql"].startswith("UPDATE"))
+
+    def test_login_does_not_validate(self):
+        with mock.patch.object(CustomUser, "full_clean") as full_clean:
+            self.assertTrue(
+                self.client.login(email="saver@example.com", password="password123")
+            )
+        full_clean.assert_not_called()
+
+    def test_scoped_save_of_profile_fields_still_validates(self):
+        self.user.first_name = ""
+        with mock.patch.object(CustomUser, "full_clean") as full_clean:
+            self.user.save(update_fields=["first_name"])
+        full_clean.assert_called_once()
+
+    def test_scoped_image_save_processes_the_upload(self):
+        self.user.image = self.upload()
+        self.user.save(update_fields=["image"])
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.image_pending)
+        self.assertTrue(self.user.image_hash)
+        self.assertEqual(Task.objects.get().name, "accounts.process_profile_image")
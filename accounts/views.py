@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from contacts.stats import user_stats
 from .forms import (
     CustomUserCreationForm,
     CustomUserUpdateForm,
@@ -15,6 +16,8 @@ title_tailwind_classes = " text-lg font-semibold uppercase text-center "
 def homepage(request):
     user = request.user
     context = {"user": user, "title_tailwind_classes": title_tailwind_classes}
+    if user.is_authenticated:
+        context["stats"] = user_stats(user)
     return render(request, "accounts/homepage.html", context)
 
 
@@ -79,7 +82,11 @@ def logout_view(request):
 @login_required
 def profile_view(request):
     user = request.user
-    context = {"user": user, "title_tailwind_classes": title_tailwind_classes}
+    context = {
+        "user": user,
+        "stats": user_stats(user),
+        "title_tailwind_classes": title_tailwind_classes,
+    }
     return render(request, "accounts/profile.html", context)
 
 
@@ -11,6 +11,7 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+# Serve the read-heavy contact pages with their async views
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings_asgi")
 
 application = get_asgi_application()
@@ -0,0 +1,13 @@
+"""
+URLconf for ASGI: ``backend.urls`` with the contact pages resolved to their
+async views (``contacts.async_urls``) first.
+"""
+
+from django.urls import include, path
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path("contact/", include("contacts.async_urls")),
+    *wsgi_urlpatterns,
+]
@@ -56,6 +56,7 @@ if DEBUG:
         "django_browser_reload.middleware.BrowserReloadMiddleware",
     ]
 
+# backend/settings_asgi.py switches this to backend.asgi_urls (async pages)
 ROOT_URLCONF = "backend.urls"
 
 TEMPLATES = [
@@ -75,10 +76,31 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "backend.wsgi.application"
 
+# SQLite tuning, applied by every new connection. WAL lets readers run while
+# a write commits; busy_timeout (ms) makes a writer wait for the lock rather
+# than fail with "database is locked", and IMMEDIATE transactions take the
+# write lock up front, so a transaction that reads before writing cannot
+# deadlock with another writer. cache_size is in KiB when negative.
+# `manage.py bench_sqlite` compares this profile with SQLite's defaults.
+SQLITE_PRAGMAS = {
+    "journal_mode": env("SQLITE_JOURNAL_MODE", default="WAL"),
+    "synchronous": env("SQLITE_SYNCHRONOUS", default="NORMAL"),
+    "busy_timeout": env.int("SQLITE_BUSY_TIMEOUT", default=5000),
+    "mmap_size": env.int("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024),
+    "cache_size": env.int("SQLITE_CACHE_SIZE", default=-64000),
+    "temp_store": env("SQLITE_TEMP_STORE", default="MEMORY"),
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            "init_command": ";".join(
+                f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+            ),
+            "transaction_mode": env("SQLITE_TRANSACTION_MODE", default="IMMEDIATE"),
+        },
     }
 }
 
@@ -123,10 +145,46 @@ MEDIA_URL = "/media/"  # URL to access media files
 
 MEDIA_ROOT = BASE_DIR / "media"  # Folder where uploaded media files will be saved
 
+# Cache backend from CACHE_URL: locmemcache:// (the default, one per
+# process), filecache:///path/to/dir, or redis://host:6379/1 for any
+# Redis-compatible server (needs the redis package).
+CACHES = {"default": env.cache("CACHE_URL", default="locmemcache://contacts")}
+
+# Seconds a rendered contact list, filter or detail page is cached per user;
+# pages are keyed on the contacts' updated_at, so a write in any process
+# expires them at once, whatever the backend. 0 disables it.
+CONTACT_PAGE_CACHE_TIMEOUT = env.int("CONTACT_PAGE_CACHE_TIMEOUT", default=600)
+
+# Show the contact search planner's chosen strategy on the search page
+# and in an X-Search-Plan response header.
+CONTACT_SEARCH_DEBUG = env.bool("CONTACT_SEARCH_DEBUG", default=DEBUG)
+
+# Run queued background tasks (photo processing etc.) right after the
+# request's transaction commits instead of in `manage.py runworker`.
+TASK_QUEUE_EAGER = env.bool("TASK_QUEUE_EAGER", default=False)
+
+# Uploads are streamed to a temporary file rather than buffered in memory;
+# images are then validated from their header against these limits.
+FILE_UPLOAD_HANDLERS = ["django.core.files.uploadhandler.TemporaryFileUploadHandler"]
+IMAGE_UPLOAD_MAX_BYTES = env.int("IMAGE_UPLOAD_MAX_BYTES", default=10 * 1024 * 1024)
+IMAGE_UPLOAD_MAX_PIXELS = env.int("IMAGE_UPLOAD_MAX_PIXELS", default=40_000_000)
+
 STORAGES = {
     "default": {
         "BACKEND": "django.core.files.storage.FileSystemStorage",
     },
+    # Contact photos and profile images, deduplicated by content hash
+    "photos": {
+        "BACKEND": "base.storage.ContentAddressedStorage",
+    },
+    # Files only the app reads, such as uploaded address books; keep this
+    # directory out of MEDIA_ROOT and away from the web server
+    "private": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {
+            "location": env("PRIVATE_STORAGE_ROOT", default=str(BASE_DIR / "private")),
+        },
+    },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
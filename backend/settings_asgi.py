@@ -0,0 +1,8 @@
+"""
+Settings for the ASGI server (``backend/asgi.py``): ``backend.settings``
+with the contact pages resolved to their async views.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+ROOT_URLCONF = "backend.asgi_urls"
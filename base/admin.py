@@ -1,3 +1,18 @@
 from django.contrib import admin
+from .models import MediaBlob, Task
 
-# Register your models here.
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "status", "attempts", "run_after", "updated_at")
+    list_filter = ("status", "name")
+    search_fields = ("name",)
+    ordering = ("-created_at",)
+    readonly_fields = ("created_at", "updated_at")
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ("name", "size", "refs", "created_at")
+    search_fields = ("name",)
+    readonly_fields = ("name", "size", "refs", "created_at")
@@ -0,0 +1,24 @@
+from django import forms
+
+from .images import ImageRejected, inspect_image
+
+
+class UploadImageField(forms.ImageField):
+    """
+    Image form field that validates from the file header only.
+
+    Django's ImageField opens the upload and runs ``verify()`` over the
+    whole file; this checks size, format and pixel count without decoding,
+    and leaves decoding to the photo tasks.
+    """
+
+    def to_python(self, data):
+        f = forms.FileField.to_python(self, data)
+        if f is None:
+            return None
+        try:
+            fmt, width, height = inspect_image(f)
+        except ImageRejected as e:
+            raise forms.ValidationError(str(e), code="invalid_image")
+        f.content_type = f"image/{fmt.lower()}"
+        return f
@@ -0,0 +1,169 @@
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+# Square avatar renditions generated next to every processed photo. Widths
+# are CSS pixels at 1x/2x for the 7rem cards plus one larger size for
+# detail pages on high-density screens.
+RENDITION_WIDTHS = (56, 112, 224, 512)
+RENDITION_QUALITY = 80
+
+# Formats accepted by inspect_image, as reported by Pillow
+UPLOAD_FORMATS = ("JPEG", "PNG")
+
+
+class ImageRejected(ValueError):
+    """An upload that is not an acceptable image."""
+
+
+def check_dimensions(width, height):
+    if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ImageRejected(
+            f"Image is {width}x{height}; at most "
+            f"{settings.IMAGE_UPLOAD_MAX_PIXELS / 1_000_000:g} megapixels are allowed."
+        )
+
+
+def inspect_image(file):
+    """
+    Validate an upload from its size and image header only.
+
+    Nothing is decoded: Pillow reads the format and dimensions from the
+    first bytes. Returns ``(format, width, height)``; raises
+    ImageRejected.
+    """
+    if file.size > settings.IMAGE_UPLOAD_MAX_BYTES:
+        raise ImageRejected(
+            f"Image files may be at most "
+            f"{settings.IMAGE_UPLOAD_MAX_BYTES // (1024 * 1024)} MB."
+        )
+    file.seek(0)
+    try:
+        with Image.open(file) as img:
+            fmt, (width, height) = img.format, img.size
+    except (OSError, Image.DecompressionBombError):
+        raise ImageRejected("Upload a valid image.")
+    finally:
+        file.seek(0)
+    if fmt not in UPLOAD_FORMATS:
+        raise ImageRejected("Only .png, .jpg, and .jpeg files are allowed.")
+    check_dimensions(width, height)
+    return fmt, width, height
+
+
+def open_rgb(source, max_size=None):
+    """
+    Decode ``source`` (a path or file object) into an RGB image.
+
+    With ``max_size`` the result fits inside it. JPEGs are then decoded
+    at a reduced DCT scale (draft mode) so the full-size bitmap is never
+    allocated; other formats are reduced by an integer factor before the
+    final resample.
+    """
+    img = Image.open(source)
+    check_dimensions(*img.size)
+    if max_size is not None:
+        img.thumbnail(max_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    if img.mode != "RGB":
+        img = img.convert("RGB")  # ensure compatibility
+    return img
+
+
+def open_resized(source, size):
+    """Decode ``source`` resized to exactly ``size``, decoding no more than needed."""
+    img = Image.open(source)
+    check_dimensions(*img.size)
+    # draft() keeps both sides at least ``size``; a no-op for non-JPEGs
+    img.draft("RGB", size)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+
+def jpeg_bytes(img, quality):
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def content_hash(file):
+    """
+    sha256 hex digest of ``file``, read in chunks without decoding it.
+
+    The digest is remembered on the innermost file object, which a model's
+    FieldFile and the storage it is later saved to both end up holding, so
+    ContentAddressedStorage names the upload without reading it again.
+    """
+    raw = file
+    while getattr(raw, "file", None) is not None and raw.file is not raw:
+        raw = raw.file
+    digest = getattr(raw, "sha256_digest", None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        for chunk in file.chunks():
+            hasher.update(chunk)
+        digest = hasher.hexdigest()
+        raw.sha256_digest = digest
+    return digest
+
+
+def delete_on_commit(storage, names):
+    """Delete stored files once the surrounding transaction commits."""
+    names = [name for name in names if name]
+    if names:
+        transaction.on_commit(lambda: [storage.delete(name) for name in names])
+
+
+def rendition_name(name, width):
+    stem, _ = os.path.splitext(name)
+    return f"{stem}_{width}w.jpg"
+
+
+def save_renditions(storage, name, img, widths=RENDITION_WIDTHS):
+    """
+    Store square JPEG crops of ``img`` next to ``name``.
+
+    Widths larger than the source are skipped (upscaling only adds bytes),
+    except the smallest, which is always produced. Returns
+    ``{"<width>": stored_name}`` for the model's renditions field.
+    """
+    renditions = {}
+    for width in sorted(widths):
+        if renditions and width > min(img.size):
+            break
+        thumb = ImageOps.fit(img, (width, width), Image.Resampling.LANCZOS)
+        stored = storage.save(
+            rendition_name(name, width),
+            ContentFile(jpeg_bytes(thumb, RENDITION_QUALITY)),
+        )
+        renditions[str(width)] = stored
+    return renditions
+
+
+def delete_renditions(storage, renditions):
+    for stored in (renditions or {}).values():
+        storage.delete(stored)
+
+
+def rendition_srcset(storage, renditions):
+    """``srcset`` attribute value for stored renditions, smallest first."""
+    return ", ".join(
+        f"{storage.url(stored)} {width}w"
+        for width, stored in sorted(
+            (renditions or {}).items(), key=lambda item: int(item[0])
+        )
+    )
+
+
+def rendition_url(storage, renditions, width):
+    """URL of the smallest rendition at least ``width`` wide, or the largest."""
+    if not renditions:
+        return None
+    widths = sorted(int(w) for w in renditions)
+    chosen = next((w for w in widths if w >= width), widths[-1])
+    return storage.url(renditions[str(chosen)])
@@ -0,0 +1,102 @@
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from base.images import (
+    RENDITION_WIDTHS,
+    ImageRejected,
+    inspect_image,
+    jpeg_bytes,
+    open_rgb,
+)
+
+PHOTO_MAX_SIZE = (1024, 1024)
+
+
+def legacy_pipeline(path):
+    """What uploads used to cost: verify, then a full-size decode and re-encode."""
+    with open(path, "rb") as f:
+        Image.open(f).verify()
+        f.seek(0)
+        img = Image.open(f)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        jpeg_bytes(img, 70)
+
+
+def upload_pipeline(path):
+    """Header check, then one scaled decode feeding the photo and renditions."""
+    with open(path, "rb") as f:
+        inspect_image(File(f, name=os.path.basename(path)))
+        img = open_rgb(f, PHOTO_MAX_SIZE)
+        jpeg_bytes(img, 70)
+        for width in RENDITION_WIDTHS:
+            jpeg_bytes(img.resize((width, width)), 80)
+
+
+PIPELINES = {"legacy": legacy_pipeline, "pipeline": upload_pipeline}
+
+
+def measure(name, path):
+    """Run one pipeline in this (fresh) process; returns (peak RSS MB, ms, note)."""
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    note = ""
+    try:
+        PIPELINES[name](path)
+    except ImageRejected as e:
+        note = f"rejected: {e}"
+    elapsed = (time.perf_counter() - start) * 1000
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux
+    return (after - before) / 1024, elapsed, note
+
+
+def synthetic_image(path, megapixels, fmt):
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    img.save(path, format=fmt, quality=90)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare peak memory and time per photo upload between the previous "
+        "full-decode path and the header-checked, draft-decoded pipeline. "
+        "Each measurement runs in a fresh process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--megapixels",
+            nargs="+",
+            type=float,
+            default=[2, 12, 24, 48],
+            help="Synthetic image sizes to upload.",
+        )
+        parser.add_argument(
+            "--formats", nargs="+", default=["JPEG", "PNG"], choices=["JPEG", "PNG"]
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            for fmt in options["formats"]:
+                for megapixels in options["megapixels"]:
+                    path = os.path.join(tmp, f"{megapixels:g}mp.{fmt.lower()}")
+                    synthetic_image(path, megapixels, fmt)
+                    size_mb = os.path.getsize(path) / (1024 * 1024)
+                    for name in PIPELINES:
+                        with ProcessPoolExecutor(max_workers=1) as pool:
+                            peak, elapsed, note = pool.submit(
+                                measure, name, path
+                            ).result()
+                        self.stdout.write(
+                            f"{fmt:<5} {megapixels:>5g} MP {size_mb:7.1f} MB  "
+                            f"{name:<9} peak +{peak:8.1f} MB  {elapsed:8.1f} ms  {note}"
+                        )
@@ -0,0 +1,113 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from base.queue import DEFAULT_VISIBILITY_TIMEOUT, claim, execute
+
+
+def work(stop, visibility_timeout, poll_interval, burst):
+    """Claim and run tasks until ``stop`` is set (or the queue drains in burst mode)."""
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            claimed = claim(visibility_timeout)
+            if claimed is None:
+                if burst:
+                    break
+                stop.wait(poll_interval)
+                continue
+            execute(claimed)
+    finally:
+        connections.close_all()
+
+
+def run_threads(concurrency, stop, *args):
+    threads = [
+        threading.Thread(target=work, args=(stop, *args), daemon=True)
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(0.5)
+
+
+def run_process(concurrency, *args):
+    # Each child process runs its own thread pool with a fresh stop flag.
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    run_threads(concurrency, stop, *args)
+
+
+class Command(BaseCommand):
+    help = "Run background tasks from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads", type=int, default=2, help="Worker threads per process."
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Worker processes; each runs --threads threads.",
+        )
+        parser.add_argument(
+            "--visibility-timeout",
+            type=int,
+            default=DEFAULT_VISIBILITY_TIMEOUT,
+            help="Seconds before a claimed task may be retried by another worker.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep when the queue is empty.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        work_args = (
+            options["visibility_timeout"],
+            options["poll_interval"],
+            options["burst"],
+        )
+        self.stdout.write(
+            f"Worker started: {options['processes']} process(es) x "
+            f"{options['threads']} thread(s)."
+        )
+        if options["processes"] <= 1:
+            stop = threading.Event()
+            try:
+                run_threads(options["threads"], stop, *work_args)
+            except KeyboardInterrupt:
+                stop.set()
+            return
+
+        # Connections must not be shared with forked children.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=run_process, args=(options["threads"], *work_args)
+            )
+            for _ in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
@@ -1,3 +1,64 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class Task(models.Model):
+    """A unit of background work picked up by ``manage.py runworker``."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # Earliest time the task may run; pushed back on retry.
+    run_after = models.DateTimeField(default=timezone.now)
+    # While running, the claim expires at this time and another worker may
+    # pick the task up again (visibility timeout).
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "run_after"], name="task_status_run_after_idx"
+            ),
+            models.Index(
+                fields=["status", "locked_until"], name="task_status_locked_idx"
+            ),
+        ]
+
+
+class MediaBlob(models.Model):
+    """
+    A content-addressed file in ``base.storage.ContentAddressedStorage``.
+
+    ``refs`` counts the stored references (model fields, renditions) to the
+    file; the file is removed when the last one is released.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refs = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refs} refs)"
@@ -0,0 +1,167 @@
+"""
+A small database-backed task queue.
+
+Tasks are registered with ``@task("app.name")`` in an app's ``tasks.py``
+and queued with ``enqueue``. Because a task is just a row, enqueueing
+inside a transaction is atomic with the write that caused it. Workers
+(``manage.py runworker``) claim rows with a conditional UPDATE, so two
+workers never run the same claim. A claim expires after the visibility
+timeout so a crashed worker's tasks are retried; a claim that expires on
+the final attempt marks the task FAILED.
+"""
+
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VISIBILITY_TIMEOUT = 300
+RETRY_BACKOFF_SECONDS = 10
+
+_registry = {}
+
+
+def task(name, max_attempts=3, on_failure=None):
+    """
+    Register the decorated function as the handler for ``name``.
+    ``on_failure(**payload)`` is called once the last attempt has failed.
+    """
+
+    def decorator(func):
+        _registry[name] = (func, max_attempts, on_failure)
+        return func
+
+    return decorator
+
+
+def enqueue(name, **payload):
+    if name not in _registry:
+        raise KeyError(f"No task registered as {name!r}.")
+    queued = Task.objects.create(
+        name=name, payload=payload, max_attempts=_registry[name][1]
+    )
+    if getattr(settings, "TASK_QUEUE_EAGER", False):
+        transaction.on_commit(lambda: run_task(queued.pk))
+    return queued
+
+
+def claimable(now):
+    return Q(status=Task.QUEUED, run_after__lte=now) | Q(
+        status=Task.RUNNING, locked_until__lt=now
+    )
+
+
+def fail_abandoned(now):
+    """
+    Mark FAILED the tasks whose worker died during their final attempt:
+    their claim has expired but no attempts are left to reclaim them with.
+    """
+    abandoned = Task.objects.filter(
+        status=Task.RUNNING,
+        locked_until__lt=now,
+        attempts__gte=F("max_attempts"),
+    )
+    for expired in abandoned.only("name", "payload"):
+        failed = abandoned.filter(pk=expired.pk).update(
+            status=Task.FAILED,
+            locked_until=None,
+            last_error="Claim expired on the final attempt; the worker stopped.",
+            updated_at=now,
+        )
+        if failed:
+            give_up(expired)
+
+
+def give_up(failed):
+    """Run the ``on_failure`` hook of a task that will not be retried."""
+    _, _, on_failure = _registry.get(failed.name, (None, None, None))
+    if on_failure is None:
+        return
+    try:
+        on_failure(**failed.payload)
+    except Exception:
+        logger.exception("on_failure of task %s failed", failed)
+
+
+def claim(visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT, task_id=None, batch=10):
+    """Atomically take one runnable task, or return None."""
+    now = timezone.now()
+    fail_abandoned(now)
+    candidates = Task.objects.filter(claimable(now), attempts__lt=F("max_attempts"))
+    if task_id is not None:
+        candidates = candidates.filter(pk=task_id)
+    for pk in candidates.order_by("run_after", "id").values_list("id", flat=True)[
+        :batch
+    ]:
+        claimed = (
+            Task.objects.filter(claimable(now), pk=pk)
+            .filter(attempts__lt=F("max_attempts"))
+            .update(
+                status=Task.RUNNING,
+                attempts=F("attempts") + 1,
+                locked_until=now + timedelta(seconds=visibility_timeout),
+                updated_at=now,
+            )
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def execute(claimed):
+    """Run a claimed task and record the outcome."""
+    func, _, _ = _registry.get(claimed.name, (None, None, None))
+    try:
+        if func is None:
+            raise KeyError(f"No task registered as {claimed.name!r}.")
+        func(**claimed.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception("Task %s failed", claimed)
+        if claimed.attempts >= claimed.max_attempts:
+            status, run_after = Task.FAILED, claimed.run_after
+        else:
+            status = Task.QUEUED
+            run_after = timezone.now() + timedelta(
+                seconds=RETRY_BACKOFF_SECONDS * 2 ** (claimed.attempts - 1)
+            )
+        Task.objects.filter(pk=claimed.pk).update(
+            status=status,
+            run_after=run_after,
+            locked_until=None,
+            last_error=error,
+            updated_at=timezone.now(),
+        )
+        if status == Task.FAILED:
+            give_up(claimed)
+        return False
+    Task.objects.filter(pk=claimed.pk).update(
+        status=Task.DONE, locked_until=None, updated_at=timezone.now()
+    )
+    return True
+
+
+def run_task(task_id):
+    claimed = claim(task_id=task_id)
+    if claimed is not None:
+        execute(claimed)
+
+
+def run_pending(limit=None, visibility_timeout=DEFAULT_VISIBILITY_TIMEOUT):
+    """Run runnable tasks in this process until none are left; return the count."""
+    count = 0
+    while limit is None or count < limit:
+        claimed = claim(visibility_timeout)
+        if claimed is None:
+            break
+        execute(claimed)
+        count += 1
+    return count
@@ -0,0 +1,161 @@
+"""
+Content-addressed media storage.
+
+Files are stored under their sha256 digest, so identical uploads share one
+file on disk. Each ``save`` retains a reference and each ``delete``
+releases one (``base.models.MediaBlob``); the file itself is only written
+when its digest is new and only removed when no reference remains.
+
+A new file is written at once, so the saving transaction can read it
+back, but it is only known to be wanted once that transaction commits;
+removals wait for the commit that drops the last reference.
+"""
+
+import os
+import posixpath
+import tempfile
+import threading
+
+from django.core.files.storage import FileSystemStorage, storages
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils.functional import LazyObject, empty
+
+from .images import content_hash
+
+
+def photo_storage():
+    """Storage for contact photos and profile images (``STORAGES["photos"]``)."""
+    return storages["photos"]
+
+
+class StorageAlias(LazyObject):
+    """
+    ``storages[alias]``, looked up again after STORAGES changes, as Django
+    does for ``default_storage``. A FileField keeps the storage it was
+    given, so without this it would go on using the instance built from
+    the settings at import time.
+    """
+
+    def __init__(self, alias):
+        self.__dict__["_alias"] = alias
+        super().__init__()
+
+    def _setup(self):
+        self._wrapped = storages[self._alias]
+
+
+PRIVATE_STORAGE = StorageAlias("private")
+
+
+@receiver(setting_changed)
+def reset_storage_aliases(setting, **kwargs):
+    if setting == "STORAGES":
+        PRIVATE_STORAGE._wrapped = empty
+
+
+def private_storage():
+    """Storage outside MEDIA_ROOT, never served (``STORAGES["private"]``)."""
+    return PRIVATE_STORAGE
+
+
+# (storage, name) of files this thread wrote in transactions that have
+# not committed. A file still listed after a later commit was written by a
+# transaction that rolled back.
+_uncommitted = threading.local()
+
+
+def uncommitted_files():
+    if not hasattr(_uncommitted, "files"):
+        _uncommitted.files = set()
+    return _uncommitted.files
+
+
+def remove_orphans():
+    """Remove files whose writing transaction rolled back, unless claimed since."""
+    files = uncommitted_files()
+    for storage, name in list(files):
+        files.discard((storage, name))
+        storage.remove_unreferenced(name)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def content_name(self, name, content):
+        """
+        ``<dir>/<aa>/<sha256><ext>`` for ``content`` uploaded as ``name``,
+        where ``<dir>`` is the top-level upload directory of ``name``.
+        """
+        digest = content_hash(content)
+        directory = name.split("/", 1)[0] if "/" in name else ""
+        ext = os.path.splitext(name)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + ext)
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from content in _save; equal names are the same file
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        name = self.content_name(name, content)
+        with transaction.atomic():
+            blob, _ = MediaBlob.objects.select_for_update().get_or_create(name=name)
+            if not self.exists(name):
+                self.write_atomic(name, content)
+                self.track_uncommitted(name)
+            MediaBlob.objects.filter(pk=blob.pk).update(
+                refs=F("refs") + 1, size=content.size
+            )
+            transaction.on_commit(remove_orphans)
+        return name
+
+    def track_uncommitted(self, name):
+        """List a new file until the transaction that wrote it commits."""
+        files = uncommitted_files()
+        files.add((self, name))
+        transaction.on_commit(lambda: files.discard((self, name)))
+
+    def remove_unreferenced(self, name):
+        """Remove the file for ``name`` if no MediaBlob row references it."""
+        from .models import MediaBlob
+
+        if not MediaBlob.objects.filter(name=name).exists():
+            super().delete(name)
+
+    def write_atomic(self, name, content):
+        """Write to a temporary file beside the target and rename it into place."""
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in content.chunks():
+                    tmp.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def delete(self, name):
+        """
+        Release one reference; the file goes when the transaction that
+        releases the last one commits.
+        """
+        from .models import MediaBlob
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.refs > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(refs=F("refs") - 1)
+                return
+            if blob is not None:
+                blob.delete()
+            # Untracked names predate this storage and are removed directly
+            transaction.on_commit(lambda: self.remove_unreferenced(name))
@@ -1,3 +1,219 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from base.forms import UploadImageField
+from base.images import ImageRejected, open_rgb
+
+from base.models import MediaBlob, Task
+from base.queue import claim, enqueue, execute, run_pending, task
+from base.storage import ContentAddressedStorage
+
+# Media the tests write, removed in tearDownModule
+TEST_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+
+calls = []
+
+
+@task("base.tests.record")
+def record(value):
+    calls.append(value)
+
+
+def gave_up():
+    calls.append("gave up")
+
+
+@task("base.tests.flaky", max_attempts=2, on_failure=gave_up)
+def flaky():
+    raise RuntimeError("boom")
+
+
+class TaskQueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueued_task_runs_once(self):
+        enqueue("base.tests.record", value=1)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(run_pending(), 0)
+        self.assertEqual(calls, [1])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_unknown_task_name_is_rejected(self):
+        with self.assertRaises(KeyError):
+            enqueue("base.tests.missing")
+
+    def test_failed_task_is_retried_then_marked_failed(self):
+        queued = enqueue("base.tests.flaky")
+        execute(claim())
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertIn("boom", queued.last_error)
+        self.assertGreater(queued.run_after, timezone.now())
+
+        Task.objects.filter(pk=queued.pk).update(run_after=timezone.now())
+        self.assertEqual(calls, [])
+        execute(claim())
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+        self.assertEqual(calls, ["gave up"])
+
+    def test_claim_expires_after_visibility_timeout(self):
+        queued = enqueue("base.tests.record", value=2)
+        self.assertIsNotNone(claim(visibility_timeout=60))
+        self.assertIsNone(claim())
+        Task.objects.filter(pk=queued.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(claim().pk, queued.pk)
+
+    def test_expired_final_attempt_is_marked_failed(self):
+        queued = enqueue("base.tests.flaky")
+        Task.objects.filter(pk=queued.pk).update(
+            status=Task.RUNNING,
+            attempts=2,
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertIsNone(claim())
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertIsNone(queued.locked_until)
+        self.assertEqual(calls, ["gave up"])
+
+    @override_settings(TASK_QUEUE_EAGER=True)
+    def test_eager_mode_runs_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue("base.tests.record", value=3)
+        self.assertEqual(calls, [3])
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage()
+
+    def test_identical_content_is_stored_once(self):
+        first = self.storage.save("photos/a.png", ContentFile(b"same bytes"))
+        second = self.storage.save("photos/b.png", ContentFile(b"same bytes"))
+        other = self.storage.save("photos/c.png", ContentFile(b"other bytes"))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(first.startswith("photos/"))
+        self.assertEqual(MediaBlob.objects.get(name=first).refs, 2)
+
+    def test_file_is_removed_with_the_last_reference(self):
+        name = self.storage.save("photos/a.png", ContentFile(b"shared"))
+        self.storage.save("photos/b.png", ContentFile(b"shared"))
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.storage.delete(name)
+            self.assertTrue(self.storage.exists(name))
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_rolled_back_delete_keeps_the_file(self):
+        name = self.storage.save("photos/a.png", ContentFile(b"kept"))
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.storage.delete(name)
+                raise RuntimeError
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).refs, 1)
+
+    def test_rolled_back_save_is_removed_on_the_next_commit(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            orphan = self.storage.save("photos/a.png", ContentFile(b"orphan"))
+            raise RuntimeError
+        self.assertTrue(self.storage.exists(orphan))
+        with self.captureOnCommitCallbacks(execute=True):
+            name = self.storage.save("photos/b.png", ContentFile(b"wanted"))
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(name))
+
+    def test_write_leaves_no_temporary_files(self):
+        name = self.storage.save("photos/a.png", ContentFile(b"atomic"))
+        directory = os.path.dirname(self.storage.path(name))
+        self.assertEqual(os.listdir(directory), [os.path.basename(name)])
+        with self.storage.open(name) as stored:
+            self.assertEqual(stored.read(), b"atomic")
+
+
+def image_upload(size, fmt="PNG", name="photo.png"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color=(10, 20, 30)).save(buffer, format=fmt)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class UploadImageFieldTest(TestCase):
+
+    def setUp(self):
+        self.field = UploadImageField()
+
+    def test_accepts_png_and_jpeg(self):
+        for fmt in ("PNG", "JPEG"):
+            cleaned = self.field.clean(image_upload((40, 30), fmt))
+            self.assertEqual(cleaned.content_type, f"image/{fmt.lower()}")
+
+    def test_format_comes_from_header_not_extension(self):
+        with self.assertRaisesMessage(ValidationError, "Only .png"):
+            self.field.clean(image_upload((40, 30), "GIF", name="photo.png"))
+        with self.assertRaisesMessage(ValidationError, "valid image"):
+            self.field.clean(SimpleUploadedFile("photo.png", b"not an image"))
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000)
+    def test_rejects_too_many_pixels_without_decoding(self):
+        upload = image_upload((40, 30))
+        with mock.patch.object(Image.Image, "load") as load:
+            with self.assertRaisesMessage(ValidationError, "megapixels"):
+                self.field.clean(upload)
+        load.assert_not_called()
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=100)
+    def test_rejects_large_files(self):
+        with self.assertRaisesMessage(ValidationError, "at most"):
+            self.field.clean(image_upload((400, 300)))
+
+
+class ScaledDecodeTest(TestCase):
+
+    def test_jpeg_is_decoded_at_reduced_scale(self):
+        source = BytesIO()
+        Image.new("RGB", (2000, 1000)).save(source, format="JPEG")
+        resized = []
+        original_resize = Image.Image.resize
+
+        def resize(img, *args, **kwargs):
+            resized.append(img.size)
+            return original_resize(img, *args, **kwargs)
+
+        with mock.patch.object(Image.Image, "resize", resize):
+            img = open_rgb(source, (250, 250))
+        self.assertEqual(img.size, (250, 125))
+        # draft() scaled the decode down; the full-size bitmap never existed
+        self.assertLess(resized[0][0], 2000)
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000)
+    def test_worker_refuses_oversized_images(self):
+        with self.assertRaises(ImageRejected):
+            open_rgb(image_upload((40, 30)))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ContactList
+from .models import ContactList, ContactStats
 
 
 class ContactListAdmin(admin.ModelAdmin):
@@ -20,3 +20,12 @@ class ContactListAdmin(admin.ModelAdmin):
 
 
 admin.site.register(ContactList, ContactListAdmin)
+
+
+class ContactStatsAdmin(admin.ModelAdmin):
+    list_display = ("user", "contact_type", "total", "favorites", "with_photo")
+    list_filter = ("contact_type",)
+    readonly_fields = ("updated_at",)
+
+
+admin.site.register(ContactStats, ContactStatsAdmin)
@@ -0,0 +1,321 @@
+"""
+JSON API over a user's contacts.
+
+Reads go through ``.values()`` projections: ``?fields=first_name,contact``
+selects just those columns (plus the paging key) and rows are serialized
+straight from the dicts, with no model instances or forms. Writes are
+coerced and validated with the bulk importer's rules
+(``contacts.importer.coerce`` and ``validate_many``), so a batch of 500
+contacts is checked in one pass. Single writes go through
+``ContactList.save``/``delete`` and batches through ``bulk_create``/
+``bulk_update``, keeping ContactStats, the search index and the page cache
+current either way.
+
+    GET    api/contacts/          cursor-paged list (?cursor, ?limit, ?fields)
+    POST   api/contacts/          create one contact
+    GET    api/contacts/<id>/     retrieve (?fields)
+    PATCH  api/contacts/<id>/     update the given fields
+    DELETE api/contacts/<id>/     delete
+    POST   api/contacts/batch/    {"create": [...], "update": [...], "delete": [...]}
+
+Sessions authenticate the API, so writes need the CSRF token like any form.
+"""
+
+import json
+from functools import wraps
+
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods
+
+from . import stats
+from .bulk import delete_contacts
+from .importer import IMPORT_FIELDS, coerce, import_rules
+from .models import ContactList
+from .pagination import CONTACTS_PER_PAGE, CursorPaginator, InvalidCursor
+from .signals import bulk_contacts_changed
+from .validation import validate_many
+
+WRITABLE_FIELDS = IMPORT_FIELDS
+API_FIELDS = ["id", *IMPORT_FIELDS, "created_at", "updated_at"]
+MAX_PAGE_SIZE = 500
+MAX_BATCH_SIZE = 500
+
+
+class ApiError(Exception):
+    def __init__(self, status, body):
+        super().__init__(body)
+        self.status = status
+        self.body = body
+
+
+def api_view(*methods):
+    """JSON errors instead of login redirects and error pages."""
+
+    def decorator(view):
+        @require_http_methods(methods)
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return JsonResponse({"detail": "Authentication required."}, status=401)
+            try:
+                return view(request, *args, **kwargs)
+            except ApiError as e:
+                return JsonResponse(e.body, status=e.status)
+
+        return wrapper
+
+    return decorator
+
+
+def bad_request(detail):
+    return ApiError(400, {"detail": detail})
+
+
+def not_found():
+    return ApiError(404, {"detail": "Contact not found."})
+
+
+def requested_fields(request):
+    """The ``?fields=`` projection, in API_FIELDS order."""
+    raw = request.GET.get("fields")
+    if not raw:
+        return API_FIELDS
+    wanted = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = wanted.difference(API_FIELDS)
+    if unknown:
+        raise bad_request(f"Unknown fields: {', '.join(sorted(unknown))}.")
+    return [name for name in API_FIELDS if name in wanted]
+
+
+def read_json(request):
+    try:
+        return json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        raise bad_request("Request body must be JSON.")
+
+
+def as_raw(value):
+    # coerce() takes the strings a CSV cell would hold
+    return "" if value is None else str(value)
+
+
+def clean(data, partial=False):
+    """
+    ``(values, errors)`` for one JSON object. A partial object (an update)
+    yields and validates only the fields it names.
+    """
+    if not isinstance(data, dict):
+        return {}, {"non_field_errors": ["Expected an object."]}
+    errors = {
+        name: ["Unknown or read-only field."]
+        for name in data
+        if name not in WRITABLE_FIELDS
+    }
+    values, coerce_errors = coerce(
+        {name: as_raw(v) for name, v in data.items() if name in WRITABLE_FIELDS}
+    )
+    if partial:
+        values = {name: values[name] for name in data if name in WRITABLE_FIELDS}
+        coerce_errors = {k: v for k, v in coerce_errors.items() if k in values}
+    return values, {**errors, **coerce_errors}
+
+
+def clean_many(objects, partial=False):
+    """``clean`` for a batch, validating every object in one pass."""
+    cleaned = [clean(data, partial) for data in objects]
+    values = [row for row, _ in cleaned]
+    # Partial objects are validated on the fields they name (the stored
+    # values were validated on the way in), one pass per set of names.
+    shapes = {}
+    for index, row in enumerate(values):
+        shapes.setdefault(frozenset(row) if partial else None, []).append(index)
+    results = [{}] * len(values)
+    for shape, indexes in shapes.items():
+        rows = [values[index] for index in indexes]
+        for index, invalid in zip(
+            indexes, validate_many(rows, fields=shape, rules=import_rules())
+        ):
+            results[index] = invalid
+    errors = {}
+    for index, ((_, own_errors), invalid) in enumerate(zip(cleaned, results)):
+        if own_errors or invalid:
+            errors[index] = {**invalid, **own_errors}
+    return values, errors
+
+
+def serialize(contact, fields=API_FIELDS):
+    return {name: getattr(contact, name) for name in fields}
+
+
+def user_contacts(request):
+    return ContactList.objects.filter(user=request.user)
+
+
+def get_contact(request, pk):
+    contact = user_contacts(request).filter(pk=pk).first()
+    if contact is None:
+        raise not_found()
+    return contact
+
+
+@api_view("GET", "POST")
+def contact_collection(request):
+    if request.method == "POST":
+        return create_contact(request)
+    fields = requested_fields(request)
+    try:
+        limit = min(int(request.GET.get("limit", CONTACTS_PER_PAGE)), MAX_PAGE_SIZE)
+    except ValueError:
+        raise bad_request("limit must be a number.")
+    # The paging key is fetched with the projection and dropped from output
+    projection = list(dict.fromkeys([*fields, "id", "created_at"]))
+    rows = user_contacts(request).values(*projection)
+    try:
+        page = CursorPaginator(rows, max(limit, 1)).page(request.GET.get("cursor"))
+    except InvalidCursor:
+        raise bad_request("Invalid cursor.")
+    return JsonResponse(
+        {
+            "results": [{name: row[name] for name in fields} for row in page],
+            "next": page.next_cursor,
+            "previous": page.previous_cursor,
+        }
+    )
+
+
+def create_contact(request):
+    values, errors = clean_many([read_json(request)])
+    if errors:
+        raise ApiError(400, {"errors": errors[0]})
+    contact = ContactList(
+        user=request.user, created_by=request.user, updated_by=request.user, **values[0]
+    )
+    contact.save()
+    return JsonResponse(serialize(contact), status=201)
+
+
+@api_view("GET", "PATCH", "DELETE")
+def contact_resource(request, pk):
+    if request.method == "GET":
+        row = user_contacts(request).filter(pk=pk).values(*requested_fields(request))
+        if not row:
+            raise not_found()
+        return JsonResponse(row[0])
+
+    contact = get_contact(request, pk)
+    if request.method == "DELETE":
+        contact.delete()
+        return HttpResponse(status=204)
+
+    values, errors = clean_many([read_json(request)], partial=True)
+    if errors:
+        raise ApiError(400, {"errors": errors[0]})
+    for name, value in values[0].items():
+        setattr(contact, name, value)
+    contact.updated_by = request.user
+    contact.save()
+    return JsonResponse(serialize(contact))
+
+
+def batch_list(data, key):
+    objects = data.get(key) or []
+    if not isinstance(objects, list):
+        raise bad_request(f"{key} must be a list.")
+    return objects
+
+
+@api_view("POST")
+def contact_batch(request):
+    """
+    Create, update and delete in one transaction. Nothing is written unless
+    every object is valid; errors are keyed by operation and list index.
+    """
+    data = read_json(request)
+    if not isinstance(data, dict):
+        raise bad_request("Expected an object.")
+    creates = batch_list(data, "create")
+    updates = batch_list(data, "update")
+    deletes = batch_list(data, "delete")
+    if len(creates) + len(updates) + len(deletes) > MAX_BATCH_SIZE:
+        raise bad_request(f"At most {MAX_BATCH_SIZE} operations per batch.")
+
+    new_values, create_errors = clean_many(creates)
+    ids = [obj.pop("id", None) if isinstance(obj, dict) else None for obj in updates]
+    changes, update_errors = clean_many(updates, partial=True)
+    seen = set()
+    for index, pk in enumerate(ids):
+        # bool is an int subclass, but true is not a contact id
+        if type(pk) is not int:
+            update_errors.setdefault(index, {})["id"] = ["A contact id is required."]
+        elif pk in seen:
+            update_errors.setdefault(index, {})["id"] = [
+                "This contact is already updated earlier in the batch."
+            ]
+        seen.add(pk)
+    if not all(type(pk) is int for pk in deletes):
+        raise bad_request("delete must be a list of contact ids.")
+    errors = {
+        name: errors
+        for name, errors in (("create", create_errors), ("update", update_errors))
+        if errors
+    }
+    if errors:
+        raise ApiError(400, {"errors": errors})
+
+    with transaction.atomic():
+        created = create_many(request.user, new_values)
+        updated = update_many(request.user, dict(zip(ids, changes)))
+        deleted = delete_contacts(request.user, deletes)
+    return JsonResponse(
+        {
+            "created": [serialize(contact) for contact in created],
+            "updated": [serialize(contact) for contact in updated],
+            "deleted": deleted,
+        }
+    )
+
+
+def create_many(user, rows):
+    if not rows:
+        return []
+    contacts = [
+        ContactList(user=user, created_by=user, updated_by=user, **values)
+        for values in rows
+    ]
+    for contact in contacts:
+        contact.set_search_keys()
+    created = ContactList.objects.bulk_create(contacts)
+    bulk_contacts_changed.send(
+        sender=ContactList, user_id=user.pk, contacts=created, created=True
+    )
+    return created
+
+
+def update_many(user, changes):
+    """Apply ``{id: {field: value}}`` with one ``bulk_update``."""
+    if not changes:
+        return []
+    contacts = ContactList.objects.filter(user=user).in_bulk(list(changes))
+    missing = [pk for pk in changes if pk not in contacts]
+    if missing:
+        raise ApiError(404, {"detail": f"Contacts not found: {missing}."})
+    now = timezone.now()
+    fields = {"updated_at", "updated_by", "contact_reversed"}
+    before = {}
+    for pk, values in changes.items():
+        contact = contacts[pk]
+        before[pk] = contact.stats_state()
+        for name, value in values.items():
+            setattr(contact, name, value)
+        contact.set_search_keys()
+        contact.updated_at = now
+        contact.updated_by = user
+        fields.update(values)
+    updated = [contacts[pk] for pk in changes]
+    ContactList.objects.bulk_update(updated, sorted(fields))
+    # bulk_update skips post_save; ContactStats is adjusted here instead
+    stats.apply_changes(user.pk, [(before[c.pk], c.stats_state()) for c in updated])
+    bulk_contacts_changed.send(sender=ContactList, user_id=user.pk, contacts=updated)
+    return updated
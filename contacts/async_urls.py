@@ -0,0 +1,4 @@
+from . import async_views
+from .urls import contact_urlpatterns
+
+urlpatterns = contact_urlpatterns(async_views)
@@ -0,0 +1,217 @@
+"""
+Async versions of the read-heavy contact pages, served under ASGI.
+
+``backend/asgi.py`` routes requests through ``backend.asgi_urls``, which
+mounts ``contacts.async_urls``: the same URLs and names as
+``contacts.urls`` with these views in place of their counterparts in
+``contacts.views``. Queries use the async ORM; the search planner, which
+runs raw SQL, and numbered pages, which count, each take one
+``sync_to_async`` hop. The user is loaded with ``request.auser()`` and
+pinned on ``request.user``, so templates and the sync helpers never load
+it themselves. The export view streams its sync writers through
+``exporters.astream``.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import aget_object_or_404, render
+
+from accounts.views import title_tailwind_classes
+from .bulk import bulk_form_context
+from .conditional import (
+    alist_state,
+    contact_conditional,
+    contact_etag,
+    list_conditional,
+    list_etag,
+)
+from .exporters import astream
+from .facets import abrowse
+from .models import ContactList
+from .pagecache import cache_per_user
+from .pagination import anumber_page, apaginate, pagination_context
+from .planner import plan_search
+from .views import export_response
+
+
+def with_user(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@with_user
+@login_required
+@list_conditional
+@cache_per_user(list_etag)
+async def contact_list(request):
+    contacts = await apaginate(request, ContactList.objects.filter(user=request.user))
+    context = {
+        "title_tailwind_classes": title_tailwind_classes,
+        "contacts": contacts,
+        **pagination_context(contacts),
+        **bulk_form_context(),
+    }
+    return render(request, "contacts/contact_list.html", context)
+
+
+@with_user
+@login_required
+@contact_conditional
+@cache_per_user(contact_etag)
+async def contact_details(request, pk):
+    contact = await aget_object_or_404(ContactList, pk=pk, user=request.user)
+    context = {"contact": contact, "title_tailwind_classes": title_tailwind_classes}
+    return render(request, "contacts/contact_details.html", context)
+
+
+@with_user
+@login_required
+async def contact_search(request):
+    query = request.GET.get("q", "")
+    fuzzy = request.GET.get("mode") == "fuzzy"
+    fuzzy_fallback = False
+    contacts = ContactList.objects.filter(user=request.user)
+
+    plan = None
+
+    if query:
+        plan = plan_search(query, fuzzy=fuzzy)
+        ids = await sync_to_async(plan.execute)(request.user)
+        fuzzy_fallback = plan.used == "fuzzy" and not fuzzy
+        contacts_page = await anumber_page(request, ids)
+        by_id = await contacts.ain_bulk(contacts_page.object_list)
+        contacts_page.object_list = [
+            by_id[pk] for pk in contacts_page.object_list if pk in by_id
+        ]
+    else:
+        contacts_page = await anumber_page(
+            request, contacts.order_by("-created_at", "-id")
+        )
+
+    context = {
+        "contacts": contacts_page,
+        "query": query,
+        "fuzzy": fuzzy,
+        "fuzzy_fallback": fuzzy_fallback and bool(contacts_page.object_list),
+        **pagination_context(contacts_page),
+        "search_plan": plan if settings.CONTACT_SEARCH_DEBUG else None,
+        **bulk_form_context(),
+        "title_tailwind_classes": title_tailwind_classes,
+    }
+    response = render(request, "contacts/contact_search.html", context)
+    if settings.CONTACT_SEARCH_DEBUG and plan is not None:
+        response["X-Search-Plan"] = plan.header()
+    return response
+
+
+async def facet_page(request, field, template, values_name, selected_name):
+    filters, total, facets, contacts = await abrowse(
+        request.user, request.GET, await alist_state(request)
+    )
+    contacts = await apaginate(request, contacts)
+    context = {
+        values_name: facets[field],
+        selected_name: request.GET.get(field),
+        "total": total,
+        "contacts": contacts,
+        **pagination_context(contacts),
+        "title_tailwind_classes": title_tailwind_classes,
+    }
+    return render(request, template, context)
+
+
+@with_user
+@login_required
+@list_conditional
+@cache_per_user(list_etag)
+async def browse_contacts(request):
+    filters, total, facets, contacts = await abrowse(
+        request.user, request.GET, await alist_state(request)
+    )
+    contacts = await apaginate(request, contacts)
+    context = {
+        "facets": facets,
+        "filters": filters,
+        "total": total,
+        "contacts": contacts,
+        **pagination_context(contacts),
+        "title_tailwind_classes": title_tailwind_classes,
+    }
+    return render(request, "contacts/browse.html", context)
+
+
+@with_user
+@login_required
+@list_conditional
+@cache_per_user(list_etag)
+async def city_list(request):
+    return await facet_page(
+        request, "city", "contacts/city_list.html", "cities", "selected_city"
+    )
+
+
+@with_user
+@login_required
+@list_conditional
+@cache_per_user(list_etag)
+async def state_list(request):
+    return await facet_page(
+        request, "state", "contacts/state_list.html", "states", "selected_state"
+    )
+
+
+@with_user
+@login_required
+@list_conditional
+@cache_per_user(list_etag)
+async def country_list(request):
+    return await facet_page(
+        request,
+        "country",
+        "contacts/country_list.html",
+        "countries",
+        "selected_country",
+    )
+
+
+@with_user
+@login_required
+@list_conditional
+@cache_per_user(list_etag)
+async def contact_type_list(request):
+    return await facet_page(
+        request,
+        "contact_type",
+        "contacts/contact_type_list.html",
+        "contact_types",
+        "selected_type",
+    )
+
+
+@with_user
+@login_required
+@list_conditional
+@cache_per_user(list_etag)
+async def preferred_communication_list(request):
+    return await facet_page(
+        request,
+        "preferred_communication",
+        "contacts/preferred_communication_list.html",
+        "preferred_comms",
+        "selected_comm",
+    )
+
+
+@with_user
+@login_required
+async def export_contacts(request):
+    # The writers are sync generators; ASGI would read one to the end before
+    # sending a byte, so it goes out as an async iterator instead
+    return export_response(request, astream)
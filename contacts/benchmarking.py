@@ -0,0 +1,143 @@
+"""
+Helpers shared by the ``bench_*`` management commands: synthetic contacts
+and simple latency statistics.
+"""
+
+import random
+import time
+import uuid
+
+from accounts.models import CustomUser
+from .models import ContactList
+
+FIRST_NAMES = [
+    "Aarav",
+    "Aditi",
+    "Amit",
+    "Ananya",
+    "Arjun",
+    "Deepa",
+    "Farhan",
+    "Gauri",
+    "Ishaan",
+    "Kavya",
+    "Meera",
+    "Nikhil",
+    "Priya",
+    "Rahul",
+    "Rohan",
+    "Sanjay",
+    "Sneha",
+    "Tanvi",
+    "Varun",
+    "Zoya",
+    "John",
+    "Maria",
+    "David",
+    "Sarah",
+]
+LAST_NAMES = [
+    "Sharma",
+    "Patel",
+    "Iyer",
+    "Khan",
+    "Reddy",
+    "Joshi",
+    "Kulkarni",
+    "Mehta",
+    "Nair",
+    "Shinde",
+    "Gupta",
+    "Das",
+    "Smith",
+    "Garcia",
+    "Miller",
+    "Brown",
+]
+CITIES = [
+    ("Pune", "Maharashtra", "India"),
+    ("Mumbai", "Maharashtra", "India"),
+    ("Bengaluru", "Karnataka", "India"),
+    ("Chennai", "Tamil Nadu", "India"),
+    ("Delhi", "Delhi", "India"),
+    ("Austin", "Texas", "USA"),
+    ("Boston", "Massachusetts", "USA"),
+    ("London", "England", "United Kingdom"),
+]
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark Industries"]
+WORDS = ["met", "at", "conference", "school", "friend", "project", "call", "later"]
+
+
+def bench_user(label):
+    """A throwaway user; ``contact`` is unique so it cannot be left blank."""
+    token = uuid.uuid4().hex[:10]
+    return CustomUser.objects.create_user(
+        email=f"bench-{label}-{token}@example.com",
+        username=f"bench-{label}-{token}",
+        first_name="Bench",
+        last_name="User",
+        contact=str(int(token, 16))[:15],
+    )
+
+
+def synthetic_contacts(user, count, seed=0):
+    """Yield ``count`` unsaved, valid contacts for ``user``."""
+    rng = random.Random(seed)
+    types = [value for value, _ in ContactList.CONTACT_TYPE]
+    methods = [value for value, _ in ContactList.COMMUNICATION_METHOD]
+    for i in range(count):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        city, state, country = rng.choice(CITIES)
+        yield ContactList(
+            user=user,
+            first_name=first,
+            last_name=last,
+            contact=f"9{rng.randrange(10**9):09d}",
+            email=f"{first.lower()}.{last.lower()}{i}@example.com",
+            contact_type=rng.choice(types),
+            preferred_communication=rng.choice(methods),
+            gender=rng.choice(["Male", "Female", "Other"]),
+            company=rng.choice(COMPANIES),
+            address=f"{rng.randrange(1, 999)} Main Road",
+            city=city,
+            state=state,
+            country=country,
+            postal_code=f"{rng.randrange(100000, 999999)}",
+            notes=" ".join(rng.choices(WORDS, k=6)),
+            is_favorite=rng.random() < 0.1,
+        )
+
+
+def bulk_load(user, count, batch_size=5000, seed=0):
+    """Insert ``count`` synthetic contacts with bulk_create."""
+    batch = []
+    for contact in synthetic_contacts(user, count, seed):
+        contact.set_search_keys()
+        batch.append(contact)
+        if len(batch) >= batch_size:
+            ContactList.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ContactList.objects.bulk_create(batch)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def time_ms(fn, *args, **kwargs):
+    """Return ``(result, elapsed milliseconds)`` for one call."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def summarize(samples):
+    return "p50 {:8.2f} ms   p95 {:8.2f} ms   max {:8.2f} ms".format(
+        percentile(samples, 50), percentile(samples, 95), max(samples, default=0.0)
+    )
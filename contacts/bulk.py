@@ -0,0 +1,151 @@
+"""
+Bulk actions on a user's selected contacts, each run as set-based queries.
+
+The selection is always re-scoped with ``filter(user=..., pk__in=...)``, so
+ids from another account are ignored. Updates are a single ``UPDATE`` that
+also bumps ``updated_at`` (cached cards and conditional GET validators key
+on it); the ContactStats delta comes from one grouped query over the rows
+about to change. Deletes read what the bookkeeping needs in one query,
+delete with the per-contact post_delete receivers stood down and then
+update stats and the search index once for the whole set. Photo files are
+released by a background task, not in the request. The view asks for
+confirmation before a delete.
+"""
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from base.queue import enqueue
+from . import stats
+from .models import ContactList
+from .search import get_search_backend
+from .signals import deleting_in_bulk
+
+# action: (field, fixed value or None when the value is chosen)
+UPDATE_ACTIONS = {
+    "favorite": ("is_favorite", True),
+    "unfavorite": ("is_favorite", False),
+    "set_type": ("contact_type", None),
+    "set_communication": ("preferred_communication", None),
+}
+ACTIONS = ["delete", *UPDATE_ACTIONS]
+
+DONE_MESSAGES = {
+    "delete": "Deleted {n} contact{s}.",
+    "favorite": "Marked {n} contact{s} as favorite.",
+    "unfavorite": "Removed {n} contact{s} from favorites.",
+    "set_type": "Changed the type of {n} contact{s}.",
+    "set_communication": "Changed the preferred communication of {n} contact{s}.",
+}
+
+
+def run_bulk_action(user, action, ids, value=None):
+    """
+    Apply ``action`` to ``user``'s contacts ``ids``; returns how many
+    contacts changed. Raises ValueError for an unknown action or value.
+    """
+    if action == "delete":
+        return delete_contacts(user, ids)
+    if action not in UPDATE_ACTIONS:
+        raise ValueError("Choose an action.")
+    field, fixed = UPDATE_ACTIONS[action]
+    if fixed is None:
+        choices = dict(ContactList._meta.get_field(field).flatchoices)
+        if value not in choices:
+            raise ValueError(
+                f"Choose a {ContactList._meta.get_field(field).verbose_name}."
+            )
+        fixed = value
+    return update_contacts(user, ids, field, fixed)
+
+
+def chosen_value(action, data):
+    """
+    The value ``action`` sets, read from the bulk form's select for its
+    field (named after the field), so a value for another field is ignored.
+    """
+    field, fixed = UPDATE_ACTIONS.get(action, (None, True))
+    return data.get(field) if fixed is None else None
+
+
+def bulk_form_context():
+    """Choices for the bulk action form (contacts/bulk_actions.html)."""
+    return {
+        "contact_types": ContactList.CONTACT_TYPE,
+        "communication_methods": ContactList.COMMUNICATION_METHOD,
+    }
+
+
+def done_message(action, count):
+    return DONE_MESSAGES[action].format(n=count, s="" if count == 1 else "s")
+
+
+def grouped_states(contacts):
+    """``[(stats_state, n)]`` for ``contacts`` from one grouped query."""
+    rows = (
+        contacts.values("contact_type", "is_favorite")
+        .annotate(n=Count("id"), photos=Count("id", filter=Q(contact_photo__gt="")))
+        .order_by()
+    )
+    for row in rows:
+        state = (row["contact_type"], row["is_favorite"])
+        yield (*state, True), row["photos"]
+        yield (*state, False), row["n"] - row["photos"]
+
+
+@transaction.atomic
+def update_contacts(user, ids, field, value):
+    contacts = ContactList.objects.filter(user=user, pk__in=ids).exclude(
+        **{field: value}
+    )
+    changes = []
+    if field in ("contact_type", "is_favorite"):
+        position = 0 if field == "contact_type" else 1
+        for state, n in grouped_states(contacts):
+            new = list(state)
+            new[position] = value
+            changes.append((state, tuple(new), n))
+    count = contacts.update(
+        **{field: value}, updated_at=timezone.now(), updated_by=user
+    )
+    if count:
+        stats.apply_changes(user.pk, changes)
+    return count
+
+
+@transaction.atomic
+def delete_contacts(user, ids):
+    contacts = ContactList.objects.filter(user=user, pk__in=ids)
+    rows = list(
+        contacts.values_list(
+            "pk",
+            "contact_type",
+            "is_favorite",
+            "contact_photo",
+            "contact_photo_renditions",
+        )
+    )
+    if not rows:
+        return 0
+    pks = [row[0] for row in rows]
+    token = deleting_in_bulk.set(True)
+    try:
+        ContactList.objects.filter(user=user, pk__in=pks).delete()
+    finally:
+        deleting_in_bulk.reset(token)
+
+    stats.apply_changes(
+        user.pk, [((t, f, bool(photo)), None) for _, t, f, photo, _ in rows]
+    )
+    get_search_backend().remove(pks)
+    photos = [
+        name
+        for *_, photo, renditions in rows
+        if photo
+        for name in (photo, *renditions.values())
+    ]
+    if photos:
+        # Queued in this transaction, so a rollback keeps the files
+        enqueue("contacts.release_photos", names=photos)
+    return len(rows)
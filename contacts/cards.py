@@ -0,0 +1,66 @@
+"""
+Cached contact cards.
+
+Each card is rendered once per ``(pk, updated_at)`` and kept in the cache;
+a page fetches all of its cards with one ``get_many``, renders only the
+misses and stores them with one ``set_many``. Any save bumps
+``updated_at``, so an edited contact gets a new key and stale cards simply
+expire. Hits and misses are counted for ``card_cache_stats``.
+"""
+
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = "contacts/contact_card.html"
+# Bump when contact_card.html changes so old fragments are not served
+CARD_VERSION = 2
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+HITS_KEY = "contact-card:hits"
+MISSES_KEY = "contact-card:misses"
+
+
+def card_key(contact, compact):
+    variant = "compact" if compact else "full"
+    stamp = contact.updated_at.timestamp() if contact.updated_at else 0
+    return f"contact-card:v{CARD_VERSION}:{variant}:{contact.pk}:{stamp:.6f}"
+
+
+def count(key, n):
+    if n:
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key, n)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(key, n, None)
+
+
+def render_cards(contacts, compact=False):
+    """The cards of ``contacts`` as one HTML string, from cache where possible."""
+    keyed = [(card_key(contact, compact), contact) for contact in contacts]
+    cached = cache.get_many([key for key, _ in keyed])
+    rendered = {}
+    if len(cached) < len(keyed):
+        template = get_template(CARD_TEMPLATE)
+        for key, contact in keyed:
+            if key not in cached:
+                rendered[key] = template.render(
+                    {"contact": contact, "compact": compact}
+                )
+        cache.set_many(rendered, CARD_CACHE_TIMEOUT)
+    count(HITS_KEY, len(cached))
+    count(MISSES_KEY, len(rendered))
+    return mark_safe("".join(cached.get(key) or rendered[key] for key, _ in keyed))
+
+
+def card_cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / lookups, 4) if lookups else None,
+    }
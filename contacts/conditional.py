@@ -0,0 +1,121 @@
+"""
+Conditional GET for contact pages.
+
+Validators come from ``ContactList.updated_at``: a contact's own for its
+detail page (as ETag and Last-Modified), and the user's latest
+``updated_at`` plus their contact count (so deletes count too) for list and
+filter pages. The latest is one seek on the ``(user, updated_at)`` index
+and the count comes from ContactStats, so nothing is counted. List pages
+send no Last-Modified: deleting any but the newest contact leaves the
+latest ``updated_at`` as it was, so only the ETag can tell the page
+changed. Django's ``condition`` answers ``If-None-Match`` (and
+``If-Modified-Since`` for a contact) with a 304 after those small queries,
+before the view runs its main query or renders anything.
+Responses are marked ``private, no-cache`` so browsers always revalidate.
+"""
+
+import hashlib
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.contrib.messages import get_messages
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import stats
+from .models import ContactList
+from .pagecache import csrf_key
+
+
+def list_state(request):
+    """``stats.contact_state`` of the user, once per request."""
+    if not hasattr(request, "_contact_list_state"):
+        request._contact_list_state = stats.contact_state(request.user)
+    return request._contact_list_state
+
+
+async def alist_state(request, *args, **kwargs):
+    if not hasattr(request, "_contact_list_state"):
+        request._contact_list_state = await stats.acontact_state(request.user)
+    return request._contact_list_state
+
+
+def list_etag(request, *args, **kwargs):
+    latest, count = list_state(request)
+    stamp = latest.timestamp() if latest else 0
+    # The same contacts render differently per page, filter and user, and
+    # the bulk action form carries a token for the current CSRF secret
+    seed = (
+        f"{request.user.pk}:{csrf_key(request)}:{request.get_full_path()}:"
+        f"{stamp}:{count}"
+    )
+    return hashlib.md5(seed.encode()).hexdigest()
+
+
+def contact_change(request, pk):
+    return ContactList.objects.filter(pk=pk, user=request.user).values_list(
+        "updated_at", flat=True
+    )
+
+
+def contact_updated_at(request, pk):
+    if not hasattr(request, "_contact_updated_at"):
+        request._contact_updated_at = contact_change(request, pk).first()
+    return request._contact_updated_at
+
+
+async def aload_contact_updated_at(request, pk):
+    if not hasattr(request, "_contact_updated_at"):
+        request._contact_updated_at = await contact_change(request, pk).afirst()
+
+
+def contact_etag(request, pk):
+    updated_at = contact_updated_at(request, pk)
+    if updated_at is not None:
+        return f"{request.user.pk}-{pk}-{updated_at.timestamp()}"
+
+
+def conditional(etag_func, last_modified_func, aload):
+    """
+    ``condition`` for pages that can carry flash messages: a response with
+    messages gets no validators, so a browser never revalidates its cached
+    copy of a message back into view.
+
+    For async views ``aload`` fetches the validators' rows with the async
+    ORM first; ``etag_func`` and ``last_modified_func`` (if any) then only
+    read what it stored on the request.
+    """
+
+    def decorator(view):
+        conditional_view = condition(etag_func, last_modified_func)(view)
+
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if len(get_messages(request)):
+                    return await view(request, *args, **kwargs)
+                await aload(request, *args, **kwargs)
+                response = await conditional_view(request, *args, **kwargs)
+                patch_cache_control(response, private=True, no_cache=True)
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if len(get_messages(request)):
+                return view(request, *args, **kwargs)
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+list_conditional = conditional(list_etag, None, alist_state)
+contact_conditional = conditional(
+    contact_etag, contact_updated_at, aload_contact_updated_at
+)
@@ -0,0 +1,316 @@
+"""
+Duplicate detection and merging for a user's contacts.
+
+Comparing every pair of contacts is quadratic, so candidates come from
+blocking: contacts are grouped by normalized phone number, lower-cased
+email, address and a Soundex key of the name, and only contacts sharing a block are
+compared. Blocks larger than ``MAX_BLOCK_SIZE`` (a common name, a shared
+office number) say little about identity and are skipped. Candidate pairs
+are scored together and pairs at or above the threshold are joined into
+clusters with union-find, so A~B and B~C put A, B and C in one cluster.
+"""
+
+from difflib import SequenceMatcher
+from functools import lru_cache
+from itertools import combinations
+
+from django.db import transaction
+
+from base.queue import enqueue
+from .bulk import delete_contacts
+from .importer import IMPORT_FIELDS
+from .models import ContactList
+from .stats import apply_changes
+
+MAX_BLOCK_SIZE = 50
+DEFAULT_THRESHOLD = 0.7
+
+# A shared phone, email or address alone is not enough (families share a
+# landline and a home); together with a similar name it is. Contacts whose
+# names are less alike than MIN_NAME_SIMILARITY are never duplicates.
+PHONE_WEIGHT = 0.5
+EMAIL_WEIGHT = 0.5
+ADDRESS_WEIGHT = 0.4
+NAME_WEIGHT = 0.4
+MIN_NAME_SIMILARITY = 0.5
+
+# Numbers are compared on their last ten digits, ignoring country codes
+PHONE_DIGITS = 10
+MIN_PHONE_DIGITS = 7
+
+RECORD_FIELDS = [
+    "id",
+    "first_name",
+    "last_name",
+    "contact",
+    "alternate_contact",
+    "email",
+    "alternate_email",
+    "address",
+    "postal_code",
+]
+
+SOUNDEX_CODES = {
+    **dict.fromkeys("BFPV", "1"),
+    **dict.fromkeys("CGJKQSXZ", "2"),
+    **dict.fromkeys("DT", "3"),
+    "L": "4",
+    **dict.fromkeys("MN", "5"),
+    "R": "6",
+}
+
+
+# Names repeat a lot across an address book
+@lru_cache(maxsize=65536)
+def soundex(name):
+    """American Soundex: ``Robert`` and ``Rupert`` are both ``R163``."""
+    letters = [c for c in name.upper() if "A" <= c <= "Z"]
+    if not letters:
+        return ""
+    code = [letters[0]]
+    last = SOUNDEX_CODES.get(letters[0], "")
+    for letter in letters[1:]:
+        digit = SOUNDEX_CODES.get(letter, "")
+        if digit and digit != last:
+            code.append(digit)
+            if len(code) == 4:
+                break
+        # H and W do not separate letters with the same code; vowels do
+        if letter not in "HW":
+            last = digit
+    return "".join(code).ljust(4, "0")
+
+
+def normalize_phone(value):
+    digits = "".join(c for c in value or "" if c.isdigit())
+    return digits[-PHONE_DIGITS:] if len(digits) >= MIN_PHONE_DIGITS else ""
+
+
+class Record:
+    """The comparable parts of one contact, normalized once."""
+
+    __slots__ = ("id", "name", "phones", "emails", "place", "sound")
+
+    def __init__(
+        self, id, first_name, last_name, phone, phone2, email, email2, address, postal
+    ):
+        phones = {normalize_phone(phone), normalize_phone(phone2)}
+        emails = {(email or "").strip().lower(), (email2 or "").strip().lower()}
+        self.id = id
+        self.name = (first_name.lower().strip(), last_name.lower().strip())
+        self.phones = frozenset(phones - {""})
+        self.emails = frozenset(emails - {""})
+        self.place = " ".join(f"{address} {postal}".lower().split())
+        self.sound = soundex(first_name) + soundex(last_name)
+
+    def blocking_keys(self):
+        yield from (("phone", phone) for phone in self.phones)
+        yield from (("email", email) for email in self.emails)
+        if self.place:
+            yield ("place", self.place)
+        if self.sound:
+            yield ("name", self.sound)
+
+
+def load_records(user):
+    return [
+        Record(*row)
+        for row in ContactList.objects.filter(user=user)
+        .values_list(*RECORD_FIELDS)
+        .iterator(chunk_size=5000)
+    ]
+
+
+def candidate_pairs(records, max_block_size=MAX_BLOCK_SIZE):
+    """Index pairs ``(i, j)``, ``i < j``, of records sharing a usable block."""
+    blocks = {}
+    for index, record in enumerate(records):
+        for key in record.blocking_keys():
+            blocks.setdefault(key, []).append(index)
+    pairs = set()
+    for members in blocks.values():
+        if 1 < len(members) <= max_block_size:
+            pairs.update(combinations(members, 2))
+    return pairs
+
+
+def similarity(a, b):
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def name_similarity(a, b):
+    """
+    Product of the first- and last-name similarities, each 0..1. Comparing
+    the parts separately keeps a shared surname from making relatives look
+    alike.
+    """
+    return similarity(a[0], b[0]) * similarity(a[1], b[1])
+
+
+def score_pairs(records, pairs, threshold=DEFAULT_THRESHOLD):
+    """
+    ``[(i, j, score)]`` for the candidate pairs that can reach
+    ``threshold``. The exact-match signals are summed first; the name
+    comparison, the only expensive part, runs only for pairs they leave
+    in contention.
+    """
+    scored = []
+    for i, j in pairs:
+        a, b = records[i], records[j]
+        score = 0.0
+        if a.phones & b.phones:
+            score += PHONE_WEIGHT
+        if a.emails & b.emails:
+            score += EMAIL_WEIGHT
+        if a.place and a.place == b.place:
+            score += ADDRESS_WEIGHT
+        if score + NAME_WEIGHT < threshold:
+            continue
+        names = name_similarity(a.name, b.name)
+        if names < MIN_NAME_SIMILARITY:
+            continue
+        scored.append((i, j, min(score + NAME_WEIGHT * names, 1.0)))
+    return scored
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent
+        root = item
+        while parent.get(root, root) != root:
+            root = parent[root]
+        # Path compression: point everything on the way at the root
+        while item != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, a, b):
+        self.parent.setdefault(a, a)
+        self.parent.setdefault(b, b)
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def cluster(records, scored, threshold=DEFAULT_THRESHOLD):
+    """Clusters of contact ids, largest first, each sorted oldest (lowest id) first."""
+    sets = UnionFind()
+    for i, j, score in scored:
+        if score >= threshold:
+            sets.union(i, j)
+    groups = {}
+    for index in list(sets.parent):
+        groups.setdefault(sets.find(index), []).append(records[index].id)
+    return sorted(
+        (sorted(ids) for ids in groups.values()), key=lambda ids: (-len(ids), ids[0])
+    )
+
+
+def find_duplicates(user, threshold=DEFAULT_THRESHOLD):
+    """Clusters of likely duplicate contact ids for ``user``."""
+    records = load_records(user)
+    scored = score_pairs(records, candidate_pairs(records), threshold)
+    return cluster(records, scored, threshold)
+
+
+def distinct(values, key=lambda value: value):
+    """
+    ``values`` without blanks or repeats by ``key``. A value whose key is
+    empty (a number too short to normalize) is compared as it is.
+    """
+    seen, result = set(), []
+    for value in values:
+        if not value:
+            continue
+        marker = key(value) or value
+        if marker not in seen:
+            seen.add(marker)
+            result.append(value)
+    return result
+
+
+@transaction.atomic
+def merge_contacts(user, keep_id, ids):
+    """
+    Fold the contacts ``ids`` into ``keep_id`` and delete them.
+
+    Blank fields of the kept contact are filled from the others (most
+    recently updated first), phones and emails fill the alternate slots
+    (any beyond those are listed in the notes, so none is lost), notes are
+    concatenated and the photo is adopted if the kept contact has none.
+    Returns how many contacts were folded in; ids that are not ``user``'s
+    are skipped. Raises ContactList.DoesNotExist if ``keep_id`` is not one
+    of ``user``'s contacts.
+    """
+    contacts = {
+        c.pk: c
+        for c in ContactList.objects.select_for_update()
+        .filter(user=user, pk__in={keep_id, *ids})
+        .order_by("-updated_at", "-id")
+    }
+    keep = contacts.pop(keep_id, None)
+    if keep is None:
+        raise ContactList.DoesNotExist(f"No contact {keep_id} for {user}.")
+    others = list(contacts.values())
+    if not others:
+        return 0
+    everyone = [keep, *others]
+
+    special = {"contact", "alternate_contact", "email", "alternate_email", "notes"}
+    for field in IMPORT_FIELDS:
+        if field in special or field == "is_favorite":
+            continue
+        if getattr(keep, field) in (None, ""):
+            for other in others:
+                if getattr(other, field) not in (None, ""):
+                    setattr(keep, field, getattr(other, field))
+                    break
+
+    phones = distinct(
+        (v for c in everyone for v in (c.contact, c.alternate_contact)),
+        key=normalize_phone,
+    )
+    emails = distinct(
+        (v for c in everyone for v in (c.email, c.alternate_email)),
+        key=str.lower,
+    )
+    keep.contact = phones[0] if phones else keep.contact
+    keep.alternate_contact = phones[1] if len(phones) > 1 else ""
+    keep.email = emails[0] if emails else None
+    keep.alternate_email = emails[1] if len(emails) > 1 else None
+    notes = distinct(c.notes.strip() for c in everyone)
+    if len(phones) > 2:
+        notes.append("Other numbers: " + ", ".join(phones[2:]))
+    if len(emails) > 2:
+        notes.append("Other emails: " + ", ".join(emails[2:]))
+    keep.notes = "\n\n".join(notes)
+    keep.is_favorite = any(c.is_favorite for c in everyone)
+
+    donor = None
+    if not keep.contact_photo:
+        donor = next((c for c in others if c.contact_photo), None)
+    if donor is not None:
+        # The stored files change owner; the donor's row is cleared first so
+        # deleting it does not release them.
+        keep.contact_photo = donor.contact_photo.name
+        keep.contact_photo_renditions = donor.contact_photo_renditions
+        keep.contact_photo_hash = donor.contact_photo_hash
+        keep.photo_pending = donor.photo_pending
+        ContactList.objects.filter(pk=donor.pk).update(
+            contact_photo="", contact_photo_renditions={}, photo_pending=False
+        )
+        donor_type, donor_favorite, _ = donor.stats_state()
+        apply_changes(
+            user.pk, [(donor.stats_state(), (donor_type, donor_favorite, False))]
+        )
+
+    keep.updated_by = user
+    keep.save()
+    if donor is not None and keep.photo_pending:
+        enqueue("contacts.process_contact_photo", contact_id=keep.pk)
+    return delete_contacts(user, [c.pk for c in others])
@@ -0,0 +1,233 @@
+"""
+Streaming exports of a user's contacts.
+
+Each writer is a generator of byte chunks meant for StreamingHttpResponse.
+The header goes out before the query runs, rows come from a ``values_list``
+projection read with ``iterator(chunk_size=...)``, and nothing accumulates,
+so memory stays flat however large the address book is. Columns match
+``contacts.importer.IMPORT_FIELDS`` so an export can be imported again.
+
+Under ASGI, Django collects a sync iterator into a list before sending
+anything; ``astream`` hands the same chunks over as an async iterator, a
+batch per thread hop, so the export still streams.
+"""
+
+import csv
+import re
+import zipfile
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from xml.sax.saxutils import escape
+
+from base.storage import photo_storage
+from .importer import IMPORT_FIELDS
+from .models import ContactList
+from .vcard import vcard_cards
+
+EXPORT_FIELDS = IMPORT_FIELDS
+EXPORT_CHUNK_SIZE = 2000
+# Bytes of a sync writer's output that ``astream`` gathers per thread hop
+ASTREAM_BATCH_BYTES = 64 * 1024
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "vcf": "text/vcard; charset=utf-8",
+}
+
+
+def export_rows(user, fields=EXPORT_FIELDS, chunk_size=EXPORT_CHUNK_SIZE):
+    return (
+        ContactList.objects.filter(user=user)
+        .order_by("-created_at", "-id")
+        .values_list(*fields)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class Echo:
+    """File-like object whose write() hands back what was written."""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(user):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS).encode()
+    for row in export_rows(user):
+        yield writer.writerow(row).encode()
+
+
+def jsonl_stream(user):
+    encoder = DjangoJSONEncoder()
+    for row in export_rows(user):
+        yield (encoder.encode(dict(zip(EXPORT_FIELDS, row))) + "\n").encode()
+
+
+# --- XLSX -----------------------------------------------------------------
+#
+# An .xlsx file is a zip of XML parts. The fixed parts are written up
+# front; the worksheet is written row by row into a zip entry that is
+# streamed out as it grows (zipfile writes data descriptors when the
+# output is not seekable). Cells use inline strings, so no shared string
+# table has to be built before the first row is sent.
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" '
+        'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Contacts" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font/></fonts>'
+        '<fills count="1"><fill/></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="1"><xf/></cellXfs>'
+        "</styleSheet>"
+    ),
+}
+
+SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    "<sheetData>"
+)
+SHEET_END = "</sheetData></worksheet>"
+
+# Characters XML 1.0 does not allow, even escaped
+XML_ILLEGAL_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def xlsx_cell(value):
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, date):
+        value = value.isoformat()
+    text = escape(XML_ILLEGAL_RE.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def xlsx_row(values):
+    return "<row>" + "".join(xlsx_cell(value) for value in values) + "</row>"
+
+
+class ChunkBuffer:
+    """Unseekable zip output that collects written bytes until drained."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def xlsx_stream(user, rows_per_flush=500):
+    buffer = ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write((SHEET_START + xlsx_row(EXPORT_FIELDS)).encode())
+            yield buffer.drain()
+            pending = []
+            for row in export_rows(user):
+                pending.append(xlsx_row(row))
+                if len(pending) >= rows_per_flush:
+                    sheet.write("".join(pending).encode())
+                    pending = []
+                    yield buffer.drain()
+            sheet.write(("".join(pending) + SHEET_END).encode())
+    yield buffer.drain()
+
+
+def vcard_stream(user, version="3.0", photos="url", absolute_uri=None):
+    """One card per contact; see ``contacts.vcard.vcard_cards`` for ``photos``."""
+    fields = [*EXPORT_FIELDS, "contact_photo", "contact_photo_renditions"]
+    rows = (dict(zip(fields, row)) for row in export_rows(user, fields))
+    for text in vcard_cards(rows, photo_storage(), version, photos, absolute_uri):
+        yield text.encode()
+
+
+WRITERS = {
+    "csv": csv_stream,
+    "jsonl": jsonl_stream,
+    "xlsx": xlsx_stream,
+    "vcf": vcard_stream,
+}
+
+
+async def astream(chunks, batch_bytes=ASTREAM_BATCH_BYTES):
+    """
+    Serve the sync iterator ``chunks`` as an async iterator. Each hop to
+    the ORM's thread reads chunks until about ``batch_bytes`` are ready, so
+    at most one batch is held at a time.
+    """
+    chunks = iter(chunks)
+
+    def next_batch():
+        batch, size = [], 0
+        for chunk in chunks:
+            batch.append(chunk)
+            size += len(chunk)
+            if size >= batch_bytes:
+                break
+        return batch
+
+    try:
+        while batch := await sync_to_async(next_batch)():
+            for chunk in batch:
+                yield chunk
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            await sync_to_async(close)()
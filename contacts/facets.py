@@ -0,0 +1,170 @@
+"""
+Faceted browsing over a user's contacts.
+
+All facet counts come from one grouped aggregate over the facet columns.
+Its rows (one per distinct combination of facet values) are cached per
+user and keyed on ``stats.contact_state``, read from the database, so a
+write anywhere (any worker, any transaction) moves the rows to a new key
+without invalidating anything. Counts for any mix of filters are then
+derived in Python without touching the database again.
+"""
+
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from . import stats
+from .models import ContactList
+
+FACET_FIELDS = [
+    "city",
+    "state",
+    "country",
+    "contact_type",
+    "preferred_communication",
+    "is_favorite",
+]
+
+FACET_CACHE_TIMEOUT = 60 * 60
+
+CHOICE_LABELS = {
+    "contact_type": dict(ContactList.CONTACT_TYPE),
+    "preferred_communication": dict(ContactList.COMMUNICATION_METHOD),
+    "is_favorite": {True: "Favorite", False: "Not favorite"},
+}
+
+
+def facet_cache_key(user_id, state):
+    latest, count = state
+    stamp = latest.timestamp() if latest else 0
+    return f"contacts:facets:{user_id}:{stamp}:{count}"
+
+
+def facet_query(user):
+    return (
+        ContactList.objects.filter(user=user)
+        .values(*FACET_FIELDS)
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+
+
+def facet_row(row):
+    return tuple(row[field] for field in FACET_FIELDS), row["n"]
+
+
+def facet_rows(user, state=None):
+    """
+    ``[(values_tuple, count), ...]`` for every facet value combination.
+    ``state`` is the user's ``stats.contact_state``, if already read.
+    """
+    key = facet_cache_key(user.pk, state or stats.contact_state(user))
+    rows = cache.get(key)
+    if rows is None:
+        rows = [facet_row(row) for row in facet_query(user)]
+        cache.set(key, rows, FACET_CACHE_TIMEOUT)
+    return rows
+
+
+async def afacet_rows(user, state=None):
+    """``facet_rows`` for async views."""
+    key = facet_cache_key(user.pk, state or await stats.acontact_state(user))
+    rows = cache.get(key)
+    if rows is None:
+        rows = [facet_row(row) async for row in facet_query(user)]
+        cache.set(key, rows, FACET_CACHE_TIMEOUT)
+    return rows
+
+
+def parse_value(field, raw):
+    if field == "is_favorite":
+        return raw.lower() in ("1", "true", "yes", "on")
+    return raw
+
+
+def parse_filters(params):
+    """Map request parameters to ``{field: set(values)}``; blanks are ignored."""
+    filters = {}
+    for field in FACET_FIELDS:
+        values = {parse_value(field, raw) for raw in params.getlist(field) if raw}
+        if values:
+            filters[field] = values
+    return filters
+
+
+def filter_queryset(queryset, filters):
+    for field, values in filters.items():
+        queryset = queryset.filter(**{f"{field}__in": values})
+    return queryset
+
+
+class FacetValue:
+    def __init__(self, field, value, count, selected):
+        self.field = field
+        self.value = value
+        self.count = count
+        self.selected = selected
+        self.label = CHOICE_LABELS.get(field, {}).get(value, value)
+        # Value as it appears in a query string
+        self.param = ("1" if value else "0") if field == "is_favorite" else value
+
+    # Lets templates unpack ``{% for value, count in facet %}``
+    def __iter__(self):
+        return iter((self.value, self.count))
+
+    def __len__(self):
+        return 2
+
+
+def facet_counts(rows, filters):
+    """
+    Count values of every facet among contacts matching ``filters``.
+
+    A facet's own filter is ignored when counting that facet, so the counts
+    show what selecting another value would yield. Returns
+    ``(total, {field: [FacetValue, ...]})``.
+    """
+    counts = {field: Counter() for field in FACET_FIELDS}
+    total = 0
+    for values, n in rows:
+        row = dict(zip(FACET_FIELDS, values))
+        failing = [f for f, allowed in filters.items() if row[f] not in allowed]
+        if len(failing) > 1:
+            continue
+        if not failing:
+            total += n
+        for field in FACET_FIELDS:
+            if failing and failing != [field]:
+                continue
+            if row[field] not in (None, ""):
+                counts[field][row[field]] += n
+    facets = {
+        field: [
+            FacetValue(field, value, count, value in filters.get(field, ()))
+            for value, count in sorted(counts[field].items(), key=lambda kv: kv[0])
+        ]
+        for field in FACET_FIELDS
+    }
+    return total, facets
+
+
+def browse(user, params, state=None):
+    """
+    Facets, total and filtered queryset for ``params``.
+
+    Returns ``(filters, total, facets, queryset)``; the queryset is left
+    unpaginated for the caller.
+    """
+    filters = parse_filters(params)
+    total, facets = facet_counts(facet_rows(user, state), filters)
+    queryset = filter_queryset(ContactList.objects.filter(user=user), filters)
+    return filters, total, facets, queryset
+
+
+async def abrowse(user, params, state=None):
+    """``browse`` for async views."""
+    filters = parse_filters(params)
+    total, facets = facet_counts(await afacet_rows(user, state), filters)
+    queryset = filter_queryset(ContactList.objects.filter(user=user), filters)
+    return filters, total, facets, queryset
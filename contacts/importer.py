@@ -0,0 +1,258 @@
+"""
+Bulk contact import.
+
+``import_rows`` takes any iterable of raw field mappings (``read_csv`` and
+``contacts.vcard.read_vcards`` provide them for CSV and vCard files;
+``reader_for`` picks one by file name) and consumes it a chunk at a time: coerce,
+validate the whole chunk with ``validate_many``, ``bulk_create`` the valid
+rows and commit the job's progress in one short transaction. Memory use
+stays flat whatever the file size, and a job that is interrupted resumes
+after its last committed chunk.
+"""
+
+import csv
+import io
+import os
+from datetime import date
+from functools import cache
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from base.images import ImageRejected, content_hash, inspect_image
+from base.queue import enqueue
+from .models import ContactList, ImportJob
+from .signals import bulk_contacts_changed
+from .validation import model_rules, validate_many
+from .vcard import read_vcards
+
+DEFAULT_CHUNK_SIZE = 1000
+# Rows with an embedded photo per chunk; each holds an open temporary file
+MAX_PHOTOS_PER_CHUNK = 50
+PHOTO_EXTENSIONS = {"JPEG": "jpg", "PNG": "png"}
+# Rejected rows kept on the job for reporting; the count is always exact.
+MAX_REPORTED_ERRORS = 1000
+
+# Columns an import may set; anything else in the file is ignored
+IMPORT_FIELDS = [
+    "first_name",
+    "last_name",
+    "contact",
+    "alternate_contact",
+    "email",
+    "alternate_email",
+    "contact_type",
+    "preferred_communication",
+    "date_of_birth",
+    "gender",
+    "nickname",
+    "job_title",
+    "company",
+    "website",
+    "address",
+    "city",
+    "state",
+    "country",
+    "postal_code",
+    "linkedin_username",
+    "twitter_username",
+    "facebook_username",
+    "instagram_username",
+    "notes",
+    "is_favorite",
+]
+NULLABLE_FIELDS = {"email", "alternate_email", "preferred_communication"}
+TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+
+
+@cache
+def import_rules():
+    return model_rules(ContactList, IMPORT_FIELDS)
+
+
+def column_name(header):
+    return header.strip().lower().replace(" ", "_").replace("-", "_")
+
+
+def read_csv(stream, skip=0):
+    """
+    Yield one dict per data row of a CSV file opened in binary or text
+    mode, after the first ``skip`` rows.
+    """
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [column_name(h) for h in header]
+    for values in islice(reader, skip, None):
+        yield dict(zip(columns, values))
+
+
+READERS = {".csv": read_csv, ".vcf": read_vcards, ".vcard": read_vcards}
+
+
+def reader_for(name):
+    """The row reader for a source file, chosen by extension (CSV by default)."""
+    return READERS.get(os.path.splitext(name)[1].lower(), read_csv)
+
+
+def coerce(raw):
+    """
+    Turn raw strings into model values.
+
+    Returns ``(row, errors)``; conversion errors use the same
+    ``{field: [message]}`` shape as validation errors.
+    """
+    row = {}
+    errors = {}
+    photo = raw.get("contact_photo")
+    if photo is not None:
+        # Embedded photos (vCard) get the same header check as uploads
+        try:
+            if getattr(photo, "corrupt", False):
+                raise ImageRejected("The embedded photo is not valid base64.")
+            fmt, _, _ = inspect_image(photo)
+            photo.name = f"photo.{PHOTO_EXTENSIONS[fmt]}"
+            row["contact_photo"] = photo
+        except ImageRejected as e:
+            errors["contact_photo"] = [str(e)]
+    for field in IMPORT_FIELDS:
+        value = (raw.get(field) or "").strip()
+        if field == "is_favorite":
+            row[field] = value.lower() in TRUE_VALUES
+        elif field == "date_of_birth":
+            if value:
+                try:
+                    row[field] = date.fromisoformat(value)
+                except ValueError:
+                    errors[field] = ["Enter a valid date (YYYY-MM-DD)."]
+            else:
+                row[field] = None
+        elif field == "contact_type":
+            row[field] = value.lower() or "personal"
+        elif field == "preferred_communication":
+            row[field] = value.lower() or None
+        elif field in NULLABLE_FIELDS and not value:
+            row[field] = None
+        else:
+            row[field] = value
+    return row, errors
+
+
+def import_chunk(job, chunk, first_row):
+    """Validate and insert one chunk; returns the contacts created."""
+    coerced = [coerce(raw) for raw in chunk]
+    rows = [row for row, _ in coerced]
+    contacts = []
+    rejects = []
+    for number, (row, coerce_errors), errors in zip(
+        range(first_row, first_row + len(chunk)),
+        coerced,
+        validate_many(rows, rules=import_rules()),
+    ):
+        errors = {**errors, **coerce_errors}
+        if errors:
+            rejects.append({"row": number, "errors": errors})
+            continue
+        contact = ContactList(user_id=job.user_id, created_by_id=job.user_id, **row)
+        contact.set_search_keys()
+        if contact.contact_photo:
+            # Stored raw by bulk_create; compressed by the photo task
+            contact.contact_photo_hash = content_hash(contact.contact_photo)
+            contact.photo_pending = True
+        contacts.append(contact)
+
+    with transaction.atomic():
+        created = ContactList.objects.bulk_create(contacts)
+        for contact in created:
+            if contact.photo_pending:
+                enqueue("contacts.process_contact_photo", contact_id=contact.pk)
+        job.rows_done += len(chunk)
+        job.imported += len(created)
+        job.rejected += len(rejects)
+        room = MAX_REPORTED_ERRORS - len(job.errors)
+        if room > 0:
+            job.errors.extend(rejects[:room])
+        job.save(
+            update_fields=["rows_done", "imported", "rejected", "errors", "updated_at"]
+        )
+        bulk_contacts_changed.send(
+            sender=ContactList, user_id=job.user_id, contacts=created, created=True
+        )
+    for raw in chunk:
+        if raw.get("contact_photo") is not None:
+            raw["contact_photo"].close()
+    return created
+
+
+def next_chunk(rows, size):
+    """
+    Up to ``size`` rows, ending early once MAX_PHOTOS_PER_CHUNK rows carry
+    a photo: each photo is an open temporary file until its chunk is stored.
+    """
+    chunk, photos = [], 0
+    for raw in rows:
+        chunk.append(raw)
+        photos += raw.get("contact_photo") is not None
+        if len(chunk) >= size or photos >= MAX_PHOTOS_PER_CHUNK:
+            break
+    return chunk
+
+
+def import_rows(job, rows, progress=None, skipped=0):
+    """
+    Import ``rows`` (raw field mappings) into ``job.user``'s contacts.
+
+    The first ``job.rows_done`` rows are skipped, which resumes an
+    interrupted job; ``skipped`` says how many of them the reader has
+    already passed over (see ``open_rows``). ``progress(job)`` is called
+    after every chunk.
+    """
+    job.status = ImportJob.RUNNING
+    job.started_at = job.started_at or timezone.now()
+    job.save(update_fields=["status", "started_at", "updated_at"])
+
+    rows = islice(rows, max(job.rows_done - skipped, 0), None)
+    while True:
+        chunk = next_chunk(rows, job.chunk_size)
+        if not chunk:
+            break
+        # Row numbers are 1-based data rows, not counting the header
+        import_chunk(job, chunk, job.rows_done + 1)
+        if progress is not None:
+            progress(job)
+
+    job.status = ImportJob.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at", "updated_at"])
+    return job
+
+
+def open_rows(job, source, name):
+    """
+    The reader for ``source`` (a file called ``name``), told to skip the
+    rows ``job`` has done so a resumed vCard import decodes no photos it
+    would throw away. Pass ``skipped=job.rows_done`` to ``import_rows``.
+    """
+    return reader_for(name)(source, skip=job.rows_done)
+
+
+def run_job(job, progress=None):
+    """
+    Run ``job`` from its stored source file, recording a failure on the job.
+    The file is deleted once the job is done.
+    """
+    try:
+        with job.source.open("rb") as source:
+            rows = open_rows(job, source, job.source_name)
+            import_rows(job, rows, progress, skipped=job.rows_done)
+    except Exception as e:
+        job.status = ImportJob.FAILED
+        job.last_error = str(e)
+        job.save(update_fields=["status", "last_error", "updated_at"])
+        raise
+    job.release_source()
+    return job
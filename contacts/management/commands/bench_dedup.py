@@ -0,0 +1,88 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from contacts.benchmarking import bench_user, bulk_load, time_ms
+from contacts.dedup import candidate_pairs, cluster, load_records, score_pairs
+from contacts.models import ContactList
+
+
+def typo(name, rng):
+    """Swap two adjacent letters, the commonest data-entry slip."""
+    if len(name) < 3:
+        return name
+    i = rng.randrange(1, len(name) - 1)
+    return name[:i] + name[i + 1] + name[i] + name[i + 2 :]
+
+
+def plant_duplicates(user, fraction, seed=0):
+    """Copy a fraction of ``user``'s contacts with small edits; returns the pairs."""
+    rng = random.Random(seed)
+    originals = list(ContactList.objects.filter(user=user).order_by("id"))
+    chosen = rng.sample(originals, int(len(originals) * fraction))
+    copies = []
+    for original in chosen:
+        copy = ContactList(
+            **{
+                f.attname: getattr(original, f.attname)
+                for f in ContactList._meta.concrete_fields
+                if not f.primary_key
+            }
+        )
+        copy.first_name = typo(original.first_name, rng)
+        copy.contact = "91" + original.contact
+        copy.email = None
+        if rng.random() < 0.5:
+            # Half keep only the name and address in common
+            copy.contact = f"8{rng.randrange(10**9):09d}"
+        copies.append(copy)
+    created = ContactList.objects.bulk_create(copies)
+    return {frozenset((a.pk, b.pk)) for a, b in zip(chosen, created)}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time duplicate detection stage by stage on synthetic address books "
+        "with planted near-duplicates, and report how many were found. "
+        "Everything runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000])
+        parser.add_argument(
+            "--duplicates",
+            type=float,
+            default=0.05,
+            help="Fraction of contacts copied with a typo and a reformatted phone.",
+        )
+
+    def handle(self, *args, **options):
+        for size in options["sizes"]:
+            with transaction.atomic():
+                user = bench_user("dedup")
+                bulk_load(user, size)
+                planted = plant_duplicates(user, options["duplicates"])
+
+                records, load = time_ms(load_records, user)
+                pairs, block = time_ms(candidate_pairs, records)
+                scored, score = time_ms(score_pairs, records, pairs)
+                clusters, group = time_ms(cluster, records, scored)
+
+                found = {
+                    frozenset(pair)
+                    for ids in clusters
+                    for pair in zip(ids, ids[1:])
+                    if len(ids) == 2
+                }
+                total = load + block + score + group
+                self.stdout.write(
+                    f"{len(records):>9} contacts  load {load:7.0f} ms  "
+                    f"block {block:6.0f} ms  score {score:6.0f} ms  "
+                    f"cluster {group:5.0f} ms  total {total:7.0f} ms"
+                )
+                self.stdout.write(
+                    f"{'':>9} {len(pairs)} candidate pairs, {len(clusters)} clusters, "
+                    f"{len(found & planted)}/{len(planted)} planted duplicates found"
+                )
+                transaction.set_rollback(True)
@@ -0,0 +1,61 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from contacts.benchmarking import (
+    FIRST_NAMES,
+    LAST_NAMES,
+    COMPANIES,
+    bench_user,
+    bulk_load,
+    summarize,
+    time_ms,
+)
+from contacts.search import LikeSearchBackend, get_search_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark contact search latency against synthetic address books. "
+        "Everything runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[10_000, 100_000, 1_000_000],
+            help="Address book sizes to benchmark.",
+        )
+        parser.add_argument(
+            "--queries", type=int, default=50, help="Queries per size and backend."
+        )
+        parser.add_argument(
+            "--skip-like",
+            action="store_true",
+            help="Do not time the unindexed icontains baseline.",
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backends = [(type(backend).__name__, backend)]
+        if not options["skip_like"] and not isinstance(backend, LikeSearchBackend):
+            backends.append(("LikeSearchBackend", LikeSearchBackend()))
+
+        rng = random.Random(1)
+        terms = FIRST_NAMES + LAST_NAMES + COMPANIES
+        queries = [rng.choice(terms)[:5] for _ in range(options["queries"])]
+
+        for size in options["sizes"]:
+            with transaction.atomic():
+                user = bench_user("search")
+                self.stdout.write(f"Loading {size} contacts...")
+                bulk_load(user, size)
+                backend.rebuild(user)
+
+                for name, candidate in backends:
+                    samples = [time_ms(candidate.search, user, q)[1] for q in queries]
+                    self.stdout.write(f"{size:>9}  {name:<24} {summarize(samples)}")
+                transaction.set_rollback(True)
@@ -0,0 +1,205 @@
+import http.client
+import os
+import shutil
+import socket
+import subprocess
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from contacts import stats
+from contacts.benchmarking import bench_user, bulk_load, percentile
+from contacts.models import ContactList
+from contacts.search import get_search_backend
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"Server on port {port} did not start.")
+
+
+def login_cookie(user):
+    """A session cookie for ``user``, as the login view would set."""
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return f"{settings.SESSION_COOKIE_NAME}={session.session_key}", session
+
+
+def load(port, paths, cookie, concurrency, duration):
+    """
+    ``concurrency`` clients, each with a keep-alive connection, request
+    ``paths`` in turn for ``duration`` seconds. Returns
+    ``(latencies in ms, errors, elapsed seconds)``.
+    """
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(offset):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine, failed = [], []
+        i = offset
+        while time.monotonic() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                conn.request("GET", path, headers={"Cookie": cookie})
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed.append(f"{response.status} {path}")
+                if response.getheader("Connection", "").lower() == "close":
+                    conn.close()
+            except (OSError, http.client.HTTPException) as e:
+                failed.append(f"{type(e).__name__} {path}")
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            mine.append((time.perf_counter() - start) * 1000)
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            errors.extend(failed)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.monotonic() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the contact pages under WSGI (gunicorn, sync views) and "
+        "ASGI (uvicorn, async views) at the same concurrency and worker "
+        "count, and report throughput and latency percentiles side by side. "
+        "The servers are separate processes, so the synthetic contacts are "
+        "committed; they are deleted again at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--contacts", type=int, default=5000)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--duration", type=float, default=20.0, help="Seconds.")
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument(
+            "--threads",
+            type=int,
+            help="gunicorn threads per worker (default: concurrency / workers).",
+        )
+        parser.add_argument(
+            "--page-cache",
+            action="store_true",
+            help="Leave the per-user page cache on (it is off by default so "
+            "every request reaches the ORM).",
+        )
+
+    def handle(self, *args, **options):
+        gunicorn, uvicorn = shutil.which("gunicorn"), shutil.which("uvicorn")
+        if not gunicorn or not uvicorn:
+            raise CommandError(
+                "gunicorn and uvicorn must be installed (see requirements.txt)."
+            )
+        workers = options["workers"]
+        concurrency = options["concurrency"]
+        threads = options["threads"] or max(1, -(-concurrency // workers))
+
+        user = bench_user("servers")
+        session = None
+        try:
+            bulk_load(user, options["contacts"])
+            get_search_backend().rebuild(user)
+            stats.rebuild(user)
+            cookie, session = login_cookie(user)
+            contact = ContactList.objects.filter(user=user).first()
+            paths = [
+                reverse("contact_list"),
+                reverse("city_list") + "?city=Pune",
+                reverse("contact_details", args=[contact.pk]),
+                reverse("contact_search") + "?q=Meera",
+            ]
+
+            env = dict(os.environ)
+            if not options["page_cache"]:
+                env["CONTACT_PAGE_CACHE_TIMEOUT"] = "0"
+            # manage.py has set DJANGO_SETTINGS_MODULE, so each server is
+            # told its own rather than left to its entry module's default
+            settings_modules = {
+                "WSGI gunicorn": "backend.settings",
+                "ASGI uvicorn": "backend.settings_asgi",
+            }
+            servers = {
+                "WSGI gunicorn": lambda port: [
+                    gunicorn,
+                    "backend.wsgi:application",
+                    f"--bind=127.0.0.1:{port}",
+                    f"--workers={workers}",
+                    f"--threads={threads}",
+                    "--log-level=warning",
+                ],
+                "ASGI uvicorn": lambda port: [
+                    uvicorn,
+                    "backend.asgi:application",
+                    "--host=127.0.0.1",
+                    f"--port={port}",
+                    f"--workers={workers}",
+                    "--log-level=warning",
+                    "--no-access-log",
+                ],
+            }
+            self.stdout.write(
+                f"{options['contacts']} contacts, {concurrency} connections, "
+                f"{workers} workers, {options['duration']:.0f} s per server"
+            )
+            for name, command in servers.items():
+                server_env = {**env, "DJANGO_SETTINGS_MODULE": settings_modules[name]}
+                self.run_server(name, command, server_env, paths, cookie, options)
+        finally:
+            if session is not None:
+                session.delete()
+            user.delete()
+
+    def run_server(self, name, command, env, paths, cookie, options):
+        port = free_port()
+        server = subprocess.Popen(command(port), cwd=settings.BASE_DIR, env=env)
+        try:
+            wait_for(port)
+            # Warm up: imports, template loading, connection setup
+            load(port, paths, cookie, options["workers"], 2)
+            latencies, errors, elapsed = load(
+                port, paths, cookie, options["concurrency"], options["duration"]
+            )
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        self.stdout.write(
+            f"{name:<14} {len(latencies) / elapsed:8.1f} req/s  "
+            f"p50 {percentile(latencies, 50):8.2f} ms  "
+            f"p99 {percentile(latencies, 99):8.2f} ms  "
+            f"errors {len(errors)}"
+        )
+        for error in sorted(set(errors))[:5]:
+            self.stdout.write(f"  {error}")
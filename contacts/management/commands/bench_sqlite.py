@@ -0,0 +1,192 @@
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from contacts.benchmarking import bench_user, bulk_load, percentile
+from contacts.models import ContactList
+
+# SQLite's own behaviour under Django before tuning: rollback journal,
+# deferred transactions and Python's default 5 s busy timeout.
+DEFAULT_PROFILE = ({"journal_mode": "DELETE"}, "DEFERRED")
+
+LIST_SQL = (
+    "SELECT id, first_name, last_name, city, created_at FROM contacts_contactlist "
+    "WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT 51"
+)
+DETAIL_SQL = "SELECT * FROM contacts_contactlist WHERE id = ? AND user_id = ?"
+UPDATE_SQL = "UPDATE contacts_contactlist SET notes = ?, updated_at = ? WHERE id = ?"
+SESSION_SQL = (
+    "INSERT OR REPLACE INTO django_session (session_key, session_data, expire_date) "
+    "VALUES (?, ?, ?)"
+)
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def connect(path, pragmas):
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+
+def stress(path, pragmas, transaction_mode, user_id, ids, options):
+    """
+    Readers fetch the first list page and a contact; writers save a contact
+    the way the edit view does (read it, then update it) and touch a
+    session, in one transaction. Returns per-kind latencies and lock errors.
+    """
+    results = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + options["duration"]
+
+    def reader(n):
+        conn = connect(path, pragmas)
+        mine, failed = [], 0
+        i = n
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                conn.execute(LIST_SQL, (user_id,)).fetchall()
+                conn.execute(DETAIL_SQL, (ids[i % len(ids)], user_id)).fetchall()
+            except sqlite3.OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+                failed += 1
+                continue
+            finally:
+                i += 1
+            mine.append((time.perf_counter() - start) * 1000)
+        conn.close()
+        with lock:
+            results["read"].extend(mine)
+            errors["read"] += failed
+
+    def writer(n):
+        conn = connect(path, pragmas)
+        mine, failed = [], 0
+        i = n
+        while time.monotonic() < deadline:
+            pk = ids[(i * 7919) % len(ids)]
+            now = datetime.now(timezone.utc).isoformat()
+            start = time.perf_counter()
+            try:
+                conn.execute(f"BEGIN {transaction_mode}")
+                conn.execute(DETAIL_SQL, (pk, user_id)).fetchall()
+                conn.execute(UPDATE_SQL, (f"stress {i}", now, pk))
+                conn.execute(SESSION_SQL, (f"bench-sqlite-{n}", "e30", now))
+                conn.execute("COMMIT")
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                if not is_lock_error(e):
+                    raise
+                failed += 1
+                continue
+            finally:
+                i += 1
+            mine.append((time.perf_counter() - start) * 1000)
+        conn.close()
+        with lock:
+            results["write"].extend(mine)
+            errors["write"] += failed
+
+    threads = [
+        threading.Thread(target=reader, args=(n,)) for n in range(options["readers"])
+    ] + [threading.Thread(target=writer, args=(n,)) for n in range(options["writers"])]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors, time.monotonic() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress a copy of the SQLite database with concurrent readers and "
+        "writers, once with SQLite's defaults and once with SQLITE_PRAGMAS, "
+        "and report throughput, p99 latency and the 'database is locked' "
+        "error rate for each. Each connection runs in its own thread, as "
+        "gunicorn workers would hold their own."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--contacts", type=int, default=5000)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("bench_sqlite needs a SQLite database.")
+        if not options["writers"]:
+            raise CommandError("Use at least one writer.")
+
+        # The stress runs on a copy, so the data has to be committed to be
+        # copied; it is deleted again straight after.
+        user = bench_user("sqlite")
+        user_id = user.pk
+        scratch = Path(tempfile.mkdtemp())
+        try:
+            bulk_load(user, options["contacts"])
+            ids = list(
+                ContactList.objects.filter(user=user).values_list("pk", flat=True)
+            )
+            connection.ensure_connection()
+            source = connection.connection
+            profiles = [
+                ("SQLite defaults", *DEFAULT_PROFILE),
+                (
+                    "SQLITE_PRAGMAS",
+                    settings.SQLITE_PRAGMAS,
+                    settings.DATABASES["default"]["OPTIONS"].get(
+                        "transaction_mode", "DEFERRED"
+                    ),
+                ),
+            ]
+            copies = []
+            for n in range(len(profiles)):
+                path = scratch / f"stress-{n}.sqlite3"
+                with sqlite3.connect(path) as copy:
+                    source.backup(copy)
+                copies.append(path)
+        finally:
+            user.delete()
+
+        self.stdout.write(
+            f"{options['contacts']} contacts, {options['readers']} readers, "
+            f"{options['writers']} writers, {options['duration']:.0f} s per profile"
+        )
+        try:
+            for (label, pragmas, mode), path in zip(profiles, copies):
+                results, errors, elapsed = stress(
+                    str(path), pragmas, mode, user_id, ids, options
+                )
+                self.report(label, results, errors, elapsed)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    def report(self, label, results, errors, elapsed):
+        self.stdout.write(label)
+        for kind in ("read", "write"):
+            done, failed = len(results[kind]), errors[kind]
+            attempts = done + failed
+            rate = 100 * failed / attempts if attempts else 0.0
+            self.stdout.write(
+                f"  {kind + 's':<7} {done / elapsed:9.1f}/s  "
+                f"p99 {percentile(results[kind], 99):8.2f} ms  "
+                f"locked {failed} ({rate:.1f}%)"
+            )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.forms.models import model_to_dict
+
+from accounts.models import CustomUser
+from contacts.benchmarking import synthetic_contacts, time_ms
+from contacts.validation import validate, validate_many
+
+
+class Command(BaseCommand):
+    help = "Measure per-record cost of contact validation, one by one and batched."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=20_000)
+
+    def handle(self, *args, **options):
+        count = options["records"]
+        # Unsaved user: nothing here touches the database
+        user = CustomUser(email="bench@example.com", username="bench")
+        contacts = list(synthetic_contacts(user, count))
+        rows = [model_to_dict(contact) for contact in contacts]
+
+        cases = [
+            ("validate(instance)", lambda: [validate(c) for c in contacts]),
+            ("validate(row)", lambda: [validate(r) for r in rows]),
+            ("validate_many(rows)", lambda: validate_many(rows)),
+        ]
+        for label, fn in cases:
+            _, elapsed = time_ms(fn)
+            self.stdout.write(
+                f"{label:<20} {elapsed * 1000 / count:7.2f} us/record "
+                f"({count / (elapsed / 1000):9.0f} records/s)"
+            )
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import CustomUser
+from base.images import open_rgb, save_renditions
+from contacts.models import ContactList
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate avatar renditions for contact and profile photos that were "
+        "processed before renditions existed."
+    )
+
+    def handle(self, *args, **options):
+        contacts = (
+            ContactList.objects.exclude(contact_photo="")
+            .exclude(contact_photo=None)
+            .filter(photo_pending=False, contact_photo_renditions={})
+        )
+        users = (
+            CustomUser.objects.exclude(image="")
+            .exclude(image=None)
+            .filter(image_pending=False, image_renditions={})
+        )
+        done = 0
+        for contact in contacts.iterator():
+            renditions = self.build(contact.contact_photo)
+            ContactList.objects.filter(
+                pk=contact.pk, contact_photo=contact.contact_photo.name
+            ).update(contact_photo_renditions=renditions)
+            done += 1
+        for user in users.iterator():
+            renditions = self.build(user.image)
+            CustomUser.objects.filter(pk=user.pk, image=user.image.name).update(
+                image_renditions=renditions
+            )
+            done += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Generated renditions for {done} photos.")
+        )
+
+    def build(self, field_file):
+        with field_file.storage.open(field_file.name, "rb") as source:
+            img = open_rgb(source)
+            img.load()
+        return save_renditions(field_file.storage, field_file.name, img)
@@ -0,0 +1,138 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from contacts.facets import FACET_FIELDS
+from contacts.models import ContactList, ContactTrigram
+from contacts.pagination import CursorPaginator, CONTACTS_PER_PAGE
+from contacts.planner import prefix_range
+from contacts.trigrams import CANDIDATE_LIMIT, TRIGRAM_FIELDS, trigrams
+
+FILTER_FIELDS = ["city", "state", "country", "contact_type", "preferred_communication"]
+
+# Plan lines that mean every row of the contacts table is visited.
+FULL_SCAN_PATTERNS = {
+    "sqlite": re.compile(r"\bSCAN contacts_contactlist\b(?! USING)"),
+    "postgresql": re.compile(r"\bSeq Scan on contacts_contactlist\b"),
+}
+
+
+def query_shapes(user):
+    """The querysets each contact view runs, labelled by view."""
+    contacts = ContactList.objects.filter(user=user)
+    limit = CONTACTS_PER_PAGE + 1
+    paginator = CursorPaginator(contacts)
+    now = timezone.now()
+
+    shapes = [
+        (
+            "contact_list: first page",
+            paginator.queryset.order_by("-created_at", "-id")[:limit],
+        ),
+        ("contact_list: next cursor", paginator.after(now, 0)[:limit]),
+        ("contact_list: previous cursor", paginator.before(now, 0)[:limit]),
+    ]
+    # Filter choices come from the cached facet aggregate below
+    for field in FILTER_FIELDS:
+        filtered = CursorPaginator(contacts.filter(**{field: "x"}))
+        shapes.append(
+            (
+                f"{field}: filtered page",
+                filtered.queryset.order_by("-created_at", "-id")[:limit],
+            )
+        )
+        shapes.append(
+            (f"{field}: filtered next cursor", filtered.after(now, 0)[:limit])
+        )
+
+    shapes.append(
+        (
+            "browse: facet aggregate",
+            contacts.values(*FACET_FIELDS).annotate(n=Count("id")).order_by(),
+        )
+    )
+
+    lower = contacts.annotate(
+        email_lower=Lower("email"),
+        first_lower=Lower("first_name"),
+        last_lower=Lower("last_name"),
+    )
+    shapes += [
+        (
+            "contact_search: phone prefix/suffix",
+            contacts.filter(
+                prefix_range("contact", "98765")
+                | prefix_range("contact_reversed", "4321")
+            ),
+        ),
+        ("contact_search: email exact", lower.filter(email_lower="a@example.com")),
+        (
+            "contact_search: name prefix",
+            lower.filter(
+                prefix_range("first_lower", "pri") | prefix_range("last_lower", "pri")
+            ),
+        ),
+        (
+            "contact_search: trigram candidates",
+            ContactTrigram.objects.filter(user=user, trigram__in=trigrams("priya"))
+            .values("contact_id")
+            .annotate(shared=Count("id"))
+            .filter(shared__gte=2)
+            .order_by("-shared")[:CANDIDATE_LIMIT],
+        ),
+        (
+            "contact_search: trigram rescoring",
+            contacts.filter(pk__in=[1, 2]).values("id", *TRIGRAM_FIELDS),
+        ),
+    ]
+    return shapes
+
+
+class Command(BaseCommand):
+    help = "Print the query plan of every contact view query and flag full table scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="Email of the user to plan for (defaults to the first user).",
+        )
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="Exit with an error if any query does a full table scan.",
+        )
+
+    def handle(self, *args, **options):
+        if options["user"]:
+            user = CustomUser.objects.filter(email=options["user"]).first()
+        else:
+            user = CustomUser.objects.order_by("pk").first()
+        if user is None:
+            raise CommandError("No matching user to plan queries for.")
+
+        full_scan = FULL_SCAN_PATTERNS.get(connection.vendor)
+        scans = []
+        for label, queryset in query_shapes(user):
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(plan)
+            self.stdout.write("")
+            if full_scan and full_scan.search(plan):
+                scans.append(label)
+
+        if full_scan is None:
+            self.stdout.write(
+                f"Full-scan detection is not supported on {connection.vendor}."
+            )
+        elif scans:
+            message = "Full table scan in: " + ", ".join(scans)
+            if options["strict"]:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS("No query does a full table scan."))
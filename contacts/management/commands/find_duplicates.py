@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from contacts.benchmarking import time_ms
+from contacts.dedup import DEFAULT_THRESHOLD, find_duplicates, merge_contacts
+from contacts.models import ContactList
+
+
+class Command(BaseCommand):
+    help = (
+        "List clusters of likely duplicate contacts for a user; with --merge, "
+        "fold each cluster into its oldest contact."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("user", help="Email of the user who owns the contacts.")
+        parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+        parser.add_argument(
+            "--merge", action="store_true", help="Merge every cluster found."
+        )
+
+    def handle(self, *args, **options):
+        user = CustomUser.objects.filter(email=options["user"]).first()
+        if user is None:
+            raise CommandError(f"No user with email {options['user']}.")
+
+        clusters, elapsed = time_ms(find_duplicates, user, options["threshold"])
+        self.stdout.write(
+            f"Found {len(clusters)} clusters "
+            f"({sum(len(c) for c in clusters)} contacts) in {elapsed:.0f} ms."
+        )
+        names = ContactList.objects.filter(user=user).in_bulk(
+            [pk for ids in clusters for pk in ids]
+        )
+        for ids in clusters:
+            self.stdout.write(
+                "  "
+                + " | ".join(
+                    f"{pk}: {names[pk].first_name} "
+                    f"{names[pk].last_name} {names[pk].contact}"
+                    for pk in ids
+                )
+            )
+            if options["merge"]:
+                merge_contacts(user, ids[0], ids[1:])
+        if options["merge"]:
+            self.stdout.write(self.style.SUCCESS(f"Merged {len(clusters)} clusters."))
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from contacts.importer import DEFAULT_CHUNK_SIZE, import_rows, open_rows
+from contacts.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Import contacts for a user from a CSV file with a header row or a "
+        "vCard (.vcf) file. "
+        "Rows are validated and inserted in chunks; progress is committed per "
+        "chunk so an interrupted import can be resumed with --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("user", help="Email of the user who owns the contacts.")
+        parser.add_argument("file", help="Path to the .csv or .vcf file.")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument(
+            "--resume", type=int, metavar="JOB", help="Continue an earlier job."
+        )
+        parser.add_argument(
+            "--show-errors",
+            type=int,
+            default=20,
+            help="Number of rejected rows to print at the end.",
+        )
+
+    def handle(self, *args, **options):
+        user = CustomUser.objects.filter(email=options["user"]).first()
+        if user is None:
+            raise CommandError(f"No user with email {options['user']}.")
+
+        if options["resume"]:
+            job = ImportJob.objects.filter(pk=options["resume"], user=user).first()
+            if job is None:
+                raise CommandError(f"No import job {options['resume']} for {user}.")
+            self.stdout.write(f"Resuming job {job.pk} after row {job.rows_done}.")
+        else:
+            job = ImportJob.objects.create(
+                user=user,
+                source_name=options["file"],
+                chunk_size=options["chunk_size"],
+            )
+            self.stdout.write(f"Started import job {job.pk}.")
+
+        try:
+            with open(options["file"], "rb") as source:
+                rows = open_rows(job, source, options["file"])
+                import_rows(job, rows, progress=self.progress, skipped=job.rows_done)
+        except KeyboardInterrupt:
+            raise CommandError(
+                f"Interrupted after row {job.rows_done}; continue with --resume {job.pk}."
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {job.imported} contacts, rejected {job.rejected} rows "
+                f"({job.rows_per_second:.0f} rows/s)."
+            )
+        )
+        for reject in job.errors[: options["show_errors"]]:
+            reasons = "; ".join(
+                f"{field}: {' '.join(messages)}"
+                for field, messages in reject["errors"].items()
+            )
+            self.stdout.write(f"  row {reject['row']}: {reasons}")
+
+    def progress(self, job):
+        self.stdout.write(
+            f"{job.rows_done:>10} rows  {job.imported:>10} imported  "
+            f"{job.rejected:>8} rejected  {job.rows_per_second:8.0f} rows/s"
+        )
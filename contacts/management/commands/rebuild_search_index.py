@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from contacts import trigrams
+from contacts.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the contact full-text search and trigram indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only rebuild this user's contacts (email).")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            user = CustomUser.objects.filter(email=options["user"]).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}.")
+        backend = get_search_backend()
+        backend.rebuild(user)
+        trigrams.rebuild(user)
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt search index with {type(backend).__name__}.")
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from contacts import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount per-user contact statistics from the contacts table and "
+        "repair any counters that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only check this user's stats (email).")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Report drift without changing anything; exits 1 if there is any.",
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            user = CustomUser.objects.filter(email=options["user"]).first()
+            if user is None:
+                raise CommandError(f"No user with email {options['user']}.")
+        drift = stats.rebuild(user, fix=not options["check"])
+        for user_id, contact_type, stored, actual in drift:
+            changes = ", ".join(
+                f"{name} {stored[name]} -> {actual[name]}"
+                for name in stats.COUNTERS
+                if stored[name] != actual[name]
+            )
+            self.stdout.write(f"  user {user_id} {contact_type}: {changes}")
+        if options["check"] and drift:
+            raise CommandError(f"{len(drift)} stats rows have drifted.")
+        verb = "Found" if options["check"] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drift)} drifted rows."))
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+from contacts.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("contacts", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="contactlist",
+            options={"verbose_name": "Contact List", "verbose_name_plural": "Contacts"},
+        ),
+        AddIndexConcurrently(
+            model_name="contactlist",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"], name="contact_user_created_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="contactlist",
+            index=models.Index(
+                fields=["user", "city", "-created_at", "-id"],
+                name="contact_user_city_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="contactlist",
+            index=models.Index(
+                fields=["user", "state", "-created_at", "-id"],
+                name="contact_user_state_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="contactlist",
+            index=models.Index(
+                fields=["user", "country", "-created_at", "-id"],
+                name="contact_user_country_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="contactlist",
+            index=models.Index(
+                fields=["user", "contact_type", "-created_at", "-id"],
+                name="contact_user_type_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="contactlist",
+            index=models.Index(
+                fields=["user", "preferred_communication", "-created_at", "-id"],
+                name="contact_user_comm_idx",
+            ),
+        ),
+    ]
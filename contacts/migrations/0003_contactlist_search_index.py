@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from contacts.search import backend_class_for
+
+
+def install_search_index(apps, schema_editor):
+    backend_class_for(schema_editor.connection)().install(schema_editor)
+
+
+def uninstall_search_index(apps, schema_editor):
+    backend_class_for(schema_editor.connection)().uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0002_contactlist_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
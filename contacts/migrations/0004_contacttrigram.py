@@ -0,0 +1,78 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from contacts.trigrams import contact_trigrams
+
+
+def build_trigrams(apps, schema_editor):
+    ContactList = apps.get_model("contacts", "ContactList")
+    ContactTrigram = apps.get_model("contacts", "ContactTrigram")
+    batch = []
+    for contact in ContactList.objects.iterator(chunk_size=2000):
+        batch.extend(
+            ContactTrigram(contact_id=contact.pk, user_id=contact.user_id, trigram=gram)
+            for gram in contact_trigrams(contact)
+        )
+        if len(batch) >= 5000:
+            ContactTrigram.objects.bulk_create(batch)
+            batch = []
+    ContactTrigram.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0003_contactlist_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContactTrigram",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("trigram", models.CharField(max_length=3)),
+                (
+                    "contact",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="trigrams",
+                        to="contacts.contactlist",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "trigram", "contact"],
+                        name="contact_trigram_user_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("contact", "trigram"), name="contact_trigram_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_trigrams, migrations.RunPython.noop),
+    ]
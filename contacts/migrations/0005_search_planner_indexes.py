@@ -0,0 +1,74 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:22
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+from contacts.operations import AddIndexConcurrently
+
+
+def fill_contact_reversed(apps, schema_editor):
+    ContactList = apps.get_model("contacts", "ContactList")
+    batch = []
+    for contact in ContactList.objects.only("contact").iterator(chunk_size=2000):
+        contact.contact_reversed = contact.contact[::-1]
+        batch.append(contact)
+        if len(batch) >= 2000:
+            ContactList.objects.bulk_update(batch, ["contact_reversed"])
+            batch = []
+    ContactList.objects.bulk_update(batch, ["contact_reversed"])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("contacts", "0004_contacttrigram"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contactlist",
+            name="contact_reversed",
+            field=models.CharField(blank=True, editable=False, max_length=13),
+        ),
+        migrations.RunPython(fill_contact_reversed, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="contactlist",
+            index=models.Index(
+                fields=["user", "contact"], name="contact_user_phone_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="contactlist",
+            index=models.Index(
+                fields=["user", "contact_reversed"], name="contact_user_phone_rev_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="contactlist",
+            index=models.Index(
+                models.F("user"),
+                django.db.models.functions.text.Lower("email"),
+                name="contact_user_email_lower_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="contactlist",
+            index=models.Index(
+                models.F("user"),
+                django.db.models.functions.text.Lower("first_name"),
+                name="contact_user_first_lower_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="contactlist",
+            index=models.Index(
+                models.F("user"),
+                django.db.models.functions.text.Lower("last_name"),
+                name="contact_user_last_lower_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0005_search_planner_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contactlist",
+            name="photo_pending",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
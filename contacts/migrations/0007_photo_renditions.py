@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0006_photo_pending"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contactlist",
+            name="contact_photo_renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
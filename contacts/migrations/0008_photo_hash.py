@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0007_photo_renditions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contactlist",
+            name="contact_photo_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:33
+
+import base.storage
+import contacts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0008_photo_hash"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="contactlist",
+            name="contact_photo",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=base.storage.photo_storage,
+                upload_to=contacts.models.rename_contact_image,
+            ),
+        ),
+    ]
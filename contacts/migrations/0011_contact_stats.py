@@ -0,0 +1,71 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_contact_stats(apps, schema_editor):
+    ContactList = apps.get_model("contacts", "ContactList")
+    ContactStats = apps.get_model("contacts", "ContactStats")
+    rows = (
+        ContactList.objects.values("user_id", "contact_type")
+        .annotate(
+            total=Count("id"),
+            favorites=Count("id", filter=Q(is_favorite=True)),
+            with_photo=Count("id", filter=Q(contact_photo__gt="")),
+        )
+        .order_by()
+    )
+    ContactStats.objects.bulk_create(
+        [ContactStats(**row) for row in rows.iterator()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0010_importjob"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContactStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("contact_type", models.CharField(max_length=20)),
+                ("total", models.IntegerField(default=0)),
+                ("favorites", models.IntegerField(default=0)),
+                ("with_photo", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="contact_stats",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Contact stats",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "contact_type"),
+                        name="contact_stats_user_type_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_contact_stats, migrations.RunPython.noop),
+    ]
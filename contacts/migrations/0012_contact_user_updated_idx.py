@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+from contacts.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("contacts", "0011_contact_stats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="contactlist",
+            index=models.Index(
+                fields=["user", "-updated_at"], name="contact_user_updated_idx"
+            ),
+        ),
+    ]
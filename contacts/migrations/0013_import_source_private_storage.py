@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:57
+
+import base.storage
+import contacts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0012_contact_user_updated_idx"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="importjob",
+            name="source",
+            field=models.FileField(
+                blank=True,
+                storage=base.storage.private_storage,
+                upload_to=contacts.models.import_source_name,
+            ),
+        ),
+    ]
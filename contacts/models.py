@@ -1,13 +1,21 @@
-import re
 import os
-from django.db import models
+import uuid
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Lower
 from django.core.exceptions import ValidationError
 from accounts.models import CustomUser
 from django.utils import timezone
 from datetime import datetime
-from PIL import Image
-from io import BytesIO
-from django.core.files.base import ContentFile
+from base.images import (
+    content_hash,
+    delete_on_commit,
+    rendition_srcset,
+    rendition_url,
+)
+from base.queue import enqueue
+from base.storage import photo_storage, private_storage
+from .validation import validate
 
 
 def rename_contact_image(instance, filename):
@@ -59,6 +67,9 @@ class ContactList(models.Model):
     first_name = models.CharField(max_length=30, blank=False)
     last_name = models.CharField(max_length=30, blank=False)
     contact = models.CharField(max_length=13, blank=False)
+    # Reversed digits of ``contact``: a phone-suffix search becomes an
+    # indexed prefix range scan on this column.
+    contact_reversed = models.CharField(max_length=13, blank=True, editable=False)
     alternate_contact = models.CharField(max_length=13, blank=True)
     email = models.EmailField(blank=True, null=True)
     alternate_email = models.EmailField(blank=True, null=True)
@@ -90,8 +101,20 @@ class ContactList(models.Model):
 
     notes = models.TextField(blank=True)
     contact_photo = models.ImageField(
-        upload_to=rename_contact_image, blank=True, null=True
+        upload_to=rename_contact_image,
+        storage=photo_storage,
+        blank=True,
+        null=True,
     )
+    # Square avatar renditions, {"<width>": stored_name}; empty until the
+    # photo task has processed the upload
+    contact_photo_renditions = models.JSONField(
+        default=dict, blank=True, editable=False
+    )
+    # sha256 of the uploaded bytes, to recognise a re-upload of the same file
+    contact_photo_hash = models.CharField(max_length=64, blank=True, editable=False)
+    # True while a raw upload waits for the photo task to compress it
+    photo_pending = models.BooleanField(default=False, editable=False)
     is_favorite = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -113,172 +136,265 @@ class ContactList(models.Model):
     )
 
     def clean(self):
-        # First Name
-        if not self.first_name:
-            raise ValidationError({"first_name": "First name is required."})
-        if not re.fullmatch(r"^[A-Za-z ]+$", self.first_name):
-            raise ValidationError(
-                {"first_name": "First name must contain only alphabets and spaces."}
-            )
+        errors = validate(self)
+        if errors:
+            raise ValidationError(errors)
+
+    def set_search_keys(self):
+        self.contact_reversed = (self.contact or "")[::-1]
+
+    # Photo name and renditions as loaded from the database; None when the
+    # instance was not loaded or the field was deferred.
+    _loaded_photo = None
+    _loaded_renditions = None
+    # stats_state() as loaded, for contacts.stats; None if not fully loaded
+    _loaded_stats = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "contact_photo" in field_names:
+            instance._loaded_photo = values[field_names.index("contact_photo")] or ""
+        if "contact_photo_renditions" in field_names:
+            instance._loaded_renditions = values[
+                field_names.index("contact_photo_renditions")
+            ]
+        if {"contact_type", "is_favorite", "contact_photo"} <= set(field_names):
+            instance._loaded_stats = instance.stats_state()
+        return instance
+
+    def stats_state(self):
+        """What this contact adds to ContactStats: ``(type, favorite, photo)``."""
+        return (self.contact_type, bool(self.is_favorite), bool(self.contact_photo))
+
+    def save(self, *args, **kwargs):
+        # One transaction with the post_save work (search index, ContactStats)
+        with transaction.atomic():
+            self._save(*args, **kwargs)
+
+    def _save(self, *args, **kwargs):
+        self.set_search_keys()
+
+        # A freshly uploaded file is stored as-is; compression runs on the
+        # task queue (contacts.tasks) so the request does not decode it.
+        # Re-uploading the same bytes keeps the processed photo.
+        new_photo = bool(self.contact_photo) and not self.contact_photo._committed
+        if new_photo:
+            digest = content_hash(self.contact_photo)
+            if self._loaded_photo and digest == self.contact_photo_hash:
+                self.contact_photo = self._loaded_photo
+                new_photo = False
+            else:
+                self.contact_photo_hash = digest
+                self.photo_pending = True
+                self.contact_photo_renditions = {}
+        elif not self.contact_photo:
+            self.contact_photo_hash = ""
+            self.contact_photo_renditions = {}
+
+        super().save(*args, **kwargs)
 
-        # Last Name
-        if not self.last_name:
-            raise ValidationError({"last_name": "Last name is required."})
-        if not re.fullmatch(r"^[A-Za-z ]+$", self.last_name):
-            raise ValidationError(
-                {"last_name": "Last name must contain only alphabets and spaces."}
+        # The previous file and its renditions are unreferenced once a new
+        # photo is stored or the photo is cleared.
+        photo_name = self.contact_photo.name or ""
+        if self._loaded_photo and self._loaded_photo != photo_name:
+            delete_on_commit(
+                self.contact_photo.storage,
+                [self._loaded_photo, *(self._loaded_renditions or {}).values()],
             )
+        self._loaded_photo = photo_name
+        self._loaded_renditions = self.contact_photo_renditions
+
+        if new_photo:
+            enqueue("contacts.process_contact_photo", contact_id=self.pk)
+
+    @property
+    def photo_srcset(self):
+        return rendition_srcset(
+            self.contact_photo.storage, self.contact_photo_renditions
+        )
+
+    @property
+    def photo_thumbnail_url(self):
+        """Avatar-sized URL for ``src``; the original until renditions exist."""
+        if not self.contact_photo:
+            return ""
+        return (
+            rendition_url(
+                self.contact_photo.storage, self.contact_photo_renditions, 112
+            )
+            or self.contact_photo.url
+        )
+
+    def __str__(self):
+        return f"{self.user_id} {self.first_name} {self.last_name} {self.contact}"
+
+    class Meta:
+        verbose_name = "Contact List"
+        verbose_name_plural = "Contacts"
+        # Every view filters on user first; the trailing (created_at, id)
+        # lets the keyset paginator walk each access path in index order.
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="contact_user_created_idx"
+            ),
+            models.Index(
+                fields=["user", "city", "-created_at", "-id"],
+                name="contact_user_city_idx",
+            ),
+            models.Index(
+                fields=["user", "state", "-created_at", "-id"],
+                name="contact_user_state_idx",
+            ),
+            models.Index(
+                fields=["user", "country", "-created_at", "-id"],
+                name="contact_user_country_idx",
+            ),
+            models.Index(
+                fields=["user", "contact_type", "-created_at", "-id"],
+                name="contact_user_type_idx",
+            ),
+            models.Index(
+                fields=["user", "preferred_communication", "-created_at", "-id"],
+                name="contact_user_comm_idx",
+            ),
+            # Latest change per user, for conditional GET validators
+            models.Index(
+                fields=["user", "-updated_at"], name="contact_user_updated_idx"
+            ),
+            # Access paths used by the search planner (contacts.planner)
+            models.Index(fields=["user", "contact"], name="contact_user_phone_idx"),
+            models.Index(
+                fields=["user", "contact_reversed"], name="contact_user_phone_rev_idx"
+            ),
+            models.Index(
+                F("user"), Lower("email"), name="contact_user_email_lower_idx"
+            ),
+            models.Index(
+                F("user"), Lower("first_name"), name="contact_user_first_lower_idx"
+            ),
+            models.Index(
+                F("user"), Lower("last_name"), name="contact_user_last_lower_idx"
+            ),
+        ]
+
+
+class ContactTrigram(models.Model):
+    """
+    One trigram of a contact's normalized names, for typo-tolerant search.
+
+    ``user`` is copied from the contact so candidate lookups are answered
+    from the (user, trigram) index without joining ContactList.
+    """
+
+    contact = models.ForeignKey(
+        ContactList, on_delete=models.CASCADE, related_name="trigrams"
+    )
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="+")
+    trigram = models.CharField(max_length=3)
 
-        # Contact
-        if not self.contact:
-            raise ValidationError({"contact": "Contact number is required."})
-        if not re.fullmatch(r"^\d{10,13}$", self.contact):
-            raise ValidationError(
-                {"contact": "Contact must be digits only and 10 to 13 characters long."}
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["contact", "trigram"], name="contact_trigram_unique"
             )
+        ]
+        indexes = [
+            # Covers the candidate query: posting list read, no table lookups
+            models.Index(
+                fields=["user", "trigram", "contact"], name="contact_trigram_user_idx"
+            )
+        ]
 
-        # Alternate Contact
-        if self.alternate_contact:
-            if not re.fullmatch(r"^\d{10,13}$", self.alternate_contact):
-                raise ValidationError(
-                    {
-                        "alternate_contact": "Alternate contact must be digits only and 10 to 13 characters long."
-                    }
-                )
-
-        # Email
-        if self.email:
-            if not re.fullmatch(r"^[\w\.-]+@[\w\.-]+\.\w+$", self.email):
-                raise ValidationError({"email": "Enter a valid email address."})
-
-        # Alternate Email
-        if self.alternate_email:
-            if not re.fullmatch(r"^[\w\.-]+@[\w\.-]+\.\w+$", self.alternate_email):
-                raise ValidationError(
-                    {"alternate_email": "Enter a valid alternate email address."}
-                )
-
-        # Date of Birth
-        if self.date_of_birth:
-            if self.date_of_birth > timezone.now().date():
-                raise ValidationError(
-                    {"date_of_birth": "Date of birth cannot be in the future."}
-                )
-
-        # Nickname
-        if self.nickname:
-            if not re.fullmatch(r"^[A-Za-z ]+$", self.nickname):
-                raise ValidationError(
-                    {"nickname": "Nickname must contain only alphabets and spaces."}
-                )
-
-        # Job Title
-        if self.job_title:
-            if not re.fullmatch(r"^[A-Za-z ]+$", self.job_title):
-                raise ValidationError(
-                    {"job_title": "Job title must contain only alphabets and spaces."}
-                )
-
-        # Company
-        if self.company:
-            if not re.fullmatch(r"^[A-Za-z ]+$", self.company):
-                raise ValidationError(
-                    {"company": "Company name must contain only alphabets and spaces."}
-                )
-
-        # City
-        if self.city:
-            if not re.fullmatch(r"^[A-Za-z ]+$", self.city):
-                raise ValidationError(
-                    {"city": "City must contain only alphabets and spaces."}
-                )
-
-        # State
-        if self.state:
-            if not re.fullmatch(r"^[A-Za-z ]+$", self.state):
-                raise ValidationError(
-                    {"state": "State must contain only alphabets and spaces."}
-                )
-
-        # Country
-        if self.country:
-            if not re.fullmatch(r"^[A-Za-z ]+$", self.country):
-                raise ValidationError(
-                    {"country": "Country must contain only alphabets and spaces."}
-                )
-
-        # Postal Code
-        if self.postal_code:
-            if not re.fullmatch(r"^\d+$", self.postal_code):
-                raise ValidationError(
-                    {"postal_code": "Postal code must contain digits only."}
-                )
-
-        # LinkedIn Username
-        if self.linkedin_username:
-            if not re.fullmatch(r"^[\w ]+$", self.linkedin_username):
-                raise ValidationError(
-                    {
-                        "linkedin_username": "LinkedIn username can contain letters, numbers, and spaces only."
-                    }
-                )
-
-        # Twitter Username
-        if self.twitter_username:
-            if not re.fullmatch(r"^[\w ]+$", self.twitter_username):
-                raise ValidationError(
-                    {
-                        "twitter_username": "Twitter username can contain letters, numbers, and spaces only."
-                    }
-                )
-
-        # Facebook Username
-        if self.facebook_username:
-            if not re.fullmatch(r"^[\w ]+$", self.facebook_username):
-                raise ValidationError(
-                    {
-                        "facebook_username": "Facebook username can contain letters, numbers, and spaces only."
-                    }
-                )
-
-        # Instagram Username
-        if self.instagram_username:
-            if not re.fullmatch(r"^[\w ]+$", self.instagram_username):
-                raise ValidationError(
-                    {
-                        "instagram_username": "Instagram username can contain letters, numbers, and spaces only."
-                    }
-                )
-
-        if self.contact_photo:
-            valid_extensions = [".jpg", ".jpeg", ".png"]
-            ext = os.path.splitext(self.contact_photo.name)[1].lower()
-            if ext not in valid_extensions:
-                raise ValidationError(
-                    {"contact_photo": "Only .png, .jpg, and .jpeg files are allowed."}
-                )
 
-    def save(self, *args, **kwargs):
-        # Compress image before saving
-        if self.contact_photo:
-            img = Image.open(self.contact_photo)
+def import_source_name(instance, filename):
+    # Random, so nothing about the upload can be guessed from its path
+    return f"imports/{uuid.uuid4().hex}{os.path.splitext(filename)[1].lower()}"
 
-            if img.mode != "RGB":
-                img = img.convert("RGB")  # ensure compatibility
 
-            buffer = BytesIO()
-            img.save(buffer, format="JPEG", quality=70)  # Adjust quality if needed
-            buffer.seek(0)
+class ImportJob(models.Model):
+    """
+    A bulk contact import. Progress is committed with every chunk, so an
+    interrupted job resumes after the last committed row.
+    """
 
-            # Replace the original image with the compressed one
-            file_name = os.path.basename(self.contact_photo.name)
-            self.contact_photo.save(file_name, ContentFile(buffer.read()), save=False)
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
 
-        super().save(*args, **kwargs)
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="import_jobs"
+    )
+    # Uploaded file (upload view), kept in private storage until the job is
+    # done or has failed for good. Empty for the import_contacts command.
+    source = models.FileField(
+        upload_to=import_source_name, storage=private_storage, blank=True
+    )
+    source_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    chunk_size = models.PositiveIntegerField(default=1000)
+
+    rows_done = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    # The first rejected rows: [{"row": n, "errors": {field: [message]}}]
+    errors = models.JSONField(default=list, blank=True)
+    last_error = models.TextField(blank=True)
+
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def rows_per_second(self):
+        if not self.started_at or not self.rows_done:
+            return 0
+        end = self.finished_at or timezone.now()
+        elapsed = (end - self.started_at).total_seconds()
+        return self.rows_done / elapsed if elapsed else 0
+
+    def release_source(self):
+        """Delete the uploaded file; the job keeps its name and counts."""
+        if self.source:
+            self.source.delete(save=False)
+            self.save(update_fields=["source", "updated_at"])
+
+    def __str__(self):
+        return f"Import #{self.pk} {self.source_name} ({self.status})"
 
-        def __str__(self):
-            return f"{self.user.id} {self.first_name} {self.last_name} {self.contact}"
 
-        class Meta:
-            verbose_name = "Contact List"
-            verbose_name_plural = "Contacts"
+class ContactStats(models.Model):
+    """
+    A user's contact counts for one contact type, kept current by
+    ``contacts.stats`` in the same transaction as every contact write, so
+    dashboards read a few rows instead of counting the address book.
+    """
+
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="contact_stats"
+    )
+    contact_type = models.CharField(max_length=20)
+    total = models.IntegerField(default=0)
+    favorites = models.IntegerField(default=0)
+    with_photo = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Contact stats"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "contact_type"], name="contact_stats_user_type_unique"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.contact_type}: {self.total}"
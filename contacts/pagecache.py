@@ -0,0 +1,98 @@
+"""
+Per-user caching of rendered contact pages.
+
+Cached pages are keyed on the page's conditional GET validator (see
+``contacts.conditional``), which is read from the database on every
+request. Any write to the user's contacts changes it, so the pages move to
+new keys in every process at once, whatever the cache backend; the stale
+entries simply expire. Nothing has to be invalidated, and a write made
+elsewhere (another worker, a queued task) is seen as soon as it commits.
+"""
+
+import hashlib
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+
+
+def csrf_key(request):
+    """
+    A short digest of the CSRF secret a page's form tokens are minted from.
+    Logging in rotates the secret, so pages rendered before must not be
+    served, or revalidated, afterwards.
+    """
+    secret = request.META.get("CSRF_COOKIE")
+    return hashlib.md5(secret.encode()).hexdigest()[:12] if secret else None
+
+
+def page_cache_key(request, version):
+    seed = f"{version}:{csrf_key(request)}:{request.get_full_path()}"
+    digest = hashlib.md5(seed.encode()).hexdigest()
+    return f"contacts:page:{request.user.pk}:{digest}"
+
+
+def cache_per_user(version_func):
+    """
+    Serve GET responses of a view from the cache, per user and per
+    ``version_func(request, *args, **kwargs)``: the page's ETag function,
+    whose value changes whenever the page's contacts do. Pages without one
+    (a missing contact) are not cached. Requests with flash messages waiting
+    are rendered fresh (and not stored) so a message is neither lost nor
+    shown twice, as are requests without a CSRF cookie yet: the page
+    rendered for them sets one.
+
+    Async views are wrapped in the matching ``conditional`` decorator, whose
+    loader has already read the validator's rows by the time this runs.
+    """
+
+    def cacheable(request):
+        return (
+            settings.CONTACT_PAGE_CACHE_TIMEOUT
+            and request.method == "GET"
+            and not len(get_messages(request))
+            and csrf_key(request) is not None
+        )
+
+    def cache_key(request, *args, **kwargs):
+        version = version_func(request, *args, **kwargs)
+        return version and page_cache_key(request, version)
+
+    def store(key, response):
+        if response.status_code == 200:
+            cache.set(key, response, settings.CONTACT_PAGE_CACHE_TIMEOUT)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            # Cache calls stay synchronous: they are brief and never touch
+            # the ORM
+
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                key = cacheable(request) and cache_key(request, *args, **kwargs)
+                if not key:
+                    return await view(request, *args, **kwargs)
+                response = cache.get(key)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    store(key, response)
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = cacheable(request) and cache_key(request, *args, **kwargs)
+            if not key:
+                return view(request, *args, **kwargs)
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                store(key, response)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,223 @@
+import base64
+import json
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models import Q
+
+CONTACTS_PER_PAGE = 50
+
+# How many page numbers to show on each side of the current page.
+PAGE_WINDOW = 4
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(created_at, pk, direction, number):
+    payload = json.dumps(
+        {"c": created_at.isoformat(), "i": pk, "d": direction, "n": number},
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(payload["c"])
+        pk = int(payload["i"])
+        direction = payload["d"]
+        number = int(payload["n"])
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor(token)
+    if direction not in ("next", "prev") or number < 1:
+        raise InvalidCursor(token)
+    return created_at, pk, direction, number
+
+
+def _key(row):
+    # Rows may be model instances or dicts from a .values() queryset
+    if isinstance(row, dict):
+        return row["created_at"], row["id"]
+    return row.created_at, row.pk
+
+
+class CursorPage:
+    """
+    One page of a keyset-paginated queryset.
+
+    Mirrors the parts of ``django.core.paginator.Page`` the templates use,
+    but carries opaque ``next_cursor``/``previous_cursor`` tokens instead of
+    page numbers, so no COUNT query is ever needed.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, number, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.number = number
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def page_window(self):
+        # The total is unknown, so only the current position can be shown.
+        return [self.number]
+
+
+class CursorPaginator:
+    """
+    Keyset paginator ordered by ``(-created_at, -id)``.
+
+    Each page is fetched with a ``WHERE (created_at, id) < cursor`` range
+    predicate and ``LIMIT per_page + 1``, which an index on
+    ``(user, created_at, id)`` can answer without scanning skipped rows.
+    """
+
+    def __init__(self, queryset, per_page=CONTACTS_PER_PAGE):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def page(self, cursor=None):
+        query, direction, number = self._query(cursor)
+        page = self._page(list(query), direction, number)
+        # A cursor past the end (e.g. its rows were deleted) restarts
+        return self.page() if page is None else page
+
+    async def apage(self, cursor=None):
+        """``page`` for async views, fetched with the async ORM."""
+        query, direction, number = self._query(cursor)
+        page = self._page([row async for row in query], direction, number)
+        return await self.apage() if page is None else page
+
+    def _query(self, cursor):
+        """``(sliced queryset, direction, page number)`` for ``cursor``."""
+        if not cursor:
+            query = self.queryset.order_by("-created_at", "-id")
+            return query[: self.per_page + 1], None, 1
+        created_at, pk, direction, number = decode_cursor(cursor)
+        if direction == "next":
+            query = self.after(created_at, pk)
+        else:
+            query = self.before(created_at, pk)
+        return query[: self.per_page + 1], direction, number
+
+    def _page(self, rows, direction, number):
+        """The page for fetched ``rows``; None if a cursor matched nothing."""
+        overflow = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if direction is None:
+            return self._build(rows, 1, overflow, False)
+        if not rows:
+            return None
+        if direction == "next":
+            return self._build(rows, number, overflow, True)
+        rows.reverse()
+        return self._build(rows, number, True, overflow and number > 1)
+
+    def after(self, created_at, pk):
+        """Rows older than the cursor, newest first."""
+        return self.queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        ).order_by("-created_at", "-id")
+
+    def before(self, created_at, pk):
+        """Rows newer than the cursor, oldest first."""
+        return self.queryset.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        ).order_by("created_at", "id")
+
+    def _build(self, rows, number, has_more, has_before):
+        next_cursor = previous_cursor = None
+        if rows and has_more:
+            next_cursor = encode_cursor(*_key(rows[-1]), "next", number + 1)
+        if rows and has_before:
+            previous_cursor = encode_cursor(*_key(rows[0]), "prev", number - 1)
+        return CursorPage(rows, number, next_cursor, previous_cursor)
+
+
+def page_window(page, on_each_side=PAGE_WINDOW):
+    """Page numbers around the current one, without walking page_range."""
+    if getattr(page, "is_cursor", False):
+        return page.page_window()
+    first = max(1, page.number - on_each_side)
+    last = min(page.paginator.num_pages, page.number + on_each_side)
+    return range(first, last + 1)
+
+
+def paginate(request, queryset, per_page=CONTACTS_PER_PAGE):
+    """
+    Paginate ``queryset`` for a list view.
+
+    Keyset (cursor) pagination is used unless the request asks for a
+    numbered ``?page=``, so old links keep working.
+    """
+    if request.GET.get("page") is None:
+        try:
+            return CursorPaginator(queryset, per_page).page(request.GET.get("cursor"))
+        except InvalidCursor:
+            return CursorPaginator(queryset, per_page).page()
+
+    return number_page(request, queryset.order_by("-created_at", "-id"), per_page)
+
+
+async def apaginate(request, queryset, per_page=CONTACTS_PER_PAGE):
+    """``paginate`` for async views; the page's rows are already fetched."""
+    if request.GET.get("page") is None:
+        paginator = CursorPaginator(queryset, per_page)
+        try:
+            return await paginator.apage(request.GET.get("cursor"))
+        except InvalidCursor:
+            return await paginator.apage()
+
+    return await anumber_page(
+        request, queryset.order_by("-created_at", "-id"), per_page
+    )
+
+
+def number_page(request, object_list, per_page=CONTACTS_PER_PAGE):
+    """Classic numbered pagination, for result sets not ordered by recency."""
+    paginator = Paginator(object_list, per_page)
+    try:
+        return paginator.page(request.GET.get("page"))
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
+
+
+@sync_to_async
+def anumber_page(request, object_list, per_page=CONTACTS_PER_PAGE):
+    """``number_page`` for async views; COUNT and rows run in one thread hop."""
+    page = number_page(request, object_list, per_page)
+    page.object_list = list(page.object_list)
+    return page
+
+
+def pagination_context(page):
+    return {
+        "page_obj": page,
+        "is_paginated": page.has_other_pages(),
+        "page_window": page_window(page),
+    }
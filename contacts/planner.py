@@ -0,0 +1,193 @@
+"""
+Query-shape-aware planning for contact search.
+
+``plan_search`` classifies the raw query string and picks an ordered chain
+of strategies, cheapest and most selective first. ``SearchPlan.execute``
+runs them until one produces results and records what it did, so the chosen
+plan can be shown in debug output.
+"""
+
+import logging
+import re
+import time
+
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import ContactList
+from .pagination import CONTACTS_PER_PAGE
+from .search import SEARCH_RESULT_LIMIT, get_search_backend
+from .trigrams import fuzzy_search
+
+logger = logging.getLogger(__name__)
+
+PHONE_RE = re.compile(r"^\+?[\d\s\-().]+$")
+EMAIL_RE = re.compile(r"^[\w.+-]+@[\w.-]*$")
+NAME_PREFIX_RE = re.compile(r"^[A-Za-z]+$")
+
+# Phone digits beyond this are treated as a country code prefix.
+NATIONAL_NUMBER_LENGTH = 10
+MIN_PHONE_DIGITS = 3
+
+PHONE = "phone"
+EMAIL = "email"
+NAME_PREFIX = "name_prefix"
+FREE_TEXT = "free_text"
+FUZZY = "fuzzy"
+
+
+def prefix_upper_bound(prefix):
+    """Smallest string greater than every string starting with ``prefix``."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def prefix_range(field, prefix):
+    """``field`` starts with ``prefix``, as a range an index can seek into."""
+    return Q(**{f"{field}__gte": prefix, f"{field}__lt": prefix_upper_bound(prefix)})
+
+
+def phone_lookup(user, digits):
+    """Prefix or suffix match on the primary contact number."""
+    return list(
+        ContactList.objects.filter(user=user)
+        .filter(
+            prefix_range("contact", digits)
+            | prefix_range("contact_reversed", digits[::-1])
+        )
+        .order_by("-created_at", "-id")
+        .values_list("id", flat=True)[:SEARCH_RESULT_LIMIT]
+    )
+
+
+def email_lookup(user, email):
+    """Exact or prefix match on lower(email), served by a functional index."""
+    contacts = ContactList.objects.filter(user=user).annotate(
+        email_lower=Lower("email")
+    )
+    if "@" in email and "." in email.split("@", 1)[1]:
+        contacts = contacts.filter(email_lower=email)
+    else:
+        contacts = contacts.filter(prefix_range("email_lower", email))
+    return list(
+        contacts.order_by("-created_at", "-id").values_list("id", flat=True)[
+            :SEARCH_RESULT_LIMIT
+        ]
+    )
+
+
+def name_prefix_lookup(user, prefix):
+    """Range scans on lower(first_name) and lower(last_name)."""
+    return list(
+        ContactList.objects.filter(user=user)
+        .annotate(first_lower=Lower("first_name"), last_lower=Lower("last_name"))
+        .filter(
+            prefix_range("first_lower", prefix) | prefix_range("last_lower", prefix)
+        )
+        .order_by("first_lower", "last_lower", "id")
+        .values_list("id", flat=True)[:SEARCH_RESULT_LIMIT]
+    )
+
+
+def fulltext_lookup(user, query):
+    return get_search_backend().search(user, query)
+
+
+def fuzzy_lookup(user, query):
+    return [pk for pk, score in fuzzy_search(user, query)]
+
+
+STRATEGIES = {
+    "phone_prefix_suffix": phone_lookup,
+    "email_lower": email_lookup,
+    "name_prefix_range": name_prefix_lookup,
+    "fulltext": fulltext_lookup,
+    "fuzzy": fuzzy_lookup,
+}
+
+
+class SearchPlan:
+    """
+    A classified query and the strategy chain chosen for it.
+
+    ``supplement`` marks strategies whose hits are a subset of what the
+    next strategy would find; when they return less than a page, the next
+    strategy's results are appended instead of stopping.
+    """
+
+    def __init__(self, query, kind, value, chain, supplement=()):
+        self.query = query
+        self.kind = kind
+        self.value = value
+        self.chain = chain
+        self.supplement = set(supplement)
+        self.steps = []
+
+    @property
+    def used(self):
+        """Name of the last strategy that ran."""
+        return self.steps[-1][0] if self.steps else None
+
+    def execute(self, user):
+        ids = []
+        seen = set()
+        for name, argument in self.chain:
+            start = time.perf_counter()
+            found = STRATEGIES[name](user, argument)
+            elapsed = (time.perf_counter() - start) * 1000
+            self.steps.append((name, len(found), elapsed))
+            ids.extend(pk for pk in found if pk not in seen)
+            seen.update(found)
+            if ids and (name not in self.supplement or len(ids) >= CONTACTS_PER_PAGE):
+                break
+        logger.debug("contact search plan: %s", self)
+        return ids[:SEARCH_RESULT_LIMIT]
+
+    def describe_steps(self):
+        steps = " -> ".join(
+            f"{name}({hits} hits, {elapsed:.1f} ms)"
+            for name, hits, elapsed in self.steps
+        )
+        return steps or "not run"
+
+    def header(self):
+        """The plan without the query text, which may hold CR/LF."""
+        return f"{self.kind}: {self.describe_steps()}"
+
+    def __str__(self):
+        return f"{self.kind}[{self.value}]: {self.describe_steps()}"
+
+
+def plan_search(query, fuzzy=False):
+    query = query.strip()
+    if fuzzy:
+        return SearchPlan(query, FUZZY, query, [("fuzzy", query)])
+
+    if PHONE_RE.match(query):
+        digits = re.sub(r"\D", "", query)
+        if len(digits) >= MIN_PHONE_DIGITS:
+            if len(digits) > NATIONAL_NUMBER_LENGTH:
+                digits = digits[-NATIONAL_NUMBER_LENGTH:]
+            return SearchPlan(
+                query,
+                PHONE,
+                digits,
+                [("phone_prefix_suffix", digits), ("fulltext", digits)],
+            )
+
+    if EMAIL_RE.match(query) and not query.startswith("@"):
+        email = query.lower()
+        return SearchPlan(
+            query, EMAIL, email, [("email_lower", email), ("fulltext", query)]
+        )
+
+    if NAME_PREFIX_RE.match(query):
+        prefix = query.lower()
+        return SearchPlan(
+            query,
+            NAME_PREFIX,
+            prefix,
+            [("name_prefix_range", prefix), ("fulltext", query), ("fuzzy", query)],
+            supplement=["name_prefix_range"],
+        )
+
+    return SearchPlan(query, FREE_TEXT, query, [("fulltext", query), ("fuzzy", query)])
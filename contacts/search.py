@@ -0,0 +1,296 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+# Columns covered by full-text search, with their relevance weight.
+SEARCH_FIELDS = {
+    "first_name": 10.0,
+    "last_name": 10.0,
+    "nickname": 8.0,
+    "email": 5.0,
+    "contact": 5.0,
+    "company": 3.0,
+    "city": 2.0,
+    "notes": 1.0,
+}
+
+# Upper bound on ranked ids returned for one query.
+SEARCH_RESULT_LIMIT = 1000
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+class SearchBackend:
+    """
+    Interface every contact search backend implements.
+
+    ``search`` returns contact ids for one user, best match first. The
+    index is kept in sync by the signal handlers in ``contacts.signals``.
+    """
+
+    def install(self, schema_editor):
+        pass
+
+    def uninstall(self, schema_editor):
+        pass
+
+    def index(self, contacts):
+        pass
+
+    def remove(self, ids):
+        pass
+
+    def rebuild(self, user=None):
+        pass
+
+    def search(self, user, query, limit=SEARCH_RESULT_LIMIT):
+        raise NotImplementedError
+
+
+class LikeSearchBackend(SearchBackend):
+    """Unindexed ``icontains`` fallback for backends without full-text search."""
+
+    def search(self, user, query, limit=SEARCH_RESULT_LIMIT):
+        from .models import ContactList
+
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f"{field}__icontains": query})
+        return list(
+            ContactList.objects.filter(condition, user=user)
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)[:limit]
+        )
+
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    """
+    SQLite FTS5 index in ``contacts_contactlist_fts``, one row per contact
+    with ``rowid`` equal to the contact id.
+
+    The owner is stored as an indexed ``u<id>`` token so the per-user
+    restriction is answered by the full-text index rather than a filter
+    over every user's hits. Results are ranked with weighted bm25.
+    """
+
+    table = "contacts_contactlist_fts"
+
+    def install(self, schema_editor):
+        columns = ", ".join(SEARCH_FIELDS)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+            f"owner, {columns}, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {self.table} (rowid, owner, {columns}) "
+            f"SELECT id, 'u' || user_id, {self._select_columns()} "
+            f"FROM contacts_contactlist"
+        )
+
+    def uninstall(self, schema_editor):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def _select_columns(self):
+        return ", ".join(f"COALESCE({field}, '')" for field in SEARCH_FIELDS)
+
+    def index(self, contacts):
+        rows = [
+            [c.pk, f"u{c.user_id}"]
+            + [getattr(c, field) or "" for field in SEARCH_FIELDS]
+            for c in contacts
+        ]
+        if not rows:
+            return
+        placeholders = ", ".join(["%s"] * (len(SEARCH_FIELDS) + 2))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table} WHERE rowid = %s", [[r[0]] for r in rows]
+            )
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, owner, {', '.join(SEARCH_FIELDS)}) "
+                f"VALUES ({placeholders})",
+                rows,
+            )
+
+    def remove(self, ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table} WHERE rowid = %s", [[pk] for pk in ids]
+            )
+
+    def rebuild(self, user=None):
+        columns = ", ".join(SEARCH_FIELDS)
+        select = (
+            f"SELECT id, 'u' || user_id, {self._select_columns()} "
+            f"FROM contacts_contactlist"
+        )
+        with connection.cursor() as cursor:
+            if user is None:
+                cursor.execute(f"DELETE FROM {self.table}")
+                cursor.execute(
+                    f"INSERT INTO {self.table} (rowid, owner, {columns}) {select}"
+                )
+            else:
+                cursor.execute(
+                    f"DELETE FROM {self.table} WHERE owner MATCH %s", [f'"u{user.pk}"']
+                )
+                cursor.execute(
+                    f"INSERT INTO {self.table} (rowid, owner, {columns}) "
+                    f"{select} WHERE user_id = %s",
+                    [user.pk],
+                )
+
+    def match_expression(self, user, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        terms = " AND ".join(f'"{token}"*' for token in tokens)
+        return f'owner:"u{user.pk}" AND ({terms})'
+
+    def search(self, user, query, limit=SEARCH_RESULT_LIMIT):
+        expression = self.match_expression(user, query)
+        if expression is None:
+            return []
+        weights = ", ".join(["0"] + [str(w) for w in SEARCH_FIELDS.values()])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY bm25({self.table}, {weights}) LIMIT %s",
+                [expression, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    PostgreSQL side table holding a weighted ``tsvector`` per contact,
+    with a GIN index on the document and results ranked by ``ts_rank``.
+    """
+
+    table = "contacts_contactlist_search"
+    config = "simple"
+    # Postgres only has four weight classes.
+    weight_classes = {
+        "first_name": "A",
+        "last_name": "A",
+        "nickname": "A",
+        "email": "B",
+        "contact": "B",
+        "company": "C",
+        "city": "C",
+        "notes": "D",
+    }
+
+    def _document_sql(self):
+        return " || ".join(
+            f"setweight(to_tsvector('{self.config}', COALESCE({field}, '')), "
+            f"'{self.weight_classes[field]}')"
+            for field in SEARCH_FIELDS
+        )
+
+    def install(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            f"contact_id bigint PRIMARY KEY REFERENCES contacts_contactlist (id) "
+            f"ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"user_id bigint NOT NULL, document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_document_idx "
+            f"ON {self.table} USING GIN (document)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_user_idx "
+            f"ON {self.table} (user_id)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {self.table} (contact_id, user_id, document) "
+            f"SELECT id, user_id, {self._document_sql()} FROM contacts_contactlist"
+        )
+
+    def uninstall(self, schema_editor):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def index(self, contacts):
+        ids = [c.pk for c in contacts]
+        if not ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {self.table} (contact_id, user_id, document) "
+                f"SELECT id, user_id, {self._document_sql()} "
+                f"FROM contacts_contactlist WHERE id = ANY(%s) "
+                f"ON CONFLICT (contact_id) DO UPDATE "
+                f"SET user_id = EXCLUDED.user_id, document = EXCLUDED.document",
+                [ids],
+            )
+
+    def remove(self, ids):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE contact_id = ANY(%s)", [list(ids)]
+            )
+
+    def rebuild(self, user=None):
+        where, params = ("", []) if user is None else (" WHERE user_id = %s", [user.pk])
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}{where}", params)
+            cursor.execute(
+                f"INSERT INTO {self.table} (contact_id, user_id, document) "
+                f"SELECT id, user_id, {self._document_sql()} "
+                f"FROM contacts_contactlist{where}",
+                params,
+            )
+
+    def search(self, user, query, limit=SEARCH_RESULT_LIMIT):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        tsquery = " & ".join(f"{token}:*" for token in tokens)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT contact_id FROM {self.table}, "
+                f"to_tsquery('{self.config}', %s) query "
+                f"WHERE user_id = %s AND document @@ query "
+                f"ORDER BY ts_rank(document, query) DESC, contact_id DESC LIMIT %s",
+                [tsquery, user.pk, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+def sqlite_has_fts5(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return "ENABLE_FTS5" in {row[0] for row in cursor.fetchall()}
+
+
+def backend_class_for(conn):
+    """
+    ``CONTACT_SEARCH_BACKEND`` may name a backend class by dotted path;
+    otherwise one is picked from the database vendor.
+    """
+    path = getattr(settings, "CONTACT_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)
+    if conn.vendor == "postgresql":
+        return PostgresSearchBackend
+    if conn.vendor == "sqlite" and sqlite_has_fts5(conn):
+        return SQLiteFTSSearchBackend
+    return LikeSearchBackend
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        _backend = backend_class_for(connection)()
+    return _backend
@@ -0,0 +1,93 @@
+from contextvars import ContextVar
+
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from base.images import delete_on_commit
+from .models import ContactList
+from .search import SEARCH_FIELDS, get_search_backend
+from . import stats, trigrams
+
+# Sent after contacts are written in bulk (bulk_create/update), which
+# bypasses post_save. Arguments: user_id, contacts, created (True when the
+# contacts are new).
+bulk_contacts_changed = Signal()
+
+# Set while contacts.bulk.delete_contacts deletes a selection; it does the
+# per-contact post_delete bookkeeping below once for the whole set.
+deleting_in_bulk = ContextVar("deleting_in_bulk", default=False)
+
+# Fields the full-text and trigram rows are built from, owner included.
+INDEXED_FIELDS = frozenset(
+    [*SEARCH_FIELDS, *trigrams.TRIGRAM_FIELDS, "user", "user_id"]
+)
+
+
+@receiver(post_save, sender=ContactList)
+def index_contact(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and INDEXED_FIELDS.isdisjoint(update_fields):
+        return
+    get_search_backend().index([instance])
+    trigrams.index_contacts([instance])
+
+
+@receiver(pre_save, sender=ContactList)
+def remember_stats_state(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance._stats_before = None
+    elif instance._loaded_stats is not None:
+        instance._stats_before = instance._loaded_stats
+    else:
+        # Loaded with deferred fields; read what the row holds now
+        row = (
+            ContactList.objects.filter(pk=instance.pk)
+            .values_list("contact_type", "is_favorite", "contact_photo")
+            .first()
+        )
+        instance._stats_before = row and (row[0], row[1], bool(row[2]))
+
+
+@receiver(post_save, sender=ContactList)
+def count_contact(sender, instance, **kwargs):
+    before, after = instance._stats_before, instance.stats_state()
+    if before != after:
+        stats.apply_changes(instance.user_id, [(before, after)])
+    instance._loaded_stats = after
+
+
+@receiver(bulk_contacts_changed)
+def count_bulk_contacts(sender, user_id, contacts, created=False, **kwargs):
+    if created:
+        stats.apply_changes(user_id, [(None, c.stats_state()) for c in contacts])
+
+
+@receiver(bulk_contacts_changed)
+def index_bulk_contacts(sender, user_id, contacts, **kwargs):
+    get_search_backend().index(contacts)
+    trigrams.index_contacts(contacts)
+
+
+@receiver(post_delete, sender=ContactList)
+def unindex_contact(sender, instance, **kwargs):
+    if deleting_in_bulk.get():
+        return
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(post_delete, sender=ContactList)
+def uncount_contact(sender, instance, **kwargs):
+    if deleting_in_bulk.get():
+        return
+    stats.apply_changes(instance.user_id, [(instance.stats_state(), None)])
+
+
+@receiver(post_delete, sender=ContactList)
+def release_contact_photo(sender, instance, **kwargs):
+    if instance.contact_photo and not deleting_in_bulk.get():
+        delete_on_commit(
+            instance.contact_photo.storage,
+            [
+                instance.contact_photo.name,
+                *instance.contact_photo_renditions.values(),
+            ],
+        )
@@ -0,0 +1,156 @@
+"""
+Per-user contact counts, maintained incrementally.
+
+Every contact write turns into a delta on the writer's ContactStats rows
+(one per contact type) applied with ``F()`` updates inside the write's
+transaction: ``ContactList.save``/``delete`` through the signal receivers
+in ``contacts.signals``, bulk imports through ``bulk_contacts_changed``.
+Reading a user's totals is then a handful of rows whatever the size of the
+address book. ``rebuild`` recounts from ContactList and repairs drift
+(``manage.py repair_contact_stats``).
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import ContactList, ContactStats
+
+COUNTERS = ("total", "favorites", "with_photo")
+
+
+def apply_changes(user_id, changes):
+    """
+    Apply ``changes``, an iterable of ``(old, new)`` pairs of
+    ``ContactList.stats_state()`` values where ``None`` stands for "no
+    contact" (a create or a delete). ``(old, new, n)`` counts for ``n``
+    contacts making the same change.
+    """
+    deltas = {}
+    for old, new, *n in changes:
+        weight = n[0] if n else 1
+        for state, sign in ((old, -weight), (new, weight)):
+            if state is None:
+                continue
+            contact_type, favorite, photo = state
+            delta = deltas.setdefault(contact_type, [0, 0, 0])
+            delta[0] += sign
+            delta[1] += sign * favorite
+            delta[2] += sign * photo
+    with transaction.atomic():
+        for contact_type, delta in deltas.items():
+            if any(delta):
+                apply_delta(user_id, contact_type, dict(zip(COUNTERS, delta)))
+
+
+def apply_delta(user_id, contact_type, delta):
+    rows = ContactStats.objects.filter(user_id=user_id, contact_type=contact_type)
+    changes = {name: F(name) + value for name, value in delta.items()}
+    if rows.update(**changes):
+        return
+    if all(value <= 0 for value in delta.values()):
+        # Nothing to count down from (e.g. the user is being deleted)
+        return
+    try:
+        with transaction.atomic():
+            ContactStats.objects.create(
+                user_id=user_id, contact_type=contact_type, **delta
+            )
+    except IntegrityError:
+        # Created by a concurrent writer since the update above
+        rows.update(**changes)
+
+
+def user_stats(user):
+    """``{"total", "favorites", "with_photo", "by_type": {type: total}}``."""
+    stats = {name: 0 for name in COUNTERS}
+    by_type = {}
+    for row in ContactStats.objects.filter(user=user).values("contact_type", *COUNTERS):
+        for name in COUNTERS:
+            stats[name] += row[name]
+        if row["total"]:
+            by_type[row["contact_type"]] = row["total"]
+    labels = dict(ContactList.CONTACT_TYPE)
+    stats["by_type"] = [
+        (labels.get(contact_type, contact_type), total)
+        for contact_type, total in sorted(by_type.items(), key=lambda item: -item[1])
+    ]
+    return stats
+
+
+def state_queries(user):
+    latest = (
+        ContactList.objects.filter(user=user)
+        .order_by("-updated_at")
+        .values_list("updated_at", flat=True)
+    )
+    return latest, ContactStats.objects.filter(user=user)
+
+
+def contact_state(user):
+    """
+    ``(latest updated_at, count)`` of ``user``'s contacts. Every write
+    bumps ``updated_at`` or changes the count, so this versions anything
+    derived from the address book: one seek on the ``(user, updated_at)``
+    index and a sum over ContactStats, with nothing counted.
+    """
+    latest, totals = state_queries(user)
+    latest = latest.first()
+    return latest, totals.aggregate(count=Sum("total"))["count"] or 0
+
+
+async def acontact_state(user):
+    """``contact_state`` for async views."""
+    latest, totals = state_queries(user)
+    latest = await latest.afirst()
+    return latest, (await totals.aaggregate(count=Sum("total")))["count"] or 0
+
+
+def counted(contacts):
+    """Exact counters from ContactList: ``{(user_id, type): {counter: n}}``."""
+    rows = (
+        contacts.values("user_id", "contact_type")
+        .annotate(
+            total=Count("id"),
+            favorites=Count("id", filter=Q(is_favorite=True)),
+            with_photo=Count("id", filter=Q(contact_photo__gt="")),
+        )
+        .order_by()
+    )
+    return {
+        (row["user_id"], row["contact_type"]): {name: row[name] for name in COUNTERS}
+        for row in rows
+    }
+
+
+@transaction.atomic
+def rebuild(user=None, fix=True):
+    """
+    Recount ``user``'s stats (everyone's without a user) and, with ``fix``,
+    correct the rows that drifted. Returns ``[(user_id, type, stored,
+    actual)]`` for them.
+    """
+    contacts = ContactList.objects.all()
+    stored_rows = ContactStats.objects.select_for_update()
+    if user is not None:
+        contacts = contacts.filter(user=user)
+        stored_rows = stored_rows.filter(user=user)
+    actual = counted(contacts)
+    stored = {
+        (row.user_id, row.contact_type): row for row in stored_rows.order_by("id")
+    }
+    zero = {name: 0 for name in COUNTERS}
+    drift = []
+    for key in stored.keys() | actual.keys():
+        row = stored.get(key)
+        current = {name: getattr(row, name) for name in COUNTERS} if row else zero
+        expected = actual.get(key, zero)
+        if current == expected:
+            continue
+        drift.append((*key, current, expected))
+        if not fix:
+            continue
+        if row is None:
+            ContactStats.objects.create(user_id=key[0], contact_type=key[1], **expected)
+        else:
+            ContactStats.objects.filter(pk=row.pk).update(**expected)
+    return drift
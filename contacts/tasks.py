@@ -0,0 +1,72 @@
+import os
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from base.images import delete_renditions, jpeg_bytes, open_rgb, save_renditions
+from base.queue import task
+from base.storage import photo_storage
+from .importer import run_job
+from .models import ContactList, ImportJob
+
+PHOTO_QUALITY = 70
+# The stored photo is capped at this box; the largest rendition is 512px
+PHOTO_MAX_SIZE = (1024, 1024)
+
+
+@task("contacts.process_contact_photo")
+def process_contact_photo(contact_id):
+    """
+    Replace a contact's raw uploaded photo with a compressed JPEG and
+    generate its avatar renditions from the same decode.
+    """
+    contact = ContactList.objects.filter(pk=contact_id, photo_pending=True).first()
+    if contact is None or not contact.contact_photo:
+        return
+    raw_name = contact.contact_photo.name
+    storage = contact.contact_photo.storage
+    with storage.open(raw_name, "rb") as raw:
+        img = open_rgb(raw, PHOTO_MAX_SIZE)
+        img.load()
+
+    contact.contact_photo.save(
+        os.path.splitext(os.path.basename(raw_name))[0] + ".jpg",
+        ContentFile(jpeg_bytes(img, PHOTO_QUALITY)),
+        save=False,
+    )
+    renditions = save_renditions(storage, contact.contact_photo.name, img)
+    # Only swap if the user has not uploaded another photo in the meantime.
+    # updated_at is bumped so anything keyed on it sees the new file.
+    swapped = ContactList.objects.filter(pk=contact_id, contact_photo=raw_name).update(
+        contact_photo=contact.contact_photo.name,
+        contact_photo_renditions=renditions,
+        photo_pending=False,
+        updated_at=timezone.now(),
+    )
+    if swapped:
+        storage.delete(raw_name)
+    else:
+        storage.delete(contact.contact_photo.name)
+        delete_renditions(storage, renditions)
+
+
+def discard_import(job_id):
+    """The import will not be retried: delete its uploaded file."""
+    job = ImportJob.objects.filter(pk=job_id).first()
+    if job is not None:
+        job.release_source()
+
+
+@task("contacts.import_contacts", on_failure=discard_import)
+def import_contacts(job_id):
+    """Run an uploaded ImportJob; a retry resumes after the last chunk."""
+    job = ImportJob.objects.filter(pk=job_id).exclude(status=ImportJob.DONE).first()
+    if job is not None:
+        run_job(job)
+
+
+@task("contacts.release_photos")
+def release_photos(names):
+    """Release the stored photos and renditions of bulk-deleted contacts."""
+    for name in names:
+        photo_storage().delete(name)
@@ -0,0 +1,11 @@
+from django import template
+
+from contacts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def contact_cards(contacts, compact=False):
+    """Render a page of contact cards through the fragment cache."""
+    return render_cards(contacts, compact)
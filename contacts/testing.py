@@ -0,0 +1,41 @@
+"""
+Factories for the tests: users that can log in and valid contacts.
+"""
+
+from accounts.models import CustomUser
+from .models import ContactList
+
+TEST_PASSWORD = "password123"
+
+# A valid contact; tests override what they look at
+CONTACT_DEFAULTS = {
+    "first_name": "Asha",
+    "last_name": "Rao",
+    "contact": "9876543210",
+    "gender": "Female",
+    "address": "1 Road",
+    "city": "Pune",
+    "state": "Maharashtra",
+    "country": "India",
+    "postal_code": "411001",
+}
+
+
+def make_user(label, **fields):
+    """A user ``<label>@example.com`` who logs in with ``TEST_PASSWORD``."""
+    fields = {"first_name": label.title(), "last_name": "User", **fields}
+    return CustomUser.objects.create_user(
+        email=f"{label}@example.com",
+        username=label,
+        password=TEST_PASSWORD,
+        **fields,
+    )
+
+
+def contact_fields(**fields):
+    return {**CONTACT_DEFAULTS, **fields}
+
+
+def make_contact(user, **fields):
+    """Save a contact of ``user`` from ``CONTACT_DEFAULTS`` and ``fields``."""
+    return ContactList.objects.create(user=user, **contact_fields(**fields))
@@ -1,18 +1,85 @@
-from django.test import TestCase
+import base64
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from inspect import iscoroutinefunction
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
 from datetime import date, timedelta
-from io import BytesIO
+from io import BytesIO, StringIO
+import fakeredis
 from PIL import Image
 
 # import os
 
-from contacts.models import ContactList  # Adjust this import to your app name
+from backend import settings_asgi
+from base.models import Task
+from base.queue import run_pending
+from contacts.importer import import_rows, open_rows, read_csv
+from contacts.models import ContactList, ContactStats, ImportJob
+from contacts.benchmarking import bench_user, bulk_load
+from contacts.bulk import delete_contacts, run_bulk_action
+from contacts.cards import card_cache_stats
+from contacts.dedup import (
+    MAX_BLOCK_SIZE,
+    Record,
+    candidate_pairs,
+    find_duplicates,
+    merge_contacts,
+    soundex,
+)
+from contacts.forms import ContactListForm
+from contacts.exporters import astream
+from contacts.facets import facet_rows
+from contacts.planner import plan_search
+from contacts.stats import contact_state, rebuild, user_stats
+from contacts.testing import TEST_PASSWORD, contact_fields, make_contact, make_user
+from contacts.trigrams import fuzzy_search, index_contacts
+from contacts.validation import validate, validate_many
+from contacts.vcard import Base64Sink, inline_photo, read_vcards
 
 User = get_user_model()
 
+# Media and private files the tests write, removed in tearDownModule
+TEST_ROOT = tempfile.mkdtemp()
+TEST_MEDIA_ROOT = os.path.join(TEST_ROOT, "media")
+
+
+def tearDownModule():
+    shutil.rmtree(TEST_ROOT, ignore_errors=True)
+
+
+# Views render {% static %}; the manifest storage needs collectstatic first
+TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "photos": {"BACKEND": "base.storage.ContentAddressedStorage"},
+    "private": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": os.path.join(TEST_ROOT, "private")},
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+    },
+}
+
 
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STORAGES=TEST_STORAGES)
 class ContactListModelTest(TestCase):
 
     def setUp(self):
@@ -214,3 +281,1723 @@ class ContactListModelTest(TestCase):
         with self.assertRaises(ValidationError) as cm:
             contact.full_clean()
         self.assertIn("contact_photo", cm.exception.message_dict)
+
+
+# Pages are rendered on every request; ContactPageCacheTest covers caching
+@override_settings(STORAGES=TEST_STORAGES, CONTACT_PAGE_CACHE_TIMEOUT=0)
+class ContactListPaginationTest(TestCase):
+
+    def setUp(self):
+        self.user = make_user("pager")
+        ContactList.objects.bulk_create(
+            [
+                ContactList(
+                    user=self.user,
+                    **contact_fields(
+                        first_name="Contact",
+                        last_name="Number",
+                        contact=f"98765{i:05d}",
+                        gender="Other",
+                        city="Pune" if i % 2 else "Mumbai",
+                    ),
+                )
+                for i in range(120)
+            ]
+        )
+        self.client.force_login(self.user)
+
+    def test_cursor_pages_cover_every_contact_once(self):
+        seen = []
+        url = reverse("contact_list")
+        params = {}
+        while True:
+            response = self.client.get(url, params)
+            page = response.context["page_obj"]
+            seen.extend(c.pk for c in page)
+            if not page.has_next():
+                break
+            params = {"cursor": page.next_cursor}
+        self.assertEqual(len(seen), 120)
+        self.assertEqual(len(set(seen)), 120)
+
+    def test_cursor_page_runs_no_count_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("contact_list"))
+        self.assertFalse(any("COUNT(" in q["sql"] for q in ctx.captured_queries))
+
+    def test_previous_cursor_returns_previous_page(self):
+        first = self.client.get(reverse("contact_list")).context["page_obj"]
+        second = self.client.get(
+            reverse("contact_list"), {"cursor": first.next_cursor}
+        ).context["page_obj"]
+        back = self.client.get(
+            reverse("contact_list"), {"cursor": second.previous_cursor}
+        ).context["page_obj"]
+        self.assertEqual([c.pk for c in back], [c.pk for c in first])
+        self.assertFalse(back.has_previous())
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse("contact_list"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["page_obj"].number, 1)
+
+    def test_numbered_page_window_is_bounded(self):
+        response = self.client.get(reverse("contact_list"), {"page": "2"})
+        self.assertEqual(list(response.context["page_window"]), [1, 2, 3])
+
+    def test_filter_view_links_keep_selected_city(self):
+        response = self.client.get(reverse("city_list"), {"city": "Pune"})
+        self.assertTrue(all(c.city == "Pune" for c in response.context["contacts"]))
+        self.assertContains(response, "city=Pune&amp;cursor=")
+
+
+class ContactQueryPlanTest(TestCase):
+
+    def test_no_view_query_does_a_full_table_scan(self):
+        make_user("planner")
+        out = StringIO()
+        call_command("explain_contact_queries", "--strict", stdout=out)
+        self.assertIn("No query does a full table scan.", out.getvalue())
+        self.assertIn("contact_search: trigram candidates", out.getvalue())
+        self.assertNotIn("distinct values", out.getvalue())
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ContactSearchTest(TestCase):
+
+    def setUp(self):
+        self.user = make_user("searcher")
+        self.client.force_login(self.user)
+
+    def make_contact(self, user=None, **fields):
+        values = {
+            "user": user or self.user,
+            "first_name": "John",
+            "last_name": "Doe",
+            "contact": "1234567890",
+            "gender": "Male",
+            "address": "123 Main St",
+            "city": "New York",
+            "state": "New York",
+            "country": "USA",
+            "postal_code": "12345",
+        }
+        values.update(fields)
+        return ContactList.objects.create(**values)
+
+    def search(self, query):
+        response = self.client.get(reverse("contact_search"), {"q": query})
+        return [c.pk for c in response.context["contacts"]]
+
+    def test_search_covers_company_nickname_notes_and_city(self):
+        contact = self.make_contact(
+            company="Globex", nickname="Johnny", notes="Met at Kubecon", city="Pune"
+        )
+        for query in ["globex", "johnny", "kubecon", "pune"]:
+            self.assertEqual(self.search(query), [contact.pk], query)
+
+    def test_results_are_ranked_by_relevance(self):
+        in_notes = self.make_contact(first_name="Alice", notes="ask Priya about it")
+        in_name = self.make_contact(first_name="Priya")
+        self.assertEqual(self.search("priya"), [in_name.pk, in_notes.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        contact = self.make_contact(company="Initech")
+        contact.company = "Hooli"
+        contact.save()
+        self.assertEqual(self.search("initech"), [])
+        self.assertEqual(self.search("hooli"), [contact.pk])
+        contact.delete()
+        self.assertEqual(self.search("hooli"), [])
+
+    def test_bookkeeping_saves_are_not_reindexed(self):
+        contact = self.make_contact(company="Initech")
+        with mock.patch("contacts.signals.get_search_backend") as backend:
+            with mock.patch("contacts.trigrams.index_contacts") as index_trigrams:
+                contact.save(update_fields=["photo_pending", "updated_at"])
+                backend.assert_not_called()
+                index_trigrams.assert_not_called()
+                contact.company = "Hooli"
+                contact.save(update_fields=["company"])
+        backend.return_value.index.assert_called_once_with([contact])
+        index_trigrams.assert_called_once_with([contact])
+
+    def test_search_is_scoped_to_the_owner(self):
+        other = make_user("other", contact="5550001111")
+        self.make_contact(user=other, company="Umbrella")
+        self.assertEqual(self.search("umbrella"), [])
+
+    def test_fuzzy_mode_tolerates_typos(self):
+        contact = self.make_contact(first_name="Priyanka", last_name="Kulkarni")
+        self.make_contact(first_name="Zed", last_name="Brown")
+        response = self.client.get(
+            reverse("contact_search"), {"q": "priyanka kulkrni", "mode": "fuzzy"}
+        )
+        self.assertEqual([c.pk for c in response.context["contacts"]], [contact.pk])
+
+    def test_no_exact_match_falls_back_to_fuzzy(self):
+        contact = self.make_contact(first_name="Jonathan")
+        response = self.client.get(reverse("contact_search"), {"q": "jonathon"})
+        self.assertEqual([c.pk for c in response.context["contacts"]], [contact.pk])
+        self.assertTrue(response.context["fuzzy_fallback"])
+
+    def test_planner_classifies_query_shapes(self):
+        self.assertEqual(plan_search("+91 98765-43210").kind, "phone")
+        self.assertEqual(plan_search("+91 98765-43210").value, "9876543210")
+        self.assertEqual(plan_search("John@Example.com").kind, "email")
+        self.assertEqual(plan_search("pri").kind, "name_prefix")
+        self.assertEqual(plan_search("met at kubecon").kind, "free_text")
+        self.assertEqual(plan_search("pri", fuzzy=True).kind, "fuzzy")
+
+    def test_phone_suffix_lookup(self):
+        contact = self.make_contact(contact="919876543210")
+        self.make_contact(contact="1112223333")
+        self.assertEqual(self.search("3210"), [contact.pk])
+        self.assertEqual(self.search("+91 98765 43210"), [contact.pk])
+
+    def test_email_lookup_is_case_insensitive(self):
+        contact = self.make_contact(email="Mixed.Case@Example.com")
+        self.assertEqual(self.search("mixed.case@example.COM"), [contact.pk])
+        self.assertEqual(self.search("mixed.ca"), [contact.pk])
+
+    @override_settings(CONTACT_SEARCH_DEBUG=True)
+    def test_plan_is_exposed_in_debug(self):
+        self.make_contact()
+        response = self.client.get(reverse("contact_search"), {"q": "1234567890"})
+        self.assertTrue(response["X-Search-Plan"].startswith("phone: "))
+        self.assertIn("phone_prefix_suffix", response["X-Search-Plan"])
+
+    @override_settings(CONTACT_SEARCH_DEBUG=True)
+    def test_plan_header_leaves_out_the_query(self):
+        response = self.client.get(reverse("contact_search"), {"q": "john\nsmith"})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("john", response["X-Search-Plan"])
+
+
+class ContactTrigramTest(TestCase):
+
+    def setUp(self):
+        self.user = make_user("trigram")
+
+    def test_trigrams_follow_name_changes(self):
+        contact = make_contact(
+            self.user,
+            first_name="Anil",
+            last_name="Das",
+            contact="1234567890",
+            gender="Male",
+        )
+        self.assertIn("ani", set(contact.trigrams.values_list("trigram", flat=True)))
+        contact.first_name = "Sunil"
+        contact.save()
+        grams = set(contact.trigrams.values_list("trigram", flat=True))
+        self.assertIn("sun", grams)
+        self.assertNotIn("ani", grams)
+
+    def test_candidates_are_pruned_before_rescoring(self):
+        bulk_load(self.user, 300)
+        index_contacts(ContactList.objects.filter(user=self.user))
+        with CaptureQueriesContext(connection) as ctx:
+            results = fuzzy_search(self.user, "Sharmaa", limit=20)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertLessEqual(len(results), 20)
+        self.assertTrue(results)
+
+
+@override_settings(STORAGES=TEST_STORAGES, CONTACT_PAGE_CACHE_TIMEOUT=0)
+class FacetBrowseTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("facets")
+        self.client.force_login(self.user)
+        rows = [
+            ("Pune", "work", True),
+            ("Pune", "work", False),
+            ("Pune", "family", False),
+            ("Mumbai", "work", True),
+        ]
+        for i, (city, contact_type, favorite) in enumerate(rows):
+            make_contact(
+                self.user,
+                first_name="Face",
+                last_name="Ted",
+                contact=f"900000000{i}",
+                gender="Other",
+                city=city,
+                contact_type=contact_type,
+                is_favorite=favorite,
+            )
+
+    def facet(self, response, field):
+        return {f.value: f.count for f in response.context["facets"][field]}
+
+    def test_combined_filters(self):
+        response = self.client.get(
+            reverse("browse_contacts"),
+            {"city": "Pune", "contact_type": "work", "is_favorite": "1"},
+        )
+        self.assertEqual(len(response.context["contacts"]), 1)
+        self.assertEqual(response.context["total"], 1)
+        # A facet's own filter is ignored when counting its values
+        self.assertEqual(self.facet(response, "city"), {"Pune": 1, "Mumbai": 1})
+        self.assertEqual(self.facet(response, "contact_type"), {"work": 1})
+
+    def test_facet_counts_are_cached_until_a_write(self):
+        self.client.get(reverse("city_list"))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("city_list"))
+        self.assertFalse(any("GROUP BY" in q["sql"] for q in ctx.captured_queries))
+        self.assertEqual(dict(response.context["cities"]), {"Mumbai": 1, "Pune": 3})
+
+        ContactList.objects.filter(city="Mumbai").first().delete()
+        response = self.client.get(reverse("city_list"))
+        self.assertEqual(dict(response.context["cities"]), {"Pune": 3})
+
+    def test_all_facets_come_from_one_grouped_query(self):
+        state = contact_state(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            facet_rows(self.user, state)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_cached_rows_follow_writes_made_without_signals(self):
+        # As a write committed by another worker would: no local invalidation
+        self.client.get(reverse("city_list"))
+        ContactList.objects.filter(city="Mumbai").update(
+            city="Nagpur", updated_at=timezone.now()
+        )
+        response = self.client.get(reverse("city_list"))
+        self.assertEqual(dict(response.context["cities"]), {"Nagpur": 1, "Pune": 3})
+
+
+class ContactValidationTest(TestCase):
+
+    def valid_row(self, **overrides):
+        row = {
+            "first_name": "Asha",
+            "last_name": "Rao",
+            "contact": "9876543210",
+            "email": "asha@example.com",
+            "city": "Pune",
+            "postal_code": "411001",
+        }
+        row.update(overrides)
+        return row
+
+    def test_every_field_error_is_reported(self):
+        errors = validate(
+            self.valid_row(first_name="A1", contact="12", postal_code="x", city="P9")
+        )
+        self.assertEqual(
+            sorted(errors), ["city", "contact", "first_name", "postal_code"]
+        )
+
+    def test_required_message_wins_over_pattern(self):
+        errors = validate(self.valid_row(first_name=""))
+        self.assertEqual(errors["first_name"], ["First name is required."])
+
+    def test_validate_many_is_parallel_to_rows(self):
+        errors = validate_many(
+            [
+                self.valid_row(),
+                self.valid_row(email="nope"),
+                self.valid_row(date_of_birth=date.today() + timedelta(days=1)),
+            ]
+        )
+        self.assertEqual(errors[0], {})
+        self.assertEqual(list(errors[1]), ["email"])
+        self.assertEqual(list(errors[2]), ["date_of_birth"])
+
+    def test_form_reports_each_error_once(self):
+        form = ContactListForm(
+            data={
+                **self.valid_row(first_name="A1"),
+                "gender": "Other",
+                "address": "1 Road",
+                "state": "Maharashtra",
+                "country": "India",
+                "contact_type": "personal",
+            }
+        )
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors["first_name"],
+            ["First name must contain only alphabets and spaces."],
+        )
+
+
+IMPORT_CSV = """First Name,Last Name,Contact,Gender,Address,City,State,Country,Postal Code,Email
+Asha,Rao,9876543210,Female,1 Road,Pune,Maharashtra,India,411001,asha@example.com
+Ravi,Kumar,9876543211,Male,2 Road,Pune,Maharashtra,India,411002,
+Bad1,Row,12,Male,3 Road,Pune,Maharashtra,India,411003,
+Meena,Iyer,9876543213,Female,4 Road,Chennai,Tamil Nadu,India,600001,meena@example.com
+,Blank,9876543214,Robot,5 Road,Chennai,Tamil Nadu,India,600002,
+"""
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STORAGES=TEST_STORAGES)
+class ContactImportTest(TestCase):
+
+    def setUp(self):
+        self.user = make_user("importer")
+
+    def job(self, **kwargs):
+        return ImportJob.objects.create(
+            user=self.user, source_name="test.csv", chunk_size=2, **kwargs
+        )
+
+    def run_import(self, job):
+        return import_rows(job, read_csv(BytesIO(IMPORT_CSV.encode())))
+
+    def test_valid_rows_are_imported_and_rejects_reported(self):
+        job = self.run_import(self.job())
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual((job.rows_done, job.imported, job.rejected), (5, 3, 2))
+        self.assertEqual([r["row"] for r in job.errors], [3, 5])
+        self.assertEqual(sorted(job.errors[0]["errors"]), ["contact", "first_name"])
+        self.assertEqual(sorted(job.errors[1]["errors"]), ["first_name", "gender"])
+        contact = ContactList.objects.get(first_name="Asha")
+        self.assertEqual(contact.contact_reversed, "0123456789")
+        self.assertIsNone(ContactList.objects.get(first_name="Ravi").email)
+
+    def test_rows_are_inserted_per_chunk(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.run_import(self.job())
+        inserts = [
+            q for q in ctx.captured_queries
+            if q["sql"].startswith('INSERT INTO "contacts_contactlist"')
+        ]
+        # Chunks of two rows; the last chunk has no valid rows to insert
+        self.assertEqual(len(inserts), 2)
+
+    def test_imported_contacts_are_indexed(self):
+        cache.clear()
+        facet_rows(self.user)
+        self.run_import(self.job())
+        self.assertEqual(sum(n for _, n in facet_rows(self.user)), 3)
+        self.assertEqual(len(plan_search("Meena").execute(self.user)), 1)
+
+    def test_resume_skips_committed_rows(self):
+        job = self.run_import(self.job(rows_done=2, imported=2))
+        self.assertEqual(job.imported, 3)
+        self.assertFalse(ContactList.objects.filter(first_name="Asha").exists())
+
+    def test_command_reports_rejected_rows(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write(IMPORT_CSV)
+        out = StringIO()
+        call_command("import_contacts", self.user.email, f.name, stdout=out)
+        os.unlink(f.name)
+        self.assertIn("Imported 3 contacts, rejected 2 rows", out.getvalue())
+        self.assertIn("row 5: first_name: First name is required.", out.getvalue())
+
+    def test_upload_view_runs_import_on_the_queue(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("import_contacts"),
+            {"file": SimpleUploadedFile("contacts.csv", IMPORT_CSV.encode())},
+        )
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, reverse("import_status", args=[job.pk]))
+        path = job.source.path
+        self.assertNotIn("contacts", job.source.name)
+        self.assertFalse(path.startswith(str(settings.MEDIA_ROOT)))
+        run_pending()
+        response = self.client.get(reverse("import_status", args=[job.pk]))
+        self.assertContains(response, "Done")
+        self.assertEqual(ContactList.objects.filter(user=self.user).count(), 3)
+        job.refresh_from_db()
+        self.assertFalse(job.source)
+        self.assertFalse(os.path.exists(path))
+
+    def test_source_is_deleted_when_the_import_fails_for_good(self):
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse("import_contacts"),
+            {"file": SimpleUploadedFile("contacts.csv", IMPORT_CSV.encode())},
+        )
+        job = ImportJob.objects.get()
+        path = job.source.path
+        with mock.patch("contacts.importer.import_rows", side_effect=RuntimeError):
+            for _ in range(3):
+                Task.objects.update(run_after=timezone.now())
+                run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertFalse(job.source)
+        self.assertFalse(os.path.exists(path))
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STORAGES=TEST_STORAGES)
+class ContactExportTest(TestCase):
+
+    def setUp(self):
+        self.user = make_user("exporter")
+        job = ImportJob.objects.create(user=self.user, source_name="test.csv")
+        import_rows(job, read_csv(BytesIO(IMPORT_CSV.encode())))
+        self.client.force_login(self.user)
+
+    def export(self, fmt):
+        return self.client.get(reverse("export_contacts"), {"format": fmt})
+
+    def test_header_is_sent_before_the_query_runs(self):
+        response = self.export("csv")
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as ctx:
+            first = next(iter(response.streaming_content))
+        self.assertTrue(first.startswith(b"first_name,last_name,contact,"))
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_csv_export_can_be_imported_again(self):
+        response = self.export("csv")
+        self.assertIn("attachment;", response["Content-Disposition"])
+        content = b"".join(response.streaming_content)
+        other = bench_user("reimport")
+        job = ImportJob.objects.create(user=other, source_name="export.csv")
+        job = import_rows(job, read_csv(BytesIO(content)))
+        self.assertEqual((job.imported, job.rejected), (3, 0))
+
+    def test_jsonl_export_has_one_object_per_contact(self):
+        content = b"".join(self.export("jsonl").streaming_content)
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            sorted(row["first_name"] for row in rows), ["Asha", "Meena", "Ravi"]
+        )
+        self.assertIsNone(rows[0]["date_of_birth"])
+
+    def test_xlsx_export_is_a_valid_workbook(self):
+        content = b"".join(self.export("xlsx").streaming_content)
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = archive.read("xl/worksheets/sheet1.xml").decode()
+            self.assertIn("[Content_Types].xml", archive.namelist())
+        self.assertEqual(sheet.count("<row>"), 4)
+        self.assertIn(">Meena<", sheet)
+
+    def test_unknown_format_is_not_found(self):
+        self.assertEqual(self.export("pdf").status_code, 404)
+
+
+VCARD_30 = (
+    "BEGIN:VCARD\r\n"
+    "VERSION:3.0\r\n"
+    "FN:Asha Rao\r\n"
+    "N:Rao;Asha;;;\r\n"
+    "TEL;TYPE=cell:+91 98765 43210\r\n"
+    "TEL;TYPE=work,pref:(020) 4567-8901\r\n"
+    "EMAIL;TYPE=internet:asha@example.com\r\n"
+    "item1.ADR;TYPE=home:;;1 Road\\, Shivaji Nagar;Pune;Maharashtra;411001;India\r\n"
+    "ORG:Acme;Research\r\n"
+    "BDAY:1990-01-02\r\n"
+    "X-GENDER:Female\r\n"
+    "NOTE:First line\\nsecond line with a very long tail that has to be fo\r\n"
+    " lded onto a continuation line\r\n"
+    "X-SOCIALPROFILE;TYPE=twitter:https://twitter.com/asharao\r\n"
+    "END:VCARD\r\n"
+    "BEGIN:VCARD\r\n"
+    "VERSION:4.0\r\n"
+    "FN:Ravi Kumar\r\n"
+    "TEL;PREF=1:9876543211\r\n"
+    "GENDER:M\r\n"
+    "ADR:;;2 Road;Pune;Maharashtra;411002;India\r\n"
+    "BDAY:--0102\r\n"
+    "END:VCARD\r\n"
+)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STORAGES=TEST_STORAGES)
+class ContactVCardTest(TestCase):
+
+    def setUp(self):
+        self.user = make_user("vcard")
+
+    def import_vcf(self, content, user=None):
+        job = ImportJob.objects.create(
+            user=user or self.user, source_name="cards.vcf", chunk_size=2
+        )
+        return import_rows(job, read_vcards(BytesIO(content.encode())))
+
+    def photo_card(self, size, version):
+        buffer = BytesIO()
+        # Noise does not compress, so the base64 runs far past READ_LIMIT
+        Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3)).save(
+            buffer, format="PNG"
+        )
+        encoded = base64.b64encode(buffer.getvalue()).decode()
+        if version == "4.0":
+            photo = f"PHOTO:data:image/png;base64,{encoded}\r\n"
+        else:
+            folded = "\r\n ".join(
+                encoded[i : i + 74] for i in range(0, len(encoded), 74)
+            )
+            photo = f"PHOTO;ENCODING=b;TYPE=PNG:{folded}\r\n"
+        return (
+            f"BEGIN:VCARD\r\nVERSION:{version}\r\nN:Iyer;Meena;;;\r\n"
+            "TEL:9876543213\r\nX-GENDER:Female\r\n"
+            "ADR:;;4 Road;Chennai;Tamil Nadu;600001;India\r\n"
+            f"{photo}END:VCARD\r\n"
+        )
+
+    def test_cards_are_mapped_to_contact_fields(self):
+        first, second = read_vcards(BytesIO(VCARD_30.encode()))
+        self.assertEqual((first["first_name"], first["last_name"]), ("Asha", "Rao"))
+        # The preferred number comes first
+        self.assertEqual(first["contact"], "02045678901")
+        self.assertEqual(first["alternate_contact"], "919876543210")
+        self.assertEqual(first["address"], "1 Road, Shivaji Nagar")
+        self.assertEqual((first["city"], first["postal_code"]), ("Pune", "411001"))
+        self.assertEqual(first["company"], "Acme")
+        self.assertEqual(first["date_of_birth"], "1990-01-02")
+        self.assertTrue(first["notes"].endswith("has to be folded onto a continuation line"))
+        self.assertIn("\nsecond line", first["notes"])
+        self.assertEqual(first["twitter_username"], "asharao")
+        self.assertEqual((second["first_name"], second["last_name"]), ("Ravi", "Kumar"))
+        self.assertEqual(second["gender"], "Male")
+        self.assertEqual(second["date_of_birth"], "")
+
+    def test_import_batches_inserts(self):
+        with CaptureQueriesContext(connection) as ctx:
+            job = self.import_vcf(VCARD_30 * 2)
+        self.assertEqual((job.imported, job.rejected), (4, 0))
+        inserts = [
+            q for q in ctx.captured_queries
+            if q["sql"].startswith('INSERT INTO "contacts_contactlist"')
+        ]
+        self.assertEqual(len(inserts), 2)
+
+    def test_embedded_photos_are_decoded_and_processed(self):
+        for version in ("3.0", "4.0"):
+            job = self.import_vcf(self.photo_card((160, 160), version))
+            self.assertEqual(job.imported, 1, job.errors)
+        run_pending()
+        for contact in ContactList.objects.filter(user=self.user):
+            self.assertFalse(contact.photo_pending)
+            self.assertEqual(Image.open(contact.contact_photo.path).size, (160, 160))
+            self.assertEqual(sorted(contact.contact_photo_renditions), ["112", "56"])
+
+    def test_invalid_photo_rejects_the_card(self):
+        card = self.photo_card((10, 10), "3.0").replace(
+            "PHOTO;ENCODING=b;TYPE=PNG:", "PHOTO;ENCODING=b;TYPE=PNG:AAAA"
+        )
+        job = self.import_vcf(card)
+        self.assertEqual(job.rejected, 1)
+        self.assertEqual(list(job.errors[0]["errors"]), ["contact_photo"])
+
+    def test_corrupt_photo_body_rejects_the_card(self):
+        card = self.photo_card((40, 40), "4.0")
+        start = card.index("base64,") + len("base64,")
+        # The header still decodes; the bytes after it do not
+        card = card[: start + 200] + "!!!!" + card[start + 200 :]
+        job = self.import_vcf(card)
+        self.assertEqual((job.imported, job.rejected), (0, 1))
+        self.assertEqual(
+            job.errors[0]["errors"]["contact_photo"],
+            ["The embedded photo is not valid base64."],
+        )
+
+    def test_only_the_first_photo_is_kept(self):
+        card = self.photo_card((20, 20), "3.0")
+        photo = card[card.index("PHOTO") :].split("END:VCARD")[0]
+        card = card.replace(photo, photo * 2)
+        with mock.patch.object(Base64Sink, "discard", autospec=True) as discard:
+            (row,) = read_vcards(BytesIO(card.encode()))
+        self.assertEqual(discard.call_count, 1)
+        self.assertFalse(row["contact_photo"].corrupt)
+
+    def test_resume_decodes_no_skipped_photos(self):
+        job = ImportJob.objects.create(
+            user=self.user, source_name="cards.vcf", rows_done=2, imported=2
+        )
+        source = BytesIO((self.photo_card((20, 20), "3.0") * 3).encode())
+        with mock.patch("contacts.vcard.Base64Sink", wraps=Base64Sink) as sink:
+            import_rows(job, open_rows(job, source, "cards.vcf"), skipped=2)
+        self.assertEqual(sink.call_count, 1)
+        self.assertEqual((job.rows_done, job.imported), (3, 3))
+        self.assertEqual(ContactList.objects.filter(user=self.user).count(), 1)
+
+    def test_inline_photos_declare_their_format(self):
+        buffer = BytesIO()
+        Image.new("RGB", (8, 8), "red").save(buffer, format="PNG")
+        png = default_storage.save("inline/photo.jpg", ContentFile(buffer.getvalue()))
+        gif = default_storage.save("inline/photo.gif", ContentFile(b"not an image"))
+        for name, version, header in [
+            (png, "3.0", "PHOTO;ENCODING=b;TYPE=PNG:\r\n"),
+            (png, "4.0", "PHOTO:data:image/png;base64,\r\n"),
+            (gif, "3.0", "PHOTO;ENCODING=b;TYPE=GIF:\r\n"),
+        ]:
+            lines = list(inline_photo(default_storage, name, version))
+            self.assertEqual(lines[0], header)
+        unfolded = "".join(lines[1:]).replace("\r\n ", "").strip()
+        self.assertEqual(base64.b64decode(unfolded), b"not an image")
+
+    def test_photos_are_named_by_format_and_limit_the_chunk(self):
+        cards = self.photo_card((20, 20), "3.0") * 2
+        with mock.patch("contacts.importer.MAX_PHOTOS_PER_CHUNK", 1):
+            with CaptureQueriesContext(connection) as ctx:
+                job = self.import_vcf(cards)
+        self.assertEqual(job.imported, 2)
+        inserts = [
+            q for q in ctx.captured_queries
+            if q["sql"].startswith('INSERT INTO "contacts_contactlist"')
+        ]
+        self.assertEqual(len(inserts), 2)
+        for contact in ContactList.objects.filter(user=self.user):
+            self.assertTrue(contact.contact_photo.name.endswith(".png"))
+
+    def test_export_round_trips_through_import(self):
+        self.import_vcf(VCARD_30 + self.photo_card((160, 160), "3.0"))
+        run_pending()
+        self.client.force_login(self.user)
+        for version in ("3.0", "4.0"):
+            response = self.client.get(
+                reverse("export_contacts"),
+                {"format": "vcf", "version": version, "photos": "inline"},
+            )
+            content = b"".join(response.streaming_content)
+            self.assertTrue(
+                all(len(line) <= 75 for line in content.split(b"\r\n"))
+            )
+            other = bench_user(f"vcard{version[0]}")
+            job = ImportJob.objects.create(user=other, source_name="export.vcf")
+            job = import_rows(job, read_vcards(BytesIO(content)))
+            self.assertEqual((job.imported, job.rejected), (3, 0), job.errors)
+            asha = ContactList.objects.get(user=other, first_name="Asha")
+            self.assertEqual(asha.date_of_birth, date(1990, 1, 2))
+            self.assertEqual(asha.twitter_username, "asharao")
+            self.assertIn("\nsecond line", asha.notes)
+            meena = ContactList.objects.get(user=other, first_name="Meena")
+            self.assertTrue(meena.photo_pending)
+
+    def test_export_references_photo_urls(self):
+        self.import_vcf(self.photo_card((160, 160), "3.0"))
+        run_pending()
+        contact = ContactList.objects.get(user=self.user)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("export_contacts"), {"format": "vcf"})
+        content = b"".join(response.streaming_content).decode()
+        unfolded = content.replace("\r\n ", "")
+        url = contact.contact_photo.storage.url(
+            contact.contact_photo_renditions["112"]
+        )
+        self.assertIn(f"PHOTO;VALUE=uri:http://testserver{url}", unfolded)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STORAGES=TEST_STORAGES)
+class ContactDedupTest(TestCase):
+
+    def setUp(self):
+        self.user = make_user("dedup")
+
+    def contact(self, first, last, phone, **extra):
+        extra.setdefault("address", f"{phone[-3:]} Road")
+        return make_contact(
+            self.user, first_name=first, last_name=last, contact=phone, **extra
+        )
+
+    def test_soundex(self):
+        self.assertEqual(soundex("Robert"), "R163")
+        self.assertEqual(soundex("Rupert"), "R163")
+        self.assertEqual(soundex("Ashcraft"), "A261")
+        self.assertEqual(soundex("Tymczak"), "T522")
+
+    def test_duplicates_are_clustered_transitively(self):
+        asha = self.contact("Asha", "Rao", "9876543210", email="asha@example.com")
+        # Same number with a country code, no email
+        same_phone = self.contact("Asha", "Rao", "919876543210")
+        # Different number, same email (any case) and a typo in the name
+        same_email = self.contact("Ahsa", "Rao", "9000000001", email="ASHA@example.com")
+        # A relative sharing the landline and the address
+        self.contact("Priya", "Rao", "9876543210", address="210 Road")
+        self.contact("Ravi", "Kumar", "9111111111")
+        self.assertEqual(
+            find_duplicates(self.user), [[asha.pk, same_phone.pk, same_email.pk]]
+        )
+
+    def test_oversized_blocks_are_not_compared(self):
+        records = [
+            Record(i, "Asha", "Rao", f"98{i:08d}", "", None, None, f"{i} Road", "1")
+            for i in range(MAX_BLOCK_SIZE + 1)
+        ]
+        self.assertEqual(candidate_pairs(records), set())
+        self.assertEqual(len(candidate_pairs(records[:3])), 3)
+
+    def test_merge_consolidates_fields_and_adopts_the_photo(self):
+        keep = self.contact("Asha", "Rao", "9876543210", email="asha@example.com")
+        buffer = BytesIO()
+        Image.new("RGB", (120, 120), "blue").save(buffer, format="PNG")
+        other = self.contact(
+            "Asha",
+            "Rao",
+            "9123456789",
+            email="asha@work.example.com",
+            company="Acme",
+            notes="Met at the conference",
+            is_favorite=True,
+            contact_photo=SimpleUploadedFile("asha.png", buffer.getvalue()),
+        )
+        run_pending()
+        other.refresh_from_db()
+        photo = other.contact_photo.name
+
+        merge_contacts(self.user, keep.pk, [other.pk])
+
+        keep.refresh_from_db()
+        self.assertFalse(ContactList.objects.filter(pk=other.pk).exists())
+        self.assertEqual(keep.alternate_contact, "9123456789")
+        self.assertEqual(keep.alternate_email, "asha@work.example.com")
+        self.assertEqual((keep.company, keep.notes), ("Acme", "Met at the conference"))
+        self.assertTrue(keep.is_favorite)
+        self.assertEqual(keep.contact_photo.name, photo)
+        self.assertTrue(keep.contact_photo.storage.exists(photo))
+        self.assertEqual(keep.contact_photo_renditions, other.contact_photo_renditions)
+
+    def test_merge_keeps_every_number_and_email(self):
+        keep = self.contact("Asha", "Rao", "9876543210", email="asha@example.com")
+        second = self.contact(
+            "Asha", "Rao", "9123456789", email="asha@work.example.com",
+            alternate_contact="9000000001",
+        )
+        third = self.contact(
+            "Asha", "Rao", "9000000002", email="asha@home.example.com",
+            notes="Old phone",
+        )
+
+        merge_contacts(self.user, keep.pk, [second.pk, third.pk])
+
+        keep.refresh_from_db()
+        numbers = [keep.contact, keep.alternate_contact]
+        self.assertEqual(ContactList.objects.filter(user=self.user).count(), 1)
+        for number in ("9876543210", "9123456789", "9000000001", "9000000002"):
+            self.assertTrue(number in numbers or number in keep.notes, number)
+        self.assertIn("Other emails: asha@", keep.notes)
+        self.assertIn("Old phone", keep.notes)
+        emails = {keep.email, keep.alternate_email}
+        for email in ("asha@example.com", "asha@work.example.com", "asha@home.example.com"):
+            self.assertTrue(email in emails or email in keep.notes, email)
+
+    def test_merge_keeps_short_numbers(self):
+        # Too short to normalize; each is kept as it is, not collapsed to ""
+        keep = self.contact("Asha", "Rao", "9876543210", alternate_contact="101")
+        other = self.contact("Asha", "Rao", "9123456789", alternate_contact="102")
+        self.assertEqual(merge_contacts(self.user, keep.pk, [other.pk]), 1)
+        keep.refresh_from_db()
+        self.assertEqual(keep.alternate_contact, "101")
+        self.assertIn("Other numbers: 9123456789, 102", keep.notes)
+
+    def test_merge_view(self):
+        keep = self.contact("Asha", "Rao", "9876543210")
+        other = self.contact("Asha", "Rao", "+91 98765 43210")
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("duplicate_contacts"))
+        self.assertContains(response, "1 group of likely duplicates")
+        theirs = make_contact(bench_user("dedup"))
+        response = self.client.post(
+            reverse("merge_duplicates"),
+            {"ids": [keep.pk, other.pk, theirs.pk, theirs.pk + 100], "keep": other.pk},
+            follow=True,
+        )
+        self.assertRedirects(response, reverse("duplicate_contacts"))
+        # Only what was merged is counted
+        self.assertContains(response, "Merged 2 contacts.")
+        self.assertEqual(
+            list(ContactList.objects.filter(user=self.user).values_list("pk", flat=True)),
+            [other.pk],
+        )
+
+    def test_command_merges_into_the_oldest_contact(self):
+        keep = self.contact("Asha", "Rao", "9876543210")
+        self.contact("Asha", "Rao", "919876543210")
+        out = StringIO()
+        call_command("find_duplicates", self.user.email, "--merge", stdout=out)
+        self.assertIn("Found 1 clusters (2 contacts)", out.getvalue())
+        self.assertEqual(
+            list(ContactList.objects.filter(user=self.user).values_list("pk", flat=True)),
+            [keep.pk],
+        )
+
+    def test_merge_is_scoped_to_the_user(self):
+        mine = self.contact("Asha", "Rao", "9876543210")
+        stranger = bench_user("dedup")
+        theirs = make_contact(stranger)
+        merge_contacts(self.user, mine.pk, [theirs.pk])
+        self.assertTrue(ContactList.objects.filter(pk=theirs.pk).exists())
+        with self.assertRaises(ContactList.DoesNotExist):
+            merge_contacts(self.user, theirs.pk, [mine.pk])
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STORAGES=TEST_STORAGES)
+class ContactStatsTest(TestCase):
+
+    def setUp(self):
+        self.user = make_user("stats")
+
+    def contact(self, **extra):
+        return make_contact(self.user, **extra)
+
+    def assertStats(self, total, favorites, with_photo):
+        stats = user_stats(self.user)
+        self.assertEqual(
+            (stats["total"], stats["favorites"], stats["with_photo"]),
+            (total, favorites, with_photo),
+        )
+        self.assertEqual(rebuild(self.user, fix=False), [])
+
+    def test_writes_keep_counters_exact(self):
+        first = self.contact(is_favorite=True)
+        second = self.contact(contact_type="work")
+        self.assertStats(2, 1, 0)
+
+        second.is_favorite = True
+        second.contact_type = "client"
+        second.save()
+        self.assertStats(2, 2, 0)
+
+        buffer = BytesIO()
+        Image.new("RGB", (60, 60), "red").save(buffer, format="PNG")
+        first.contact_photo = SimpleUploadedFile("a.png", buffer.getvalue())
+        first.save()
+        run_pending()
+        self.assertStats(2, 2, 1)
+
+        # A save from an instance with deferred fields
+        partial = ContactList.objects.only("id", "user", "is_favorite").get(pk=first.pk)
+        partial.is_favorite = False
+        partial.save(update_fields=["is_favorite"])
+        self.assertStats(2, 1, 1)
+
+        ContactList.objects.get(pk=first.pk).delete()
+        self.assertStats(1, 1, 0)
+        self.assertEqual(user_stats(self.user)["by_type"], [("Client", 1)])
+
+    def test_imports_and_merges_are_counted(self):
+        job = ImportJob.objects.create(user=self.user, source_name="test.csv")
+        import_rows(job, read_csv(BytesIO(IMPORT_CSV.encode())))
+        self.assertStats(3, 0, 0)
+        keep = self.contact()
+        other = self.contact(contact="919876543210", is_favorite=True)
+        merge_contacts(self.user, keep.pk, [other.pk])
+        self.assertStats(4, 1, 0)
+
+    def test_reading_stats_does_not_count_contacts(self):
+        bulk_load(self.user, 200)
+        rebuild(self.user)
+        with self.assertNumQueries(1):
+            stats = user_stats(self.user)
+        self.assertEqual(stats["total"], 200)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("profile"))
+        self.assertContains(response, ">200</p>")
+
+    def test_repair_command_fixes_drift(self):
+        self.contact()
+        ContactStats.objects.filter(user=self.user).update(total=7)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("repair_contact_stats", "--check", stdout=out)
+        self.assertIn("total 7 -> 1", out.getvalue())
+        call_command("repair_contact_stats", stdout=StringIO())
+        self.assertStats(1, 0, 0)
+
+    def test_deleting_the_user_leaves_no_stats(self):
+        self.contact()
+        self.user.delete()
+        self.assertFalse(ContactStats.objects.exists())
+
+
+@override_settings(
+    MEDIA_ROOT=TEST_MEDIA_ROOT,
+    STORAGES=TEST_STORAGES,
+    CONTACT_PAGE_CACHE_TIMEOUT=0,
+)
+class ContactCardCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("cards")
+        self.client.login(email=self.user.email, password=TEST_PASSWORD)
+        for name in ("Asha", "Ravi", "Meera"):
+            make_contact(self.user, first_name=name)
+
+    def test_cards_are_rendered_once_per_version(self):
+        self.client.get(reverse("contact_list"))
+        self.assertEqual(card_cache_stats()["misses"], 3)
+        self.assertEqual(card_cache_stats()["hits"], 0)
+
+        second = self.client.get(reverse("contact_list"))
+        self.assertContains(second, "Meera")
+        self.assertEqual(card_cache_stats()["hits"], 3)
+
+        contact = ContactList.objects.get(first_name="Ravi")
+        contact.first_name = "Ravindra"
+        contact.save()
+        response = self.client.get(reverse("contact_list"))
+        self.assertContains(response, "Ravindra")
+        self.assertEqual(card_cache_stats()["misses"], 4)
+        self.assertEqual(card_cache_stats()["hits"], 5)
+
+    def test_compact_and_full_cards_are_cached_apart(self):
+        self.client.get(reverse("contact_list"))
+        response = self.client.get(reverse("city_list"), {"city": "Pune"})
+        self.assertNotContains(response, "Edit")
+        self.assertEqual(card_cache_stats()["misses"], 6)
+
+    def test_stats_endpoint_is_staff_only(self):
+        self.client.get(reverse("contact_list"))
+        self.client.get(reverse("contact_list"))
+        response = self.client.get(reverse("card_cache"))
+        self.assertEqual(response.status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse("card_cache"))
+        self.assertEqual(
+            response.json(), {"hits": 3, "misses": 3, "hit_ratio": 0.5}
+        )
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STORAGES=TEST_STORAGES)
+class ContactPageCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("pages")
+        self.client.login(email=self.user.email, password=TEST_PASSWORD)
+        # Pages with forms are cached once the CSRF cookie is set, which a
+        # browser has from the login page
+        self.client.get(reverse("login"))
+        self.contact = self.add("Asha")
+
+    def add(self, first_name, user=None):
+        return make_contact(user or self.user, first_name=first_name)
+
+    def assertCachedUntilWrite(self):
+        url = reverse("contact_list")
+        first = self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+        # The session and user lookups, and the conditional GET validators
+        self.assertEqual(len(queries), 4)
+
+        self.add("Ravi")
+        self.assertContains(self.client.get(url), "Ravi")
+
+        detail = reverse("contact_details", args=[self.contact.pk])
+        self.assertContains(self.client.get(detail), "Asha")
+        self.contact.first_name = "Ashwini"
+        self.contact.save()
+        self.assertContains(self.client.get(detail), "Ashwini")
+
+        self.contact.delete()
+        self.assertNotContains(self.client.get(url), "Ashwini")
+
+    def test_pages_are_cached_until_a_write(self):
+        self.assertCachedUntilWrite()
+
+    def test_file_based_cache(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        caches = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+            }
+        }
+        with self.settings(CACHES=caches):
+            cache.clear()
+            self.assertCachedUntilWrite()
+
+    def test_redis_cache(self):
+        # fakeredis stands in for the server: every connection to the same
+        # host shares one in-memory store, as workers would share Redis
+        caches = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": "redis://stand-in:6379/1",
+                "OPTIONS": {"connection_class": fakeredis.FakeConnection},
+            }
+        }
+        with self.settings(CACHES=caches):
+            cache.clear()
+            self.assertCachedUntilWrite()
+            cache.clear()
+
+    def test_writes_from_other_processes_expire_pages(self):
+        # Another worker or the task runner saves without running anything
+        # in this process; the page must still change
+        url = reverse("contact_list")
+        detail = reverse("contact_details", args=[self.contact.pk])
+        first = self.client.get(url)
+        etag = first["ETag"]
+        self.assertContains(self.client.get(detail), "Asha")
+        ContactList.objects.filter(pk=self.contact.pk).update(
+            first_name="Ashwini", updated_at=timezone.now()
+        )
+        response = self.client.get(url)
+        self.assertContains(response, "Ashwini")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertContains(self.client.get(detail), "Ashwini")
+
+    def test_imports_expire_pages(self):
+        url = reverse("city_list")
+        self.assertNotContains(self.client.get(url), "Meena")
+        job = ImportJob.objects.create(user=self.user, source_name="test.csv")
+        import_rows(job, read_csv(BytesIO(IMPORT_CSV.encode())))
+        self.assertContains(self.client.get(url), "Meena")
+
+    def test_pages_are_cached_per_user(self):
+        self.client.get(reverse("contact_list"))
+        other = bench_user("pages")
+        self.add("Kiran", user=other)
+        self.client.force_login(other)
+        response = self.client.get(reverse("contact_list"))
+        self.assertContains(response, "Kiran")
+        self.assertNotContains(response, "Asha")
+
+    def test_flash_messages_are_not_cached(self):
+        self.client.get(reverse("contact_list"))
+        response = self.client.post(
+            reverse("contact_delete", args=[self.contact.pk]), follow=True
+        )
+        self.assertContains(response, "deleted")
+        self.assertNotContains(self.client.get(reverse("contact_list")), "deleted")
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STORAGES=TEST_STORAGES)
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("etag")
+        self.client.login(email=self.user.email, password=TEST_PASSWORD)
+        self.client.get(reverse("login"))
+        self.contact = self.add("Asha")
+
+    def add(self, first_name):
+        return make_contact(self.user, first_name=first_name)
+
+    def revalidate(self, url, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            again = self.client.get(url, **headers)
+        return again, queries
+
+    def test_unchanged_list_is_not_modified(self):
+        url = reverse("contact_list")
+        response = self.client.get(url)
+        self.assertIn("no-cache", response["Cache-Control"])
+        again, queries = self.revalidate(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+        # Session and user lookups plus the latest updated_at and the stats
+        # total; no page of contacts is fetched and nothing is rendered.
+        self.assertEqual(len(queries), 4)
+        self.assertIn("LIMIT 1", queries[2]["sql"])
+        self.assertIn("contacts_contactstats", queries[3]["sql"])
+        self.assertFalse(again.templates)
+
+    def test_list_changes_with_writes_and_deletes(self):
+        url = reverse("city_list")
+        etag = self.client.get(url)["ETag"]
+        self.assertNotEqual(self.client.get(url, {"city": "Pune"})["ETag"], etag)
+
+        self.add("Ravi")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Ravi")
+
+        etag = response["ETag"]
+        ContactList.objects.get(first_name="Ravi").delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleting_an_older_contact_is_not_modified_since(self):
+        url = reverse("contact_list")
+        self.add("Ravi")
+        response = self.client.get(url)
+        # The latest updated_at would survive this delete, so lists carry
+        # no Last-Modified to revalidate against
+        self.assertFalse(response.has_header("Last-Modified"))
+        since = "Thu, 01 Jan 2099 00:00:00 GMT"
+        self.contact.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Asha")
+
+    def test_contact_details(self):
+        url = reverse("contact_details", args=[self.contact.pk])
+        response = self.client.get(url)
+        again, queries = self.revalidate(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(len(queries), 3)
+
+        again, _ = self.revalidate(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.contact.first_name = "Ashwini"
+        self.contact.save()
+        again, _ = self.revalidate(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertContains(again, "Ashwini")
+
+        other = reverse("contact_details", args=[self.contact.pk + 1])
+        self.assertEqual(self.client.get(other).status_code, 404)
+
+    def test_pages_with_flash_messages_have_no_validators(self):
+        response = self.client.post(
+            reverse("contact_delete", args=[self.contact.pk]), follow=True
+        )
+        self.assertContains(response, "deleted")
+        self.assertFalse(response.has_header("ETag"))
+        self.assertTrue(self.client.get(reverse("contact_list")).has_header("ETag"))
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STORAGES=TEST_STORAGES)
+class ContactApiTest(TestCase):
+
+    def setUp(self):
+        self.user = make_user("api")
+        self.client.login(email=self.user.email, password=TEST_PASSWORD)
+
+    def payload(self, **extra):
+        return contact_fields(**extra)
+
+    def send(self, method, url, data):
+        return getattr(self.client, method)(
+            url, json.dumps(data), content_type="application/json"
+        )
+
+    def assertNoStatsDrift(self):
+        self.assertEqual(rebuild(self.user, fix=False), [])
+
+    def test_sparse_fields_are_projected_in_sql(self):
+        ContactList.objects.create(user=self.user, notes="private", **self.payload())
+        url = reverse("api_contacts")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"fields": "first_name,contact"})
+        self.assertEqual(
+            response.json()["results"],
+            [{"first_name": "Asha", "contact": "9876543210"}],
+        )
+        select = next(q["sql"] for q in queries if "contacts_contactlist" in q["sql"])
+        self.assertNotIn('"notes"', select)
+        self.assertNotIn('"email"', select)
+
+        response = self.client.get(url, {"fields": "first_name,password"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pages_cover_every_contact_once(self):
+        for i in range(5):
+            ContactList.objects.create(
+                user=self.user, **self.payload(contact=f"987654321{i}")
+            )
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, "fields": "id"}
+            if cursor:
+                params["cursor"] = cursor
+            page = self.client.get(reverse("api_contacts"), params).json()
+            seen += [row["id"] for row in page["results"]]
+            cursor = page["next"]
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(
+            sorted(seen), sorted(ContactList.objects.values_list("id", flat=True))
+        )
+
+    def test_create_retrieve_update_delete(self):
+        response = self.send("post", reverse("api_contacts"), self.payload())
+        self.assertEqual(response.status_code, 201)
+        url = reverse("api_contact", args=[response.json()["id"]])
+        self.assertEqual(self.client.get(url).json()["city"], "Pune")
+
+        response = self.send(
+            "patch", url, {"contact_type": "work", "is_favorite": True}
+        )
+        self.assertEqual(response.json()["contact_type"], "work")
+        self.assertEqual(user_stats(self.user)["favorites"], 1)
+
+        response = self.send("patch", url, {"first_name": "4sha", "photo": "x"})
+        self.assertEqual(sorted(response.json()["errors"]), ["first_name", "photo"])
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertNoStatsDrift()
+
+    def test_create_reports_errors(self):
+        response = self.send(
+            "post", reverse("api_contacts"), self.payload(contact="12")
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()["errors"]), ["contact"])
+        self.assertFalse(ContactList.objects.exists())
+
+    def test_other_users_contacts_are_not_found(self):
+        other = ContactList.objects.create(user=bench_user("api"), **self.payload())
+        url = reverse("api_contact", args=[other.pk])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("api_contacts")).status_code, 401)
+
+    def test_batch(self):
+        kept = ContactList.objects.create(user=self.user, **self.payload())
+        gone = ContactList.objects.create(
+            user=self.user, **self.payload(contact="9876543211")
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.send(
+                "post",
+                reverse("api_contact_batch"),
+                {
+                    "create": [
+                        self.payload(first_name="Ravi", contact="9876543212"),
+                        self.payload(first_name="Meera", contact="9876543213"),
+                    ],
+                    "update": [
+                        {"id": kept.pk, "contact_type": "work", "is_favorite": True}
+                    ],
+                    "delete": [gone.pk],
+                },
+            )
+        body = response.json()
+        self.assertEqual(len(body["created"]), 2)
+        self.assertEqual(body["updated"][0]["contact_type"], "work")
+        self.assertEqual(body["deleted"], 1)
+        self.assertEqual(
+            sorted(ContactList.objects.values_list("first_name", flat=True)),
+            ["Asha", "Meera", "Ravi"],
+        )
+        self.assertEqual(len(plan_search("Meera").execute(self.user)), 1)
+        self.assertNoStatsDrift()
+        inserts = [
+            q for q in queries
+            if q["sql"].startswith('INSERT INTO "contacts_contactlist"')
+        ]
+        self.assertEqual(len(inserts), 1)
+
+    def test_invalid_batch_writes_nothing(self):
+        kept = ContactList.objects.create(user=self.user, **self.payload())
+        response = self.send(
+            "post",
+            reverse("api_contact_batch"),
+            {
+                "create": [self.payload(contact="9876543212"), {"first_name": "X"}],
+                "update": [{"id": kept.pk, "email": "not-an-email"}, {"city": "Goa"}],
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual(list(errors["create"]), ["1"])
+        self.assertEqual(list(errors["update"]["0"]), ["email"])
+        self.assertEqual(list(errors["update"]["1"]), ["id"])
+        self.assertEqual(ContactList.objects.count(), 1)
+
+        response = self.send(
+            "post",
+            reverse("api_contact_batch"),
+            {
+                "create": [self.payload(contact="9876543212")],
+                "update": [{"id": kept.pk + 100, "city": "Goa"}],
+            },
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(ContactList.objects.count(), 1)
+
+    def test_batch_rejects_bool_and_repeated_ids(self):
+        kept = ContactList.objects.create(user=self.user, **self.payload())
+        url = reverse("api_contact_batch")
+        response = self.send(
+            "post",
+            url,
+            {
+                "update": [
+                    {"id": kept.pk, "city": "Goa"},
+                    {"id": True, "city": "Goa"},
+                    {"id": kept.pk, "city": "Delhi"},
+                ]
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.json()["errors"]["update"]), ["1", "2"])
+        self.assertEqual(ContactList.objects.get().city, "Pune")
+
+        response = self.send("post", url, {"delete": [True]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ContactList.objects.count(), 1)
+
+    def test_put_is_not_allowed(self):
+        kept = ContactList.objects.create(user=self.user, **self.payload())
+        url = reverse("api_contact", args=[kept.pk])
+        self.assertEqual(self.send("put", url, {"city": "Goa"}).status_code, 405)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STORAGES=TEST_STORAGES)
+class BulkActionTest(TestCase):
+
+    def setUp(self):
+        self.user = make_user("bulk")
+        self.client.login(email=self.user.email, password=TEST_PASSWORD)
+
+    def add(self, first_name, user=None, **extra):
+        return make_contact(user or self.user, first_name=first_name, **extra)
+
+    def photo(self):
+        buffer = BytesIO()
+        Image.new("RGB", (120, 120), "red").save(buffer, format="PNG")
+        return SimpleUploadedFile("a.png", buffer.getvalue())
+
+    def assertNoStatsDrift(self):
+        self.assertEqual(rebuild(self.user, fix=False), [])
+
+    def test_updates_are_one_query_scoped_to_the_user(self):
+        mine = [self.add(name) for name in ("Asha", "Ravi", "Meera")]
+        theirs = self.add("Kiran", user=bench_user("bulk"))
+        ids = [c.pk for c in mine] + [theirs.pk]
+        with CaptureQueriesContext(connection) as queries:
+            count = run_bulk_action(self.user, "favorite", ids)
+        self.assertEqual(count, 3)
+        updates = [
+            q for q in queries if q["sql"].startswith('UPDATE "contacts_contactlist"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertFalse(ContactList.objects.get(pk=theirs.pk).is_favorite)
+        self.assertGreater(
+            ContactList.objects.get(pk=mine[0].pk).updated_at, mine[0].updated_at
+        )
+        self.assertEqual(user_stats(self.user)["favorites"], 3)
+
+        # Only rows that change are touched
+        self.assertEqual(run_bulk_action(self.user, "favorite", ids), 0)
+        self.assertEqual(run_bulk_action(self.user, "set_type", ids, "work"), 3)
+        self.assertEqual(dict(user_stats(self.user)["by_type"]), {"Work": 3})
+        self.assertEqual(
+            run_bulk_action(self.user, "set_communication", ids[:1], "email"), 1
+        )
+        self.assertEqual(run_bulk_action(self.user, "unfavorite", ids[1:]), 2)
+        self.assertNoStatsDrift()
+
+        with self.assertRaises(ValueError):
+            run_bulk_action(self.user, "set_type", ids, "enemy")
+        with self.assertRaises(ValueError):
+            run_bulk_action(self.user, "archive", ids)
+
+    def test_delete_is_set_based_and_releases_photos_later(self):
+        with_photo = self.add("Asha", contact_photo=self.photo())
+        run_pending()
+        with_photo.refresh_from_db()
+        storage = with_photo.contact_photo.storage
+        names = [
+            with_photo.contact_photo.name,
+            *with_photo.contact_photo_renditions.values(),
+        ]
+        few = [with_photo.pk, self.add("Ravi").pk]
+        many = [self.add(f"Meera{'x' * i}").pk for i in range(6)]
+
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(delete_contacts(self.user, few), 2)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(delete_contacts(self.user, many), 6)
+        self.assertEqual(len(large), len(small) - 1)  # no photo task queued
+        self.assertFalse(ContactList.objects.filter(user=self.user).exists())
+        self.assertEqual(plan_search("Ravi").execute(self.user), [])
+        self.assertNoStatsDrift()
+
+        self.assertTrue(all(storage.exists(name) for name in names))
+        with self.captureOnCommitCallbacks(execute=True):
+            run_pending()
+        self.assertFalse(any(storage.exists(name) for name in names))
+
+    def test_view_applies_the_action_and_returns(self):
+        contacts = [self.add("Asha"), self.add("Ravi")]
+        response = self.client.post(
+            reverse("bulk_contacts"),
+            {
+                "ids": [c.pk for c in contacts],
+                "action": "set_type",
+                "contact_type": "family",
+                "preferred_communication": "email",
+                "next": reverse("contact_search") + "?q=Rao",
+            },
+            follow=True,
+        )
+        self.assertEqual(response.redirect_chain[-1][0], "/contact/search/?q=Rao")
+        self.assertContains(response, "Changed the type of 2 contacts.")
+        # Each action reads only its own field's select
+        self.assertEqual(
+            set(
+                ContactList.objects.values_list(
+                    "contact_type", "preferred_communication"
+                )
+            ),
+            {("family", None)},
+        )
+
+        data = {"ids": [contacts[0].pk], "action": "delete", "next": "https://evil.test/"}
+        response = self.client.post(reverse("bulk_contacts"), data)
+        self.assertContains(response, "Delete 1 contact?")
+        self.assertContains(response, 'name="confirm"')
+        self.assertEqual(ContactList.objects.count(), 2)
+
+        response = self.client.post(
+            reverse("bulk_contacts"), {**data, "confirm": "1"}, follow=True
+        )
+        self.assertEqual(response.redirect_chain[-1][0], reverse("contact_list"))
+        self.assertContains(response, "Deleted 1 contact.")
+        self.assertEqual(ContactList.objects.count(), 1)
+
+        response = self.client.post(
+            reverse("bulk_contacts"), {"action": "delete"}, follow=True
+        )
+        self.assertContains(response, "Select at least one contact.")
+
+    def test_delete_confirmation_lists_only_the_users_contacts(self):
+        mine = self.add("Asha")
+        theirs = self.add("Kiran", user=bench_user("bulk"))
+        response = self.client.post(
+            reverse("bulk_contacts"),
+            {"ids": [mine.pk, theirs.pk], "action": "delete"},
+        )
+        self.assertContains(response, "Delete 1 contact?")
+        self.assertContains(response, "Asha Rao")
+        self.assertNotContains(response, "Kiran")
+        self.assertEqual(response.context["ids"], [mine.pk])
+        self.assertEqual(ContactList.objects.count(), 2)
+
+    def test_grouped_changes_apply_weighted_stats(self):
+        contacts = [self.add(f"Asha{'x' * i}") for i in range(4)]
+        run_bulk_action(self.user, "set_type", [c.pk for c in contacts], "work")
+        self.assertEqual(dict(user_stats(self.user)["by_type"]), {"Work": 4})
+        self.assertNoStatsDrift()
+
+
+@override_settings(
+    MEDIA_ROOT=TEST_MEDIA_ROOT,
+    STORAGES=TEST_STORAGES,
+    ROOT_URLCONF=settings_asgi.ROOT_URLCONF,
+)
+class AsyncViewTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user("async")
+        self.contact = make_contact(self.user)
+        self.other = make_contact(bench_user("async"), first_name="Kiran")
+
+    def test_read_pages_resolve_to_async_views(self):
+        for name in ("contact_list", "contact_search", "browse_contacts", "city_list"):
+            self.assertTrue(iscoroutinefunction(resolve(reverse(name)).func), name)
+        detail = reverse("contact_details", args=[self.contact.pk])
+        self.assertTrue(iscoroutinefunction(resolve(detail).func))
+        self.assertFalse(iscoroutinefunction(resolve(reverse("add_contact")).func))
+
+    async def test_pages_render_with_the_async_orm(self):
+        client = self.async_client
+        response = await client.get(reverse("contact_list"))
+        self.assertEqual(response.status_code, 302)
+
+        await client.aforce_login(self.user)
+        response = await client.get(reverse("contact_list"))
+        self.assertContains(response, "Asha")
+        self.assertNotContains(response, "Kiran")
+        response = await client.get(reverse("contact_list"), {"page": "1"})
+        self.assertContains(response, "Asha")
+
+        response = await client.get(reverse("contact_search"), {"q": "Asha"})
+        self.assertContains(response, "Asha")
+        response = await client.get(reverse("city_list"), {"city": "Pune"})
+        self.assertContains(response, "Asha")
+        response = await client.get(reverse("browse_contacts"))
+        self.assertContains(response, "Pune")
+
+        detail = reverse("contact_details", args=[self.contact.pk])
+        response = await client.get(detail)
+        self.assertContains(response, "Asha")
+        other = reverse("contact_details", args=[self.other.pk])
+        self.assertEqual((await client.get(other)).status_code, 404)
+
+    async def test_conditional_get(self):
+        await self.async_client.aforce_login(self.user)
+        await self.async_client.get(reverse("login"))
+        url = reverse("contact_list")
+        response = await self.async_client.get(url)
+        again = await self.async_client.get(
+            url, headers={"if-none-match": response["ETag"]}
+        )
+        self.assertEqual(again.status_code, 304)
+
+    async def test_export_streams_through_the_asgi_handler(self):
+        await self.async_client.aforce_login(self.user)
+        for fmt in ("csv", "jsonl", "xlsx", "vcf"):
+            response = await self.async_client.get(
+                reverse("export_contacts"), {"format": fmt}
+            )
+            # An async iterator: ASGI would read a sync one to the end first
+            self.assertTrue(response.is_async, fmt)
+            content = b"".join([chunk async for chunk in response.streaming_content])
+            if fmt != "xlsx":
+                self.assertIn(b"Asha", content)
+                self.assertNotIn(b"Kiran", content)
+
+    async def test_astream_holds_one_batch_at_a_time(self):
+        produced = []
+
+        def chunks():
+            for i in range(10):
+                produced.append(i)
+                yield b"0123456789"
+
+        stream = astream(chunks(), batch_bytes=30)
+        self.assertEqual(await anext(stream), b"0123456789")
+        self.assertEqual(len(produced), 3)
+        self.assertEqual(len([chunk async for chunk in stream]), 9)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, STORAGES=TEST_STORAGES)
+class ContactPhotoTaskTest(TestCase):
+
+    def setUp(self):
+        self.user = make_user("photos")
+
+    def png(self, size, color=(0, 128, 255, 255)):
+        buffer = BytesIO()
+        Image.new("RGBA", size, color=color).save(buffer, format="PNG")
+        return SimpleUploadedFile("raw.png", buffer.getvalue())
+
+    def upload(self, size):
+        return make_contact(
+            self.user,
+            first_name="Raw",
+            last_name="Upload",
+            contact="1234567890",
+            gender="Other",
+            contact_photo=self.png(size),
+        )
+
+    def test_upload_is_stored_raw_and_compressed_by_the_worker(self):
+        contact = self.upload((300, 300))
+        raw_name = contact.contact_photo.name
+        self.assertTrue(contact.photo_pending)
+        self.assertEqual(Image.open(contact.contact_photo.path).format, "PNG")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_pending()
+
+        contact.refresh_from_db()
+        self.assertFalse(contact.photo_pending)
+        self.assertNotEqual(contact.contact_photo.name, raw_name)
+        self.assertEqual(Image.open(contact.contact_photo.path).format, "JPEG")
+        self.assertFalse(contact.contact_photo.storage.exists(raw_name))
+
+    def test_worker_generates_square_renditions(self):
+        contact = self.upload((300, 200))
+        self.assertEqual(contact.photo_srcset, "")
+        self.assertEqual(contact.photo_thumbnail_url, contact.contact_photo.url)
+
+        run_pending()
+
+        contact.refresh_from_db()
+        # 224 and 512 are skipped: they would upscale a 200px tall source
+        self.assertEqual(sorted(contact.contact_photo_renditions), ["112", "56"])
+        storage = contact.contact_photo.storage
+        for width, name in contact.contact_photo_renditions.items():
+            self.assertEqual(Image.open(storage.path(name)).size, (int(width),) * 2)
+        self.assertIn(" 56w, ", contact.photo_srcset)
+        self.assertEqual(
+            contact.photo_thumbnail_url,
+            storage.url(contact.contact_photo_renditions["112"]),
+        )
+
+    def processed(self):
+        contact = self.upload((120, 120))
+        run_pending()
+        return ContactList.objects.get(pk=contact.pk)
+
+    def test_upload_is_hashed_once(self):
+        with mock.patch("base.images.hashlib.sha256", wraps=hashlib.sha256) as sha256:
+            contact = self.upload((120, 120))
+        self.assertEqual(sha256.call_count, 1)
+        self.assertIn(contact.contact_photo_hash, contact.contact_photo.name)
+
+    def test_notes_update_does_not_touch_the_photo(self):
+        contact = self.processed()
+        name = contact.contact_photo.name
+        with mock.patch("PIL.Image.open", wraps=Image.open) as opened:
+            contact.notes = "Only the notes changed"
+            contact.save()
+            ContactList.objects.get(pk=contact.pk).save()
+            run_pending()
+        self.assertEqual(opened.call_count, 0)
+        contact.refresh_from_db()
+        self.assertEqual(contact.contact_photo.name, name)
+        self.assertFalse(contact.photo_pending)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_reuploading_identical_bytes_keeps_processed_photo(self):
+        contact = self.processed()
+        name = contact.contact_photo.name
+        contact.contact_photo = self.png((120, 120))
+        contact.save()
+        contact.refresh_from_db()
+        self.assertEqual(contact.contact_photo.name, name)
+        self.assertFalse(contact.photo_pending)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_replacing_photo_deletes_previous_files(self):
+        contact = self.processed()
+        storage = contact.contact_photo.storage
+        old_files = [contact.contact_photo.name]
+        old_files += contact.contact_photo_renditions.values()
+        with self.captureOnCommitCallbacks(execute=True):
+            contact.contact_photo = self.png((120, 120), color=(255, 0, 0, 255))
+            contact.save()
+        self.assertTrue(contact.photo_pending)
+        for name in old_files:
+            self.assertFalse(storage.exists(name))
+
+    def test_identical_photos_share_one_file(self):
+        first = self.processed()
+        second = self.upload((120, 120))
+        run_pending()
+        second.refresh_from_db()
+        self.assertEqual(second.contact_photo.name, first.contact_photo.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(second.contact_photo.storage.exists(second.contact_photo.name))
+
+    def test_backfill_command_builds_missing_renditions(self):
+        contact = self.upload((120, 120))
+        run_pending()
+        ContactList.objects.filter(pk=contact.pk).update(contact_photo_renditions={})
+        call_command("build_photo_renditions", stdout=StringIO())
+        contact.refresh_from_db()
+        self.assertEqual(sorted(contact.contact_photo_renditions), ["112", "56"])
+
+    def test_list_page_serves_renditions(self):
+        self.upload((300, 300))
+        run_pending()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("contact_list"))
+        contact = ContactList.objects.get()
+        self.assertContains(response, 'sizes="7rem"')
+        self.assertContains(response, f'src="{contact.photo_thumbnail_url}"')
+        self.assertNotEqual(contact.photo_thumbnail_url, contact.contact_photo.url)
+
+
+class SqliteTuningTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_connections_apply_the_pragmas(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+        self.assertEqual(
+            self.pragma("busy_timeout"), settings.SQLITE_PRAGMAS["busy_timeout"]
+        )
+        self.assertEqual(self.pragma("cache_size"), settings.SQLITE_PRAGMAS["cache_size"])
+        self.assertEqual(self.pragma("temp_store"), 2)  # MEMORY
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
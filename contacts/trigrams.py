@@ -0,0 +1,128 @@
+import math
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Count
+
+# Fields whose trigrams are indexed for fuzzy matching.
+TRIGRAM_FIELDS = ["first_name", "last_name", "nickname", "company"]
+
+# Minimum similarity for a contact to count as a fuzzy match.
+SIMILARITY_THRESHOLD = 0.3
+
+# At most this many candidates are fetched and rescored per query.
+CANDIDATE_LIMIT = 200
+
+# Longer queries are truncated so the posting lists read stay bounded.
+MAX_QUERY_LENGTH = 64
+
+NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text):
+    """Lower-case, strip accents and collapse punctuation to spaces."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return NON_ALNUM_RE.sub(" ", text.lower()).strip()
+
+
+def trigrams(text):
+    """
+    Trigram set of ``text``, padded per word the way pg_trgm does it, so
+    short names and word starts still produce distinctive grams.
+    """
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def contact_trigrams(contact):
+    grams = set()
+    for field in TRIGRAM_FIELDS:
+        grams |= trigrams(getattr(contact, field))
+    return grams
+
+
+def index_contacts(contacts):
+    """Replace the stored trigrams of ``contacts``."""
+    from .models import ContactTrigram
+
+    contacts = list(contacts)
+    if not contacts:
+        return
+    ContactTrigram.objects.filter(contact__in=[c.pk for c in contacts]).delete()
+    # Plain tuples through executemany: bulk imports index hundreds of
+    # thousands of grams and model instances would dominate the cost.
+    rows = [(c.pk, c.user_id, gram) for c in contacts for gram in contact_trigrams(c)]
+    table = connection.ops.quote_name(ContactTrigram._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} (contact_id, user_id, trigram) VALUES (%s, %s, %s)",
+            rows,
+        )
+
+
+def rebuild(user=None, chunk_size=2000):
+    """Recompute trigrams for every contact, or only ``user``'s."""
+    from .models import ContactList, ContactTrigram
+
+    contacts = ContactList.objects.only("user_id", *TRIGRAM_FIELDS)
+    stale = ContactTrigram.objects.all()
+    if user is not None:
+        contacts = contacts.filter(user=user)
+        stale = stale.filter(user=user)
+    stale.delete()
+    batch = []
+    for contact in contacts.iterator(chunk_size=chunk_size):
+        batch.append(contact)
+        if len(batch) >= chunk_size:
+            index_contacts(batch)
+            batch = []
+    index_contacts(batch)
+
+
+def score(query_grams, row):
+    """Best similarity between the query and any one name of a contact."""
+    names = [row[field] for field in TRIGRAM_FIELDS]
+    names.append(f"{row['first_name']} {row['last_name']}")
+    return max(similarity(query_grams, trigrams(name)) for name in names)
+
+
+def fuzzy_search(user, query, threshold=SIMILARITY_THRESHOLD, limit=CANDIDATE_LIMIT):
+    """
+    Return ``(contact_id, score)`` pairs best first.
+
+    Jaccard similarity ``|Q ∩ C| / |Q ∪ C| >= t`` implies ``|Q ∩ C| >= t·|Q|``,
+    so contacts sharing fewer query trigrams than that are pruned in SQL.
+    Only the top ``limit`` candidates by shared-gram count are rescored.
+    """
+    from .models import ContactList, ContactTrigram
+
+    query_grams = trigrams(query[:MAX_QUERY_LENGTH])
+    if not query_grams:
+        return []
+    min_shared = max(1, math.ceil(threshold * len(query_grams)))
+    candidates = (
+        ContactTrigram.objects.filter(user=user, trigram__in=query_grams)
+        .values("contact_id")
+        .annotate(shared=Count("id"))
+        .filter(shared__gte=min_shared)
+        .order_by("-shared")[:limit]
+    )
+    ids = [row["contact_id"] for row in candidates]
+    rows = ContactList.objects.filter(pk__in=ids, user=user).values(
+        "id", *TRIGRAM_FIELDS
+    )
+    scored = [(row["id"], score(query_grams, row)) for row in rows]
+    scored = [pair for pair in scored if pair[1] >= threshold]
+    scored.sort(key=lambda pair: (-pair[1], -pair[0]))
+    return scored
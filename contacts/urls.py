@@ -1,20 +1,40 @@
 from django.urls import path
-from . import views
+from . import api, views
 
-urlpatterns = [
-    path("add/", views.add_contact, name="add_contact"),
-    path("list/", views.contact_list, name="contact_list"),
-    path("search/", views.contact_search, name="contact_search"),
-    path("city-list/", views.city_list, name="city_list"),
-    path("state-list/", views.state_list, name="state_list"),
-    path("country-list/", views.country_list, name="country_list"),
-    path("type-list/", views.contact_type_list, name="contact_type_list"),
-    path(
-        "communication-method/",
-        views.preferred_communication_list,
-        name="preferred_communication_list",
-    ),
-    path("<int:pk>/", views.contact_details, name="contact_details"),
-    path("<int:pk>/update/", views.contact_update, name="contact_update"),
-    path("<int:pk>/delete/", views.contact_delete, name="contact_delete"),
-]
+
+def contact_urlpatterns(pages):
+    """
+    The contact URLs, with the read-heavy pages taken from ``pages``:
+    ``contacts.views``, or ``contacts.async_views`` under ASGI.
+    """
+    return [
+        path("add/", views.add_contact, name="add_contact"),
+        path("list/", pages.contact_list, name="contact_list"),
+        path("search/", pages.contact_search, name="contact_search"),
+        path("browse/", pages.browse_contacts, name="browse_contacts"),
+        path("import/", views.import_contacts, name="import_contacts"),
+        path("import/<int:pk>/", views.import_status, name="import_status"),
+        path("export/", pages.export_contacts, name="export_contacts"),
+        path("bulk/", views.bulk_contacts, name="bulk_contacts"),
+        path("duplicates/", views.duplicate_contacts, name="duplicate_contacts"),
+        path("duplicates/merge/", views.merge_duplicates, name="merge_duplicates"),
+        path("api/contacts/", api.contact_collection, name="api_contacts"),
+        path("api/contacts/batch/", api.contact_batch, name="api_contact_batch"),
+        path("api/contacts/<int:pk>/", api.contact_resource, name="api_contact"),
+        path("card-cache/", views.card_cache, name="card_cache"),
+        path("city-list/", pages.city_list, name="city_list"),
+        path("state-list/", pages.state_list, name="state_list"),
+        path("country-list/", pages.country_list, name="country_list"),
+        path("type-list/", pages.contact_type_list, name="contact_type_list"),
+        path(
+            "communication-method/",
+            pages.preferred_communication_list,
+            name="preferred_communication_list",
+        ),
+        path("<int:pk>/", pages.contact_details, name="contact_details"),
+        path("<int:pk>/update/", views.contact_update, name="contact_update"),
+        path("<int:pk>/delete/", views.contact_delete, name="contact_delete"),
+    ]
+
+
+urlpatterns = contact_urlpatterns(views)
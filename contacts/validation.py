@@ -0,0 +1,216 @@
+"""
+Validation rules for ContactList.
+
+Rules are declared once per field with precompiled patterns and shared by
+``ContactList.clean()`` (and so by ContactListForm) and bulk import.
+Every field is checked in one pass and all errors are reported; within a
+field the first failing rule wins.
+"""
+
+import os
+import re
+
+from django.utils import timezone
+
+NAME_RE = re.compile(r"[A-Za-z ]+")
+PHONE_RE = re.compile(r"\d{10,13}")
+EMAIL_RE = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+")
+DIGITS_RE = re.compile(r"\d+")
+USERNAME_RE = re.compile(r"[\w ]+")
+
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+class Rule:
+    """
+    A check on one field value.
+
+    ``prepare()`` returns the predicate; it runs once per validation call,
+    so rules that depend on the current date compute it once per batch.
+    Blank values are skipped unless ``on_blank`` is set.
+    """
+
+    on_blank = False
+
+    def __init__(self, check, message):
+        self.check = check
+        self.message = message
+
+    def prepare(self):
+        return self.check
+
+
+class Required(Rule):
+    on_blank = True
+
+    def __init__(self, message):
+        # Only reached for non-blank values
+        super().__init__(lambda value: True, message)
+
+
+class Matches(Rule):
+    def __init__(self, pattern, message):
+        super().__init__(pattern.fullmatch, message)
+
+
+class NotInFuture(Rule):
+    def __init__(self, message):
+        super().__init__(None, message)
+
+    def prepare(self):
+        today = timezone.now().date()
+        return lambda value: value <= today
+
+
+class Extension(Rule):
+    def __init__(self, extensions, message):
+        super().__init__(
+            lambda value: os.path.splitext(str(value))[1].lower() in extensions,
+            message,
+        )
+
+
+class OneOf(Rule):
+    def __init__(self, values, message):
+        super().__init__(frozenset(values).__contains__, message)
+
+
+class MaxLength(Rule):
+    def __init__(self, limit, message):
+        super().__init__(lambda value: len(value) <= limit, message)
+
+
+def alpha(label):
+    return Matches(NAME_RE, f"{label} must contain only alphabets and spaces.")
+
+
+def social(label):
+    return Matches(
+        USERNAME_RE,
+        f"{label} username can contain letters, numbers, and spaces only.",
+    )
+
+
+RULES = {
+    "first_name": [Required("First name is required."), alpha("First name")],
+    "last_name": [Required("Last name is required."), alpha("Last name")],
+    "contact": [
+        Required("Contact number is required."),
+        Matches(PHONE_RE, "Contact must be digits only and 10 to 13 characters long."),
+    ],
+    "alternate_contact": [
+        Matches(
+            PHONE_RE,
+            "Alternate contact must be digits only and 10 to 13 characters long.",
+        )
+    ],
+    "email": [Matches(EMAIL_RE, "Enter a valid email address.")],
+    "alternate_email": [Matches(EMAIL_RE, "Enter a valid alternate email address.")],
+    "date_of_birth": [NotInFuture("Date of birth cannot be in the future.")],
+    "nickname": [alpha("Nickname")],
+    "job_title": [alpha("Job title")],
+    "company": [alpha("Company name")],
+    "city": [alpha("City")],
+    "state": [alpha("State")],
+    "country": [alpha("Country")],
+    "postal_code": [Matches(DIGITS_RE, "Postal code must contain digits only.")],
+    "linkedin_username": [social("LinkedIn")],
+    "twitter_username": [social("Twitter")],
+    "facebook_username": [social("Facebook")],
+    "instagram_username": [social("Instagram")],
+    "contact_photo": [
+        Extension(PHOTO_EXTENSIONS, "Only .png, .jpg, and .jpeg files are allowed.")
+    ],
+}
+
+
+def model_rules(model, fields):
+    """
+    RULES extended with the required/choices/max_length checks Django
+    derives from ``model``'s field definitions, for rows that never go
+    through ``full_clean()``.
+    """
+    rules = {}
+    for name in fields:
+        field = model._meta.get_field(name)
+        own = RULES.get(name, [])
+        derived = []
+        if not field.blank and not any(isinstance(r, Required) for r in own):
+            derived.append(Required("This field is required."))
+        if field.choices:
+            derived.append(
+                OneOf(
+                    [value for value, _ in field.flatchoices],
+                    f"Select a valid {field.verbose_name}.",
+                )
+            )
+        if getattr(field, "max_length", None):
+            derived.append(
+                MaxLength(
+                    field.max_length,
+                    f"Ensure this value has at most {field.max_length} characters.",
+                )
+            )
+        if derived or own:
+            # Required first so a blank value reports the missing field
+            rules[name] = sorted(
+                own + derived, key=lambda r: not isinstance(r, Required)
+            )
+    return rules
+
+
+def compile_rules(fields=None, rules=None):
+    """``[(field, [(on_blank, predicate, message), ...]), ...]`` ready to run."""
+    return [
+        (field, [(rule.on_blank, rule.prepare(), rule.message) for rule in checks])
+        for field, checks in (RULES if rules is None else rules).items()
+        if fields is None or field in fields
+    ]
+
+
+def check_value(checks, value):
+    # Django's notion of blank: False and 0 are values
+    blank = value is None or value == ""
+    for on_blank, predicate, message in checks:
+        if blank:
+            if on_blank:
+                return message
+        elif not predicate(value):
+            return message
+    return None
+
+
+def validate(values, fields=None):
+    """
+    Errors for one record, ``{field: [message]}``.
+
+    ``values`` is a ContactList or a mapping of field values.
+    """
+    if isinstance(values, dict):
+        get = values.get
+    else:
+        get = lambda field: getattr(values, field, None)  # noqa: E731
+    errors = {}
+    for field, checks in compile_rules(fields):
+        message = check_value(checks, get(field))
+        if message:
+            errors[field] = [message]
+    return errors
+
+
+def validate_many(rows, fields=None, rules=None):
+    """
+    Validate a batch of mappings field by field.
+
+    Rules (RULES unless ``rules`` is given) are prepared once for the
+    whole batch. Returns a list parallel to
+    ``rows`` holding each row's ``{field: [message]}`` (empty when valid).
+    """
+    rows = list(rows)
+    errors = [{} for _ in rows]
+    for field, checks in compile_rules(fields, rules):
+        for row, row_errors in zip(rows, errors):
+            message = check_value(checks, row.get(field))
+            if message:
+                row_errors[field] = [message]
+    return errors
@@ -0,0 +1,556 @@
+"""
+vCard 3.0/4.0 reading and writing.
+
+``read_vcards`` parses a .vcf stream incrementally: physical lines are read
+with a length limit and unfolded on the fly, and an embedded base64 photo
+is decoded chunk by chunk into a temporary file on disk, so neither the
+file nor any photo is ever held in memory. Each card becomes
+a raw field mapping for ``contacts.importer.import_rows``.
+
+``vcard_cards`` writes one card per contact, with the photo referenced by
+URL, inlined as base64 or left out.
+"""
+
+import base64
+import binascii
+import io
+import os
+import re
+from tempfile import TemporaryFile
+from urllib.parse import quote, unquote, urlsplit
+
+from django.core.files import File
+from PIL import Image
+
+# Longest physical line piece read at once; longer lines arrive in pieces
+READ_LIMIT = 64 * 1024
+# Text property values are cut at this length; photos are not text
+MAX_TEXT_CHARS = 10_000
+
+# Photo widths used when exporting: a link can afford the large rendition,
+# an inlined photo is kept small because it is copied into every card
+PHOTO_URL_WIDTH = 512
+PHOTO_INLINE_WIDTH = 224
+PHOTO_CHOICES = ("url", "inline", "none")
+PHOTO_EXTENSIONS = {
+    ".jpg": "JPEG",
+    ".jpeg": "JPEG",
+    ".png": "PNG",
+    ".gif": "GIF",
+    ".webp": "WEBP",
+}
+
+FOLD_OCTETS = 75
+
+SOCIAL_NETWORKS = {
+    "linkedin": "linkedin_username",
+    "twitter": "twitter_username",
+    "x": "twitter_username",
+    "facebook": "facebook_username",
+    "instagram": "instagram_username",
+}
+SOCIAL_URLS = {
+    "linkedin_username": "https://www.linkedin.com/in/{}",
+    "twitter_username": "https://twitter.com/{}",
+    "facebook_username": "https://www.facebook.com/{}",
+    "instagram_username": "https://www.instagram.com/{}",
+}
+GENDER_CODES = {"M": "Male", "F": "Female", "O": "Other"}
+
+UNESCAPE_RE = re.compile(r"\\(.)")
+PARAM_RE = re.compile(r'([^=;]+)(?:=((?:"[^"]*"|[^;])*))?')
+
+
+# --- Reading --------------------------------------------------------------
+
+
+def unescape(value):
+    return UNESCAPE_RE.sub(lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def split_escaped(value, sep):
+    """Split on ``sep`` where it is not backslash-escaped, then unescape."""
+    parts, current, escaped = [], [], False
+    for char in value:
+        if escaped:
+            current.append("\\" + char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == sep:
+            parts.append(unescape("".join(current)))
+            current = []
+        else:
+            current.append(char)
+    parts.append(unescape("".join(current)))
+    return parts
+
+
+def value_start(text):
+    """Index of the ``:`` ending ``NAME;PARAMS``, ignoring quoted colons."""
+    quoted = False
+    for index, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif char == ":" and not quoted:
+            return index
+    return -1
+
+
+def parse_head(head):
+    """``group.NAME;K=V;...`` -> (NAME, {K: [values]})."""
+    name, _, rest = head.partition(";")
+    name = name.rsplit(".", 1)[-1].strip().upper()
+    params = {}
+    for match in PARAM_RE.finditer(rest):
+        key, values = match.group(1).strip().upper(), match.group(2)
+        if values is None:
+            # vCard 2.1 style bare parameter, e.g. ``TEL;CELL``
+            key, values = "TYPE", key
+        params.setdefault(key, []).extend(
+            v.strip('"').lower() for v in values.split(",") if v
+        )
+    return name, params
+
+
+class DecodedPhoto(File):
+    """
+    A photo decoded from a card. ``corrupt`` is set when its base64 did not
+    decode; the importer rejects the row rather than store part of a file.
+    """
+
+    def __init__(self, file, corrupt):
+        super().__init__(file, name="photo")
+        self.corrupt = corrupt
+
+
+class Base64Sink:
+    """Decodes base64 text fed in arbitrary pieces into a temporary file."""
+
+    def __init__(self):
+        self.file = TemporaryFile()
+        self.pending = ""
+        self.corrupt = False
+
+    def feed(self, text):
+        data = self.pending + "".join(text.split())
+        usable = len(data) - len(data) % 4
+        self.pending = data[usable:]
+        self.write(data[:usable])
+
+    def write(self, data):
+        if self.corrupt:
+            return
+        try:
+            self.file.write(base64.b64decode(data, validate=True))
+        except (binascii.Error, ValueError):
+            # Nothing after a bad piece is written
+            self.corrupt = True
+
+    def close(self):
+        if self.pending:
+            self.write(self.pending + "=" * (-len(self.pending) % 4))
+        self.file.flush()
+        self.file.seek(0)
+        return DecodedPhoto(self.file, self.corrupt)
+
+    def discard(self):
+        self.file.close()
+
+
+class Property:
+    """
+    One unfolded content line, fed physical line pieces as they arrive.
+    Inline photos are decoded only if ``decode_photo``.
+    """
+
+    def __init__(self, decode_photo=True):
+        self.decode_photo = decode_photo
+        self.head = []
+        self.name = None
+        self.params = {}
+        self.parts = []
+        self.size = 0
+        self.sink = None
+
+    def feed(self, text):
+        if self.name is None:
+            self.head.append(text)
+            joined = "".join(self.head)
+            split = value_start(joined)
+            if split < 0:
+                if len(joined) > MAX_TEXT_CHARS:
+                    # Not a content line; ignore it
+                    self.name, self.head = "", []
+                return
+            self.name, self.params = parse_head(joined[:split])
+            self.head = []
+            if (
+                self.name == "PHOTO"
+                and self.decode_photo
+                and self.params.get("ENCODING", [""])[0] in ("b", "base64")
+            ):
+                self.sink = Base64Sink()
+            text = joined[split + 1 :]
+        if self.sink is not None:
+            self.sink.feed(text)
+            return
+        if self.size < MAX_TEXT_CHARS:
+            self.parts.append(text)
+            self.size += len(text)
+        if self.name == "PHOTO" and self.decode_photo and self.size >= 5:
+            self.switch_to_data_uri()
+
+    def switch_to_data_uri(self):
+        # vCard 4.0 inlines photos as ``data:image/jpeg;base64,....``
+        value = "".join(self.parts)
+        if not value.startswith("data:"):
+            return
+        comma = value.find(",")
+        if comma < 0:
+            return
+        if value[:comma].endswith(";base64"):
+            self.sink = Base64Sink()
+            self.sink.feed(value[comma + 1 :])
+            self.parts, self.size = [], 0
+
+    @property
+    def value(self):
+        return "".join(self.parts)[:MAX_TEXT_CHARS]
+
+
+def physical_lines(stream, limit=READ_LIMIT):
+    """
+    Yield ``(piece, starts_line)`` for every piece of at most ``limit``
+    characters, with line endings removed.
+    """
+    at_line_start = True
+    while True:
+        piece = stream.readline(limit)
+        if not piece:
+            return
+        ends_line = piece.endswith(("\n", "\r"))
+        yield piece.rstrip("\r\n"), at_line_start
+        at_line_start = ends_line
+
+
+def read_properties(stream, decode_photos=lambda: True):
+    """
+    Yield unfolded Property objects from a .vcf stream. ``decode_photos()``
+    is asked as each property starts whether to decode an inline photo.
+    """
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    prop = None
+    for piece, starts_line in physical_lines(stream):
+        if starts_line and piece[:1] in (" ", "\t"):
+            if prop is not None:
+                prop.feed(piece[1:])
+            continue
+        if starts_line:
+            if prop is not None and prop.name:
+                yield prop
+            prop = None
+            if not piece:
+                continue
+            prop = Property(decode_photos())
+        if prop is not None:
+            prop.feed(piece)
+    if prop is not None and prop.name:
+        yield prop
+
+
+def read_vcards(stream, skip=0):
+    """
+    Yield one raw field mapping per card of a .vcf file. The first ``skip``
+    cards are only read past: their fields are not mapped and their photos
+    not decoded.
+    """
+    card, seen = None, 0
+    for prop in read_properties(stream, decode_photos=lambda: seen >= skip):
+        if prop.name == "BEGIN" and prop.value.strip().upper() == "VCARD":
+            card = []
+        elif prop.name == "END" and card is not None:
+            seen += 1
+            if seen > skip:
+                yield card_fields(card)
+            card = None
+        elif card is not None and seen >= skip:
+            card.append(prop)
+
+
+def pref_order(props):
+    """Preferred values first (TYPE=pref in 3.0, PREF=1 in 4.0), else file order."""
+    return sorted(
+        props,
+        key=lambda p: not (
+            "pref" in p.params.get("TYPE", []) or p.params.get("PREF") == ["1"]
+        ),
+    )
+
+
+def digits(value):
+    return "".join(char for char in value if char.isdigit())
+
+
+def parse_bday(value):
+    value = value.strip()
+    if "T" in value:
+        value = value.split("T", 1)[0]
+    if value.startswith("--"):
+        # Day and month without a year cannot be stored
+        return ""
+    if len(value) == 8 and value.isdigit():
+        value = f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    return value
+
+
+def social_handle(value):
+    """``https://twitter.com/name/`` or ``@name`` -> ``name``."""
+    path = urlsplit(value.strip()).path if "://" in value else value
+    return unquote(path.rstrip("/").rsplit("/", 1)[-1]).lstrip("@")
+
+
+def social_field(prop):
+    for network in prop.params.get("TYPE", []):
+        if network in SOCIAL_NETWORKS:
+            return SOCIAL_NETWORKS[network]
+    host = urlsplit(prop.value.strip()).hostname or ""
+    for network, field in SOCIAL_NETWORKS.items():
+        if host == f"{network}.com" or host.endswith(f".{network}.com"):
+            return field
+    return None
+
+
+def card_fields(props):
+    """Map one card's properties onto ContactList import columns."""
+    by_name = {}
+    for prop in props:
+        by_name.setdefault(prop.name, []).append(prop)
+
+    def first(name):
+        found = by_name.get(name)
+        return unescape(found[0].value).strip() if found else ""
+
+    row = {}
+    if "N" in by_name:
+        parts = split_escaped(by_name["N"][0].value, ";") + ["", ""]
+        row["last_name"], row["first_name"] = parts[0].strip(), parts[1].strip()
+    if not row.get("first_name"):
+        # No structured name: split the formatted one
+        names = first("FN").split(None, 1)
+        if names:
+            row["first_name"] = names[0]
+            if not row.get("last_name") and len(names) > 1:
+                row["last_name"] = names[1]
+
+    phones = [digits(unescape(p.value)) for p in pref_order(by_name.get("TEL", []))]
+    phones = [phone for phone in phones if phone]
+    row["contact"] = phones[0] if phones else ""
+    row["alternate_contact"] = phones[1] if len(phones) > 1 else ""
+
+    emails = [unescape(p.value).strip() for p in pref_order(by_name.get("EMAIL", []))]
+    emails = [email for email in emails if email]
+    row["email"] = emails[0] if emails else ""
+    row["alternate_email"] = emails[1] if len(emails) > 1 else ""
+
+    if "ADR" in by_name:
+        adr = split_escaped(pref_order(by_name["ADR"])[0].value, ";") + [""] * 7
+        _, extended, street, city, region, postal, country = adr[:7]
+        row["address"] = ", ".join(p.strip() for p in (street, extended) if p.strip())
+        row["city"], row["state"] = city.strip(), region.strip()
+        row["postal_code"], row["country"] = postal.strip(), country.strip()
+
+    if "ORG" in by_name:
+        row["company"] = split_escaped(by_name["ORG"][0].value, ";")[0].strip()
+    row["job_title"] = first("TITLE")
+    row["nickname"] = first("NICKNAME").split(",")[0].strip()
+    row["website"] = first("URL")
+    row["notes"] = first("NOTE")
+    row["date_of_birth"] = parse_bday(first("BDAY"))
+
+    gender = first("GENDER").split(";")[0] or first("X-GENDER")
+    row["gender"] = GENDER_CODES.get(gender.upper(), gender.capitalize())
+
+    row["contact_type"] = first("X-CONTACT-TYPE")
+    row["preferred_communication"] = first("X-PREFERRED-COMMUNICATION")
+    row["is_favorite"] = first("X-FAVORITE")
+
+    for prop in by_name.get("X-SOCIALPROFILE", []):
+        field = social_field(prop)
+        if field and not row.get(field):
+            row[field] = social_handle(unescape(prop.value))
+    for network, field in SOCIAL_NETWORKS.items():
+        handle = first(f"X-{network.upper()}")
+        if handle and not row.get(field):
+            row[field] = social_handle(handle)
+
+    # The first decoded photo is kept; any others are closed unread
+    sinks = [prop.sink for prop in by_name.get("PHOTO", []) if prop.sink is not None]
+    try:
+        if sinks:
+            row["contact_photo"] = sinks[0].close()
+    finally:
+        for sink in sinks[1:]:
+            sink.discard()
+    return row
+
+
+# --- Writing --------------------------------------------------------------
+
+
+def escape(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace(",", "\\,")
+        .replace(";", "\\;")
+    )
+
+
+def fold(line):
+    """Fold a content line into CRLF-terminated lines of at most 75 octets."""
+    out, current, size = [], [], 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > FOLD_OCTETS:
+            out.append("".join(current))
+            # Continuation lines start with a space, which counts
+            current, size = [" "], 1
+        current.append(char)
+        size += width
+    out.append("".join(current))
+    return "\r\n".join(out) + "\r\n"
+
+
+def card_lines(contact, version):
+    """Content lines for one contact (a field -> value mapping)."""
+    lines = [
+        "BEGIN:VCARD",
+        f"VERSION:{version}",
+        f"FN:{escape(contact['first_name'])} {escape(contact['last_name'])}",
+        f"N:{escape(contact['last_name'])};{escape(contact['first_name'])};;;",
+    ]
+    pref = "PREF=1" if version == "4.0" else "TYPE=pref"
+    if contact["contact"]:
+        lines.append(f"TEL;{pref}:{contact['contact']}")
+    if contact["alternate_contact"]:
+        lines.append(f"TEL:{contact['alternate_contact']}")
+    if contact["email"]:
+        lines.append(f"EMAIL;{pref}:{escape(contact['email'])}")
+    if contact["alternate_email"]:
+        lines.append(f"EMAIL:{escape(contact['alternate_email'])}")
+    if any(contact[f] for f in ("address", "city", "state", "postal_code", "country")):
+        adr = ";".join(
+            escape(contact[f] or "")
+            for f in ("address", "city", "state", "postal_code", "country")
+        )
+        lines.append(f"ADR:;;{adr}")
+    if contact["company"]:
+        lines.append(f"ORG:{escape(contact['company'])}")
+    if contact["job_title"]:
+        lines.append(f"TITLE:{escape(contact['job_title'])}")
+    if contact["nickname"]:
+        lines.append(f"NICKNAME:{escape(contact['nickname'])}")
+    if contact["website"]:
+        lines.append(f"URL:{contact['website']}")
+    if contact["date_of_birth"]:
+        bday = contact["date_of_birth"]
+        lines.append(
+            f"BDAY:{bday:%Y%m%d}" if version == "4.0" else f"BDAY:{bday.isoformat()}"
+        )
+    if contact["gender"]:
+        if version == "4.0":
+            lines.append(f"GENDER:{contact['gender'][0]}")
+        else:
+            lines.append(f"X-GENDER:{contact['gender']}")
+    if contact["notes"]:
+        lines.append(f"NOTE:{escape(contact['notes'])}")
+    for field, url in SOCIAL_URLS.items():
+        if contact[field]:
+            network = field.split("_", 1)[0]
+            handle = quote(contact[field])
+            lines.append(f"X-SOCIALPROFILE;TYPE={network}:{url.format(handle)}")
+    lines.append(f"X-CONTACT-TYPE:{contact['contact_type']}")
+    if contact["preferred_communication"]:
+        lines.append(f"X-PREFERRED-COMMUNICATION:{contact['preferred_communication']}")
+    if contact["is_favorite"]:
+        lines.append("X-FAVORITE:1")
+    return lines
+
+
+def photo_name(contact, width):
+    """Stored rendition closest to ``width``, or the photo itself."""
+    renditions = contact.get("contact_photo_renditions") or {}
+    if renditions:
+        widths = sorted(int(w) for w in renditions)
+        return renditions[str(next((w for w in widths if w >= width), widths[-1]))]
+    return contact["contact_photo"]
+
+
+def photo_format(photo, name):
+    """
+    Pillow's name for the format of the open ``photo`` (read from its
+    header only), else the one its extension implies, else JPEG.
+    """
+    try:
+        with Image.open(photo) as img:
+            fmt = img.format
+    except (OSError, Image.DecompressionBombError):
+        fmt = None
+    finally:
+        photo.seek(0)
+    ext = os.path.splitext(name)[1].lower()
+    return fmt or PHOTO_EXTENSIONS.get(ext, "JPEG")
+
+
+def inline_photo(storage, name, version):
+    """Yield the folded PHOTO line for ``name`` without reading it whole."""
+    try:
+        photo = storage.open(name, "rb")
+    except OSError:
+        # A missing file leaves the card without a photo
+        return
+    fmt = photo_format(photo, name)
+    if version == "4.0":
+        yield f"PHOTO:data:image/{fmt.lower()};base64,\r\n"
+    else:
+        yield f"PHOTO;ENCODING=b;TYPE={fmt}:\r\n"
+    # 54 bytes encode to 72 base64 characters: one continuation line each
+    line_bytes = 54
+    with photo:
+        while True:
+            data = photo.read(line_bytes * 256)
+            if not data:
+                break
+            encoded = base64.b64encode(data).decode()
+            yield "".join(
+                f" {encoded[i : i + 72]}\r\n" for i in range(0, len(encoded), 72)
+            )
+
+
+def vcard_cards(rows, storage, version="3.0", photos="url", absolute_uri=None):
+    """
+    Yield vCard text one card at a time for ``rows`` (field mappings that
+    include ``contact_photo`` and ``contact_photo_renditions``).
+
+    ``photos`` is ``"url"`` (needs ``absolute_uri`` to turn storage URLs
+    into absolute ones), ``"inline"`` or ``"none"``.
+    """
+    for contact in rows:
+        text = "".join(fold(line) for line in card_lines(contact, version))
+        photo = contact["contact_photo"]
+        if photo and photos == "url":
+            url = storage.url(photo_name(contact, PHOTO_URL_WIDTH))
+            if absolute_uri is not None:
+                url = absolute_uri(url)
+            value = "PHOTO:" if version == "4.0" else "PHOTO;VALUE=uri:"
+            text += fold(value + url)
+        elif photo and photos == "inline":
+            yield text
+            yield from inline_photo(
+                storage, photo_name(contact, PHOTO_INLINE_WIDTH), version
+            )
+            text = ""
+        yield text + "END:VCARD\r\n"
@@ -1,11 +1,32 @@
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from .forms import ContactListForm
-from .models import ContactList
+from django.contrib.admin.views.decorators import staff_member_required
+from .forms import ContactListForm, ContactImportForm
+from .models import ContactList, ImportJob
+from base.queue import enqueue
 from django.contrib import messages
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Q
 from accounts.views import title_tailwind_classes
+from .pagination import paginate, number_page, pagination_context
+from .planner import plan_search
+from .facets import browse
+from .exporters import CONTENT_TYPES, WRITERS
+from .vcard import PHOTO_CHOICES
+from .dedup import find_duplicates, merge_contacts
+from .cards import card_cache_stats
+from .bulk import bulk_form_context, chosen_value, done_message, run_bulk_action
+from .pagecache import cache_per_user
+from .conditional import (
+    contact_conditional,
+    contact_etag,
+    list_conditional,
+    list_etag,
+    list_state,
+)
 
 
 
@@ -30,23 +51,17 @@ def add_contact(request):
 
 
 @login_required
+@list_conditional
+@cache_per_user(list_etag)
 def contact_list(request):
-    contact_qs = ContactList.objects.filter(user=request.user).order_by("-created_at")
-    paginator = Paginator(contact_qs, 50)  # 50 contacts per page
-
-    page = request.GET.get("page")
-    try:
-        contacts = paginator.page(page)
-    except PageNotAnInteger:
-        contacts = paginator.page(1)
-    except EmptyPage:
-        contacts = paginator.page(paginator.num_pages)
-    
+    contact_qs = ContactList.objects.filter(user=request.user)
+    contacts = paginate(request, contact_qs)  # 50 contacts per page
+
     context = {
         'title_tailwind_classes':title_tailwind_classes,
         "contacts": contacts,
-        "page_obj": contacts,
-        "is_paginated": contacts.has_other_pages(),
+        **pagination_context(contacts),
+        **bulk_form_context(),
     }
 
     return render(
@@ -57,6 +72,8 @@ def contact_list(request):
 
 
 @login_required
+@contact_conditional
+@cache_per_user(contact_etag)
 def contact_details(request, pk):
     contact = get_object_or_404(ContactList, pk=pk, user=request.user)
     context = {
@@ -104,196 +121,283 @@ def contact_delete(request, pk):
 @login_required
 def contact_search(request):
     query = request.GET.get("q", "")
-    contacts = ContactList.objects.filter(user=request.user)
+    fuzzy = request.GET.get("mode") == "fuzzy"
+    fuzzy_fallback = False
+    plan = None
 
     if query:
-        contacts = contacts.filter(
-            Q(first_name__icontains=query)
-            | Q(last_name__icontains=query)
-            | Q(email__icontains=query)
-            | Q(contact__icontains=query)
-        ).order_by("-created_at")
-
-    paginator = Paginator(contacts, 50)
-    page = request.GET.get("page")
-
-    try:
-        contacts_page = paginator.page(page)
-    except PageNotAnInteger:
-        contacts_page = paginator.page(1)
-    except EmptyPage:
-        contacts_page = paginator.page(paginator.num_pages)
+        # The planner picks the cheapest index for the query's shape and
+        # falls back to full-text, then trigram matching
+        plan = plan_search(query, fuzzy=fuzzy)
+        ids = plan.execute(request.user)
+        fuzzy_fallback = plan.used == "fuzzy" and not fuzzy
+        contacts_page = number_page(request, ids)
+        by_id = ContactList.objects.filter(user=request.user).in_bulk(
+            contacts_page.object_list
+        )
+        contacts_page.object_list = [
+            by_id[pk] for pk in contacts_page.object_list if pk in by_id
+        ]
+    else:
+        contacts = ContactList.objects.filter(user=request.user)
+        contacts_page = number_page(request, contacts.order_by("-created_at", "-id"))
 
     context = {
         "contacts": contacts_page,
         "query": query,
-        "page_obj": contacts_page,
-        "is_paginated": contacts_page.has_other_pages(),
+        "fuzzy": fuzzy,
+        "fuzzy_fallback": fuzzy_fallback and bool(contacts_page.object_list),
+        **pagination_context(contacts_page),
+        "search_plan": plan if settings.CONTACT_SEARCH_DEBUG else None,
+        **bulk_form_context(),
         'title_tailwind_classes':title_tailwind_classes,
     }
-    return render(
+    response = render(
         request,
         "contacts/contact_search.html", context
     )
+    if settings.CONTACT_SEARCH_DEBUG and plan is not None:
+        response["X-Search-Plan"] = plan.header()
+    return response
 
 
-@login_required
-def city_list(request):
-    cities = (
-        ContactList.objects.filter(user=request.user)
-        .values_list("city", flat=True)
-        .distinct()
-        .order_by("city")
-    )
-    selected_city = request.GET.get("city")
-    contacts = ContactList.objects.filter(user=request.user)
-    if selected_city:
-        contacts = contacts.filter(city=selected_city)
-
-    paginator = Paginator(contacts, 50)
-    page = request.GET.get("page")
-    try:
-        contacts = paginator.page(page)
-    except PageNotAnInteger:
-        contacts = paginator.page(1)
-    except EmptyPage:
-        contacts = paginator.page(paginator.num_pages)
+def facet_page(request, field, template, values_name, selected_name):
+    # One cached grouped aggregate feeds the value list and its counts
+    _, total, facets, contacts = browse(request.user, request.GET, list_state(request))
+    contacts = paginate(request, contacts)
 
     context = {
-        "cities": cities,
-        "selected_city": selected_city,
+        values_name: facets[field],
+        selected_name: request.GET.get(field),
+        "total": total,
         "contacts": contacts,
-        "page_obj": contacts,
-        "is_paginated": contacts.has_other_pages(),
+        **pagination_context(contacts),
         'title_tailwind_classes':title_tailwind_classes,
     }
-
-    return render( request, "contacts/city_list.html", context)
+    return render(request, template, context)
 
 
 @login_required
-def state_list(request):
-    states = (
-        ContactList.objects.filter(user=request.user)
-        .values_list("state", flat=True)
-        .distinct()
-        .order_by("state")
-    )
-    selected_state = request.GET.get("state")
-    contacts = ContactList.objects.filter(user=request.user)
-    if selected_state:
-        contacts = contacts.filter(state=selected_state)
-
-    paginator = Paginator(contacts, 50)
-    page = request.GET.get("page")
-    try:
-        contacts = paginator.page(page)
-    except PageNotAnInteger:
-        contacts = paginator.page(1)
-    except EmptyPage:
-        contacts = paginator.page(paginator.num_pages)
-    
+@list_conditional
+@cache_per_user(list_etag)
+def browse_contacts(request):
+    filters, total, facets, contacts = browse(request.user, request.GET, list_state(request))
+    contacts = paginate(request, contacts)
+
     context = {
-        "states": states,
-        "selected_state": selected_state,
+        "facets": facets,
+        "filters": filters,
+        "total": total,
         "contacts": contacts,
-        "page_obj": contacts,
-        "is_paginated": contacts.has_other_pages(),
+        **pagination_context(contacts),
         'title_tailwind_classes':title_tailwind_classes,
     }
-    return render( request, "contacts/state_list.html", context)
+    return render(request, "contacts/browse.html", context)
+
+
+@login_required
+@list_conditional
+@cache_per_user(list_etag)
+def city_list(request):
+    return facet_page(
+        request, "city", "contacts/city_list.html", "cities", "selected_city"
+    )
 
 
 @login_required
+@list_conditional
+@cache_per_user(list_etag)
+def state_list(request):
+    return facet_page(
+        request, "state", "contacts/state_list.html", "states", "selected_state"
+    )
+
+
+@login_required
+@list_conditional
+@cache_per_user(list_etag)
 def country_list(request):
-    countries = (
-        ContactList.objects.filter(user=request.user)
-        .values_list("country", flat=True)
-        .distinct()
-        .order_by("country")
+    return facet_page(
+        request, "country", "contacts/country_list.html", "countries", "selected_country"
     )
-    selected_country = request.GET.get("country")
-    contacts = ContactList.objects.filter(user=request.user)
-    if selected_country:
-        contacts = contacts.filter(country=selected_country)
-
-    paginator = Paginator(contacts, 50)
-    page = request.GET.get("page")
-    try:
-        contacts = paginator.page(page)
-    except PageNotAnInteger:
-        contacts = paginator.page(1)
-    except EmptyPage:
-        contacts = paginator.page(paginator.num_pages)
+
+
+@login_required
+@list_conditional
+@cache_per_user(list_etag)
+def contact_type_list(request):
+    return facet_page(
+        request,
+        "contact_type",
+        "contacts/contact_type_list.html",
+        "contact_types",
+        "selected_type",
+    )
+
+
+@login_required
+@list_conditional
+@cache_per_user(list_etag)
+def preferred_communication_list(request):
+    return facet_page(
+        request,
+        "preferred_communication",
+        "contacts/preferred_communication_list.html",
+        "preferred_comms",
+        "selected_comm",
+    )
+
+
+@login_required
+def import_contacts(request):
+    if request.method == "POST":
+        form = ContactImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            job = ImportJob.objects.create(
+                user=request.user, source=upload, source_name=upload.name
+            )
+            enqueue("contacts.import_contacts", job_id=job.pk)
+            messages.success(request, "Import started.")
+            return redirect("import_status", pk=job.pk)
+    else:
+        form = ContactImportForm()
     context = {
-        "countries": countries,
-        "selected_country": selected_country,
-        "contacts": contacts,
-        "page_obj": contacts,
-        "is_paginated": contacts.has_other_pages(),
+        "form": form,
+        "jobs": ImportJob.objects.filter(user=request.user).order_by("-created_at")[:10],
+        'title_tailwind_classes':title_tailwind_classes
     }
-    return render( request, "contacts/country_list.html", context)
+    return render(request, "contacts/import_contacts.html", context)
 
 
 @login_required
-def contact_type_list(request):
-    contact_types = (
-        ContactList.objects.filter(user=request.user)
-        .values_list("contact_type", flat=True)
-        .distinct()
-        .order_by("contact_type")
+def import_status(request, pk):
+    job = get_object_or_404(ImportJob, pk=pk, user=request.user)
+    context = {
+        "job": job,
+        'title_tailwind_classes':title_tailwind_classes
+    }
+    return render(request, "contacts/import_status.html", context)
+
+
+def export_response(request, stream=iter):
+    """
+    The export ``request`` asks for, with the writer's chunks passed through
+    ``stream`` (``exporters.astream`` for the async view).
+    """
+    fmt = request.GET.get("format", "csv")
+    if fmt not in WRITERS:
+        raise Http404("Unknown export format.")
+    options = {}
+    if fmt == "vcf":
+        photos = request.GET.get("photos", "url")
+        if photos not in PHOTO_CHOICES:
+            raise Http404("Unknown photo option.")
+        options = {
+            "version": "4.0" if request.GET.get("version") == "4.0" else "3.0",
+            "photos": photos,
+            "absolute_uri": request.build_absolute_uri,
+        }
+    response = StreamingHttpResponse(
+        stream(WRITERS[fmt](request.user, **options)), content_type=CONTENT_TYPES[fmt]
     )
-    selected_type = request.GET.get("contact_type")
-    contacts = ContactList.objects.filter(user=request.user)
-    if selected_type:
-        contacts = contacts.filter(contact_type=selected_type)
-
-    paginator = Paginator(contacts, 50)
-    page = request.GET.get("page")
-    try:
-        contacts = paginator.page(page)
-    except PageNotAnInteger:
-        contacts = paginator.page(1)
-    except EmptyPage:
-        contacts = paginator.page(paginator.num_pages)
+    filename = f"contacts-{timezone.localdate():%Y%m%d}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
 
+@login_required
+def export_contacts(request):
+    return export_response(request)
+
+
+@login_required
+def bulk_contacts(request):
+    next_url = request.POST.get("next")
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse("contact_list")
+    if request.method == "POST":
+        ids = [int(pk) for pk in request.POST.getlist("ids") if pk.isdigit()]
+        action = request.POST.get("action", "")
+        if action == "delete" and ids and not request.POST.get("confirm"):
+            return confirm_bulk_delete(request, ids, next_url)
+        if not ids:
+            messages.error(request, "Select at least one contact.")
+        else:
+            try:
+                count = run_bulk_action(
+                    request.user, action, ids, chosen_value(action, request.POST)
+                )
+            except ValueError as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(request, done_message(action, count))
+    return redirect(next_url)
+
+
+# Names listed on the bulk delete confirmation; the rest are counted
+MAX_CONFIRM_NAMES = 20
+
+
+def confirm_bulk_delete(request, ids, next_url):
+    contacts = ContactList.objects.filter(user=request.user, pk__in=ids)
+    ids = list(contacts.values_list("pk", flat=True))
+    if not ids:
+        messages.error(request, "Select at least one contact.")
+        return redirect(next_url)
+    shown = contacts.order_by("first_name", "last_name").only(
+        "first_name", "last_name"
+    )[:MAX_CONFIRM_NAMES]
     context = {
-        "contact_types": contact_types,
-        "selected_type": selected_type,
-        "contacts": contacts,
-        "page_obj": contacts,
-        "is_paginated": contacts.has_other_pages(),
+        "title_tailwind_classes": title_tailwind_classes,
+        "contacts": shown,
+        "count": len(ids),
+        "more": len(ids) - len(shown),
+        "ids": ids,
+        "next": next_url,
     }
+    return render(request, "contacts/bulk_confirm_delete.html", context)
+
 
-    return render( request, "contacts/contact_type_list.html", context)
+# Clusters rendered on the duplicates page; merging one reveals the next
+MAX_SHOWN_CLUSTERS = 50
 
 
 @login_required
-def preferred_communication_list(request):
-    preferred_comms = (
-        ContactList.objects.filter(user=request.user)
-        .values_list("preferred_communication", flat=True)
-        .distinct()
-        .order_by("preferred_communication")
+def duplicate_contacts(request):
+    clusters = find_duplicates(request.user)
+    shown = clusters[:MAX_SHOWN_CLUSTERS]
+    contacts = ContactList.objects.filter(user=request.user).in_bulk(
+        [pk for ids in shown for pk in ids]
     )
-    selected_comm = request.GET.get("preferred_communication")
-    contacts = ContactList.objects.filter(user=request.user)
-    if selected_comm:
-        contacts = contacts.filter(preferred_communication=selected_comm)
-
-    paginator = Paginator(contacts, 50)
-    page = request.GET.get("page")
-    try:
-        contacts = paginator.page(page)
-    except PageNotAnInteger:
-        contacts = paginator.page(1)
-    except EmptyPage:
-        contacts = paginator.page(paginator.num_pages)
     context = {
-        "preferred_comms": preferred_comms,
-        "selected_comm": selected_comm,
-        "contacts": contacts,
-        "page_obj": contacts,
-        "is_paginated": contacts.has_other_pages(),
+        "clusters": [[contacts[pk] for pk in ids] for ids in shown],
+        "total": len(clusters),
+        'title_tailwind_classes':title_tailwind_classes
     }
-    return render( request, "contacts/preferred_communication_list.html", context)
+    return render(request, "contacts/duplicates.html", context)
+
+
+@login_required
+def merge_duplicates(request):
+    if request.method == "POST":
+        ids = [int(pk) for pk in request.POST.getlist("ids") if pk.isdigit()]
+        keep = request.POST.get("keep", "")
+        if not keep.isdigit() or int(keep) not in ids:
+            messages.error(request, "Choose the contact to keep.")
+            return redirect("duplicate_contacts")
+        try:
+            merged = merge_contacts(request.user, int(keep), ids)
+        except ContactList.DoesNotExist:
+            raise Http404("Contact not found.")
+        if merged:
+            messages.success(request, f"Merged {merged + 1} contacts.")
+        else:
+            messages.error(request, "Choose at least one other contact to merge.")
+    return redirect("duplicate_contacts")
+
+
+@staff_member_required
+def card_cache(request):
+    """Hit ratio of the contact card fragment cache, for monitoring."""
+    return JsonResponse(card_cache_stats())